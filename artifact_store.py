@@ -0,0 +1,368 @@
+import os
+import sys
+import json
+import time
+import uuid
+import shutil
+import hashlib
+import argparse
+import threading
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, List, Optional, Tuple
+import metrics
+
+DEFAULT_STORE_PATH = os.environ.get(
+    "ARTIFACT_STORE_PATH",
+    os.path.join(os.path.expanduser("~"), ".cache", "docx_markdown", "artifacts")
+)
+DEFAULT_MAX_BYTES = int(os.getenv("ARTIFACT_STORE_MAX_BYTES", str(10 * 1024 ** 3)))
+DEFAULT_MAX_AGE = float(os.getenv("ARTIFACT_STORE_MAX_AGE_DAYS", "14")) * 24 * 3600
+# Automatic garbage collection runs at most this often per process
+GC_INTERVAL = 600
+# Staging directories older than this were left by a writer that died
+STALE_STAGING_SECONDS = 3600
+MANIFEST = "manifest.json"
+
+def artifact_key(kind: str, input_hash: str, **params) -> str:
+    """
+    Build the content address of an artifact.
+
+    The key covers the artifact kind, the hash of the input it was made from
+    and every conversion parameter that changes the output (DPI, converter
+    backend), so changing any of them misses old entries.
+    """
+    payload = json.dumps({"kind": kind, "input": input_hash, "params": params}, sort_keys=True)
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+class FileLock:
+    """
+    Exclusive advisory lock on a file, across processes and across threads.
+
+    Every acquire opens its own descriptor, so two threads of one process
+    exclude each other just like two processes do.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._fd: Optional[int] = None
+
+    def acquire(self, blocking: bool = True) -> bool:
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o644)
+        try:
+            if sys.platform == "win32":
+                import msvcrt
+                msvcrt.locking(fd, msvcrt.LK_LOCK if blocking else msvcrt.LK_NBLCK, 1)
+            else:
+                import fcntl
+                fcntl.flock(fd, fcntl.LOCK_EX | (0 if blocking else fcntl.LOCK_NB))
+        except OSError:
+            os.close(fd)
+            if blocking:
+                raise
+            return False
+        self._fd = fd
+        return True
+
+    def release(self) -> None:
+        if self._fd is None:
+            return
+        if sys.platform == "win32":
+            import msvcrt
+            os.lseek(self._fd, 0, os.SEEK_SET)
+            msvcrt.locking(self._fd, msvcrt.LK_UNLCK, 1)
+        else:
+            import fcntl
+            fcntl.flock(self._fd, fcntl.LOCK_UN)
+        os.close(self._fd)
+        self._fd = None
+
+    def __enter__(self) -> "FileLock":
+        self.acquire()
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.release()
+
+def link_or_copy(src: str, dest: str) -> None:
+    """Place `src` at `dest` atomically, as a hard link where possible, replacing whatever was there."""
+    tmp = f"{dest}.{uuid.uuid4().hex}.tmp"
+    try:
+        os.link(src, tmp)
+    except OSError:
+        shutil.copy2(src, tmp)  # Another filesystem, or links are not supported
+    os.replace(tmp, dest)
+
+@dataclass
+class Artifact:
+    """A committed store entry: its key, kind, directory, file names and metadata."""
+    key: str
+    kind: str
+    path: str
+    files: List[str]
+    meta: Dict[str, Any] = field(default_factory=dict)
+
+    def file(self, name: str) -> str:
+        return os.path.join(self.path, name)
+
+    def materialize(self, dest_dir: str, names: Optional[Dict[str, str]] = None) -> List[str]:
+        """
+        Link the entry's files into a job's own directory and return their paths there.
+
+        Jobs read their private links, so garbage collection of the entry never
+        pulls files out from under a running job. `names` renames files on the way.
+        """
+        os.makedirs(dest_dir, exist_ok=True)
+        paths = []
+        for name in self.files:
+            dest = os.path.join(dest_dir, (names or {}).get(name, name))
+            link_or_copy(self.file(name), dest)
+            paths.append(dest)
+        return paths
+
+class Staging:
+    """Files being gathered for a store entry; nothing is visible in the store until commit()."""
+
+    def __init__(self, store: "ArtifactStore", key: str, kind: str):
+        self.store = store
+        self.key = key
+        self.kind = kind
+        self.path = os.path.join(store.root, "staging", f"{key}.{uuid.uuid4().hex}")
+        self.files: List[str] = []
+        os.makedirs(self.path)
+
+    def add_file(self, name: str, src: str) -> None:
+        link_or_copy(src, os.path.join(self.path, name))
+        self.files.append(name)
+
+    def add_bytes(self, name: str, data: bytes) -> None:
+        with open(os.path.join(self.path, name), "wb") as f:
+            f.write(data)
+        self.files.append(name)
+
+    def commit(self, **meta) -> Artifact:
+        """Publish the entry with one directory rename; if another job published it first, keep theirs."""
+        size = sum(os.path.getsize(os.path.join(self.path, name)) for name in self.files)
+        manifest = {"key": self.key, "kind": self.kind, "files": self.files, "size": size, "created": time.time(), "meta": meta}
+        with open(os.path.join(self.path, MANIFEST), "w") as f:
+            json.dump(manifest, f)
+        target = self.store._entry_path(self.key)
+        os.makedirs(os.path.dirname(target), exist_ok=True)
+        try:
+            os.rename(self.path, target)
+        except OSError:
+            self.discard()
+            existing = self.store.get(self.key, self.kind, record=False)
+            if existing is None:
+                raise
+            return existing
+        self.store._maybe_gc()
+        return Artifact(self.key, self.kind, target, self.files, meta)
+
+    def discard(self) -> None:
+        shutil.rmtree(self.path, ignore_errors=True)
+
+@dataclass
+class StoreStats:
+    entries: int = 0
+    size_bytes: int = 0
+    removed: int = 0
+    freed_bytes: int = 0
+
+class ArtifactStore:
+    """
+    Local content-addressed store of intermediate artifacts (PDFs, page images).
+
+    Entries live in <root>/objects/<key[:2]>/<key>/ next to a manifest that is
+    written last, and are published by renaming a complete staging directory,
+    so readers only ever see whole entries. A lock file per key lets a job that
+    finds another job building the same artifact wait for it and reuse it
+    instead of building it twice. The manifest's mtime is the entry's last
+    access, which garbage collection uses to drop old and least recently used
+    entries.
+
+    Lock files are never deleted: a job waiting on a lock holds the file open,
+    and unlinking it would let the next job lock a fresh file and build the
+    same key alongside the waiter. They are empty, one per key ever built.
+    """
+
+    def __init__(self, root: str = DEFAULT_STORE_PATH, max_bytes: int = DEFAULT_MAX_BYTES, max_age: float = DEFAULT_MAX_AGE):
+        self.root = root
+        self.max_bytes = max_bytes
+        self.max_age = max_age
+        self._last_gc = 0.0
+        self._gc_lock = threading.Lock()
+        for sub in ("objects", "staging", "locks"):
+            os.makedirs(os.path.join(root, sub), exist_ok=True)
+
+    def _entry_path(self, key: str) -> str:
+        return os.path.join(self.root, "objects", key[:2], key)
+
+    def lock(self, key: str) -> FileLock:
+        """Lock held while building the artifact for `key`, so parallel jobs build it once."""
+        return FileLock(os.path.join(self.root, "locks", f"{key}.lock"))
+
+    def get(self, key: str, kind: str = "", record: bool = True) -> Optional[Artifact]:
+        """Return the committed entry for `key` and mark it as used, or None on a miss (recorded as an "artifact" metric)."""
+        path = self._entry_path(key)
+        manifest_path = os.path.join(path, MANIFEST)
+        try:
+            with open(manifest_path) as f:
+                manifest = json.load(f)
+            os.utime(manifest_path)
+        except (OSError, json.JSONDecodeError):
+            if record:
+                metrics.record("artifact", key=key, artifact=kind, hit=False)
+            return None
+        if record:
+            metrics.record("artifact", key=key, artifact=kind or manifest["kind"], hit=True)
+        return Artifact(key, manifest["kind"], path, manifest["files"], manifest.get("meta", {}))
+
+    def stage(self, key: str, kind: str) -> Staging:
+        """Start gathering the files of a new entry."""
+        return Staging(self, key, kind)
+
+    def checkout(self, key: str, kind: str, dest_dir: str, names: Optional[Dict[str, str]] = None) -> Optional[List[str]]:
+        """
+        Link the files of the entry for `key` into `dest_dir` and return their paths there, or None on a miss.
+
+        The key's lock is held meanwhile, so garbage collection cannot remove
+        the entry between the lookup and the links.
+        """
+        with self.lock(key):
+            artifact = self.get(key, kind)
+            return artifact.materialize(dest_dir, names) if artifact is not None else None
+
+    def get_or_build(
+        self,
+        key: str,
+        kind: str,
+        build: Callable[[Staging], Optional[Dict[str, Any]]],
+        dest_dir: str,
+        names: Optional[Dict[str, str]] = None
+    ) -> Tuple[List[str], bool]:
+        """
+        Return (paths, hit) for `key`, calling `build` to fill a staging area on a miss.
+
+        `build` returns the entry's metadata. Either way the entry's files end
+        up linked into `dest_dir` (see checkout). Everything happens under the
+        key's lock, so a job that finds another job building the same key waits
+        for it and then reuses its entry, and garbage collection cannot remove
+        the entry before it is linked.
+        """
+        with self.lock(key):
+            artifact = self.get(key, kind, record=False)
+            hit = artifact is not None
+            if not hit:
+                staging = self.stage(key, kind)
+                try:
+                    meta = build(staging) or {}
+                except BaseException:
+                    staging.discard()
+                    raise
+                artifact = staging.commit(**meta)
+            paths = artifact.materialize(dest_dir, names)
+        metrics.record("artifact", key=key, artifact=kind, hit=hit)
+        return paths, hit
+
+    def _entries(self) -> List[Dict[str, Any]]:
+        entries = []
+        objects = os.path.join(self.root, "objects")
+        for prefix in os.listdir(objects):
+            for key in os.listdir(os.path.join(objects, prefix)):
+                manifest_path = os.path.join(objects, prefix, key, MANIFEST)
+                try:
+                    with open(manifest_path) as f:
+                        size = json.load(f)["size"]
+                    entries.append({"key": key, "size": size, "last_access": os.path.getmtime(manifest_path)})
+                except (OSError, ValueError, KeyError):
+                    continue  # Removed while listing
+        return entries
+
+    def _remove(self, key: str) -> bool:
+        """Remove one entry unless a job is building or linking it right now."""
+        lock = self.lock(key)
+        if not lock.acquire(blocking=False):
+            return False
+        try:
+            # Rename first so the entry disappears at once, then delete at leisure
+            trash = os.path.join(self.root, "staging", f"{key}.{uuid.uuid4().hex}.trash")
+            try:
+                os.rename(self._entry_path(key), trash)
+            except OSError:
+                return False
+            shutil.rmtree(trash, ignore_errors=True)
+            return True
+        finally:
+            lock.release()
+
+    def gc(self, max_age: Optional[float] = None, max_bytes: Optional[int] = None) -> StoreStats:
+        """
+        Drop entries not used for `max_age` seconds, then the least recently used
+        ones until the store fits in `max_bytes`, and return what is left and freed.
+        """
+        max_age = self.max_age if max_age is None else max_age
+        max_bytes = self.max_bytes if max_bytes is None else max_bytes
+        stats = StoreStats()
+        now = time.time()
+
+        staging = os.path.join(self.root, "staging")
+        for name in os.listdir(staging):
+            path = os.path.join(staging, name)
+            try:
+                if now - os.path.getmtime(path) > STALE_STAGING_SECONDS:
+                    shutil.rmtree(path, ignore_errors=True)
+            except OSError:
+                pass
+
+        entries = sorted(self._entries(), key=lambda e: e["last_access"])
+        total = sum(e["size"] for e in entries)
+        kept = []
+        for entry in entries:
+            expired = now - entry["last_access"] > max_age
+            if (expired or total > max_bytes) and self._remove(entry["key"]):
+                total -= entry["size"]
+                stats.removed += 1
+                stats.freed_bytes += entry["size"]
+            else:
+                kept.append(entry)
+        stats.entries = len(kept)
+        stats.size_bytes = sum(e["size"] for e in kept)
+        return stats
+
+    def _maybe_gc(self) -> None:
+        with self._gc_lock:
+            if time.time() - self._last_gc < GC_INTERVAL:
+                return
+            self._last_gc = time.time()
+        self.gc()
+
+    def stats(self) -> StoreStats:
+        entries = self._entries()
+        return StoreStats(entries=len(entries), size_bytes=sum(e["size"] for e in entries))
+
+_default_store: Optional[ArtifactStore] = None
+_default_store_lock = threading.Lock()
+
+def get_default_store() -> ArtifactStore:
+    """Return the process-wide store at DEFAULT_STORE_PATH, creating it on first use."""
+    global _default_store
+    with _default_store_lock:
+        if _default_store is None:
+            _default_store = ArtifactStore()
+        return _default_store
+
+def main():
+    """Inspect or garbage-collect the artifact store, e.g. from cron."""
+    parser = argparse.ArgumentParser(description="Manage the local artifact store of PDFs and page images")
+    parser.add_argument("command", choices=["stats", "gc"])
+    parser.add_argument("--root", default=DEFAULT_STORE_PATH)
+    parser.add_argument("--max-age-days", type=float, default=DEFAULT_MAX_AGE / (24 * 3600))
+    parser.add_argument("--max-bytes", type=int, default=DEFAULT_MAX_BYTES)
+    args = parser.parse_args()
+    store = ArtifactStore(args.root, max_bytes=args.max_bytes, max_age=args.max_age_days * 24 * 3600)
+    stats = store.gc() if args.command == "gc" else store.stats()
+    print(json.dumps(stats.__dict__, indent=2))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,305 @@
+from dotenv import load_dotenv
+import argparse
+import asyncio
+import glob
+import json
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Dict, List, Optional, Tuple
+load_dotenv()
+
+import client
+from converters import DEFAULT_BACKEND, DEFAULT_POOL_SIZE, ConversionError, create_backend, set_backend
+from journal import journal_path_for, open_journal
+import llm_scheduler
+from llm_scheduler import BATCH, job_priority
+from ocr import DEFAULT_MAX_CONCURRENCY
+import metrics
+from rasterizer import DEFAULT_DPI, DEFAULT_PAGE_WINDOW
+from state import job_dir_for, job_lock
+from tools import conversion_settings, docx_to_pdf_converter, pdf_to_png_converter, png_to_markdown_converter
+
+DEFAULT_OUTPUT_DIR = "./batch_output"
+STATUS_FILE = "batch_status.jsonl"
+SUMMARY_FILE = "batch_summary.json"
+
+def collect_documents(
+    directory: Optional[str] = None,
+    pattern: Optional[str] = None,
+    manifest: Optional[str] = None
+) -> List[str]:
+    """Return the sorted, de-duplicated list of DOCX paths named by a directory, a glob and/or a manifest file."""
+    paths = []
+    if directory:
+        paths.extend(glob.glob(os.path.join(directory, "**", "*.docx"), recursive=True))
+    if pattern:
+        paths.extend(glob.glob(pattern, recursive=True))
+    if manifest:
+        with open(manifest) as f:
+            paths.extend(line.strip() for line in f if line.strip() and not line.startswith("#"))
+    # Word lock files (~$name.docx) are not documents
+    return sorted({os.path.abspath(p) for p in paths if not os.path.basename(p).startswith("~$")})
+
+def load_completed(status_path: str) -> Dict[str, Dict[str, Any]]:
+    """Return the latest successful status record per document from a previous (possibly interrupted) batch."""
+    completed = {}
+    if not os.path.exists(status_path):
+        return completed
+    with open(status_path) as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError:
+                continue  # A torn final line from an interrupted run
+            if record.get("status") == "success" and os.path.exists(record.get("markdown_path", "")):
+                completed[record["docx_path"]] = record
+            else:
+                completed.pop(record.get("docx_path"), None)
+    return completed
+
+def render_document(pdf_path: str, dpi: int, page_window: int, render_workers: int = 1) -> Dict[str, Any]:
+    """
+    Rasterize one PDF into page images, sharded over `render_workers` poppler processes.
+
+    Runs in a worker process, so it only takes and returns plain picklable values.
+    """
+    png_result = pdf_to_png_converter.invoke({"pdf_path": pdf_path, "dpi": dpi, "page_window": page_window, "render_workers": render_workers})
+    if not png_result.success:
+        return {"success": False, "error": f"pdf_to_png: {png_result.error}"}
+    return {"success": True, "png_paths": png_result.png_paths}
+
+class BatchRunner:
+    """Run many documents through the conversion pipeline and record a per-document status log."""
+
+    def __init__(
+        self,
+        output_dir: str = DEFAULT_OUTPUT_DIR,
+        render_workers: int = os.cpu_count() or 1,
+        ocr_documents: int = 4,
+        max_concurrency: int = DEFAULT_MAX_CONCURRENCY,
+        dpi: int = DEFAULT_DPI,
+        page_window: int = DEFAULT_PAGE_WINDOW,
+        shard_workers: int = 0,
+        worker: Optional[Tuple[str, int]] = None
+    ):
+        self.output_dir = output_dir
+        self.render_workers = render_workers
+        # By default the cores are split between documents rendered at once and the shards of each
+        self.shard_workers = shard_workers or max(1, (os.cpu_count() or 1) // max(1, render_workers))
+        self.ocr_documents = ocr_documents
+        self.max_concurrency = max_concurrency
+        self.dpi = dpi
+        self.page_window = page_window
+        # (host, port) of a warm worker the documents are submitted to instead of being converted here
+        self.worker = worker
+        self.status_path = os.path.join(output_dir, STATUS_FILE)
+
+    def _record(self, record: Dict[str, Any]) -> None:
+        # One JSON line per finished document, flushed immediately so a crash loses at most the line being written
+        with open(self.status_path, "a") as f:
+            f.write(json.dumps(record) + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+
+    def _submit(self, docx_path: str) -> Dict[str, Any]:
+        """
+        Convert one document on the warm worker at batch priority and return its status fields.
+
+        The worker shares its LLM quota and queue with interactive jobs, which
+        overtake the batch's pages. It holds the job lock and journal itself.
+        """
+        host, port = self.worker
+        job = {"input_path": docx_path, "mode": "fast", "native": False, "output_root": os.path.abspath(self.output_dir), "priority": "batch"}
+        pages, failed_pages, cached_pages, resumed_pages = 0, [], 0, 0
+        state = None
+        for event in client.submit(host, port, job):
+            if event["event"] == "page":
+                pages += 1
+                cached_pages += event["cached"]
+                resumed_pages += event["resumed"]
+                if not event["success"]:
+                    failed_pages.append(event["page_number"])
+            elif event["event"] == "done":
+                state = event["state"]
+            elif event["event"] == "error":
+                state = {"error": event["error"]}
+        error = state.get("error", "") if state is not None else "The worker closed the connection before the job finished"
+        return {
+            "status": "failed" if error else "success",
+            "pages": pages,
+            "markdown_path": (state or {}).get("markdown_path", ""),
+            "failed_pages": failed_pages,
+            "cached_pages": cached_pages,
+            "resumed_pages": resumed_pages,
+            "error": error
+        }
+
+    async def _process(
+        self,
+        docx_path: str,
+        pool: ProcessPoolExecutor,
+        ocr_slots: asyncio.Semaphore
+    ) -> Dict[str, Any]:
+        started = time.perf_counter()
+        job_dir = job_dir_for(docx_path, self.output_dir)
+        record = {"docx_path": docx_path, "job_dir": job_dir, "pages": 0}
+        lock = job_lock(job_dir)
+        try:
+            if self.worker is not None:
+                async with ocr_slots:
+                    record.update(await asyncio.to_thread(self._submit, docx_path))
+                return record
+
+            # Another batch working on the same output directory finishes the document first
+            await asyncio.to_thread(lock.acquire)
+            # Stages and pages finished by an interrupted earlier batch are taken from the job's journal
+            journal_path = journal_path_for(docx_path, job_dir)
+            journal = await asyncio.to_thread(open_journal, journal_path, docx_path, conversion_settings(dpi=self.dpi))
+
+            # DOCX->PDF in this process, so every document shares the one pool of warm converter workers
+            converted = journal.stage_artifacts("docx_to_pdf")
+            if converted is None:
+                pdf_result = await asyncio.to_thread(docx_to_pdf_converter.invoke, {"docx_path": docx_path, "output_dir": job_dir})
+                if not pdf_result.success:
+                    record.update(status="failed", error=f"docx_to_pdf: {pdf_result.error}")
+                    return record
+                converted = {"pdf_path": pdf_result.pdf_path}
+                journal.record_stage("docx_to_pdf", **converted)
+
+            # CPU-bound: rasterization in the process pool
+            rendered = journal.stage_artifacts("pdf_to_png")
+            if rendered is None:
+                loop = asyncio.get_running_loop()
+                rendered = await loop.run_in_executor(pool, render_document, converted["pdf_path"], self.dpi, self.page_window, self.shard_workers)
+                if not rendered["success"]:
+                    record.update(status="failed", error=rendered["error"])
+                    return record
+                journal.record_stage("pdf_to_png", png_paths=rendered["png_paths"])
+            record["pages"] = len(rendered["png_paths"])
+
+            # I/O-bound: vision calls, a bounded number of documents at a time
+            async with ocr_slots:
+                result = await asyncio.to_thread(png_to_markdown_converter.invoke, {
+                    "png_paths": rendered["png_paths"],
+                    "output_dir": job_dir,
+                    "max_concurrency": self.max_concurrency,
+                    "journal_path": journal_path
+                })
+            if result.success:
+                journal.discard()  # The document is done; only an interrupted conversion is resumed
+            record.update(
+                status="success" if result.success else "failed",
+                markdown_path=result.markdown_path,
+                failed_pages=result.failed_pages,
+                cached_pages=result.cached_pages,
+                resumed_pages=result.resumed_pages,
+                error=result.error
+            )
+            return record
+        except Exception as e:
+            record.update(status="failed", error=str(e))
+            return record
+        finally:
+            lock.release()
+            record["seconds"] = round(time.perf_counter() - started, 3)
+            self._record(record)
+
+    async def run(self, docx_paths: List[str]) -> Dict[str, Any]:
+        """Process `docx_paths`, skipping documents that already succeeded, and return the batch summary."""
+        os.makedirs(self.output_dir, exist_ok=True)
+        completed = load_completed(self.status_path)
+        pending = [p for p in docx_paths if p not in completed]
+
+        started = time.perf_counter()
+        ocr_slots = asyncio.Semaphore(max(1, self.ocr_documents))
+        with ProcessPoolExecutor(max_workers=max(1, self.render_workers)) as pool:
+            records = await asyncio.gather(*(self._process(p, pool, ocr_slots) for p in pending))
+        elapsed = time.perf_counter() - started
+
+        succeeded = [r for r in records if r["status"] == "success"]
+        pages = sum(r["pages"] for r in succeeded)
+        minutes = elapsed / 60 if elapsed else 0
+        summary = {
+            "documents": len(docx_paths),
+            "skipped": len(docx_paths) - len(pending),
+            "processed": len(records),
+            "succeeded": len(succeeded),
+            "failed": len(records) - len(succeeded),
+            "pages": pages,
+            "seconds": round(elapsed, 3),
+            "documents_per_minute": round(len(succeeded) / minutes, 2) if minutes else 0.0,
+            "pages_per_minute": round(pages / minutes, 2) if minutes else 0.0,
+            "failures": {r["docx_path"]: r.get("error", "") for r in records if r["status"] != "success"}
+        }
+        with open(os.path.join(self.output_dir, SUMMARY_FILE), "w") as f:
+            json.dump(summary, f, indent=2)
+        return summary
+
+def main():
+    parser = argparse.ArgumentParser(description="Convert a corpus of DOCX documents to Markdown")
+    parser.add_argument("--dir", dest="directory", help="Directory searched recursively for .docx files")
+    parser.add_argument("--glob", dest="pattern", help="Glob pattern matching .docx files")
+    parser.add_argument("--manifest", help="Text file with one .docx path per line")
+    parser.add_argument("--output-dir", default=DEFAULT_OUTPUT_DIR)
+    parser.add_argument("--render-workers", type=int, default=os.cpu_count() or 1,
+                        help="Documents rasterized at the same time")
+    parser.add_argument("--shard-workers", type=int, default=0,
+                        help="Parallel poppler processes per document; 0 splits the cores between documents")
+    parser.add_argument("--ocr-documents", type=int, default=4,
+                        help="Documents whose pages are sent to the vision model at the same time")
+    parser.add_argument("--max-concurrency", type=int, default=DEFAULT_MAX_CONCURRENCY,
+                        help="Parallel vision calls per document")
+    parser.add_argument("--pdf-backend", choices=["auto", "docx2pdf", "libreoffice"], default=DEFAULT_BACKEND,
+                        help="DOCX->PDF converter; libreoffice keeps a pool of warm headless workers")
+    parser.add_argument("--pdf-workers", type=int, default=DEFAULT_POOL_SIZE,
+                        help="LibreOffice backend: number of persistent converter processes")
+    parser.add_argument("--dpi", type=int, default=DEFAULT_DPI)
+    parser.add_argument("--page-window", type=int, default=DEFAULT_PAGE_WINDOW)
+    parser.add_argument("--worker", action="store_true",
+                        help="Submit the documents to the warm worker (worker.py) at batch priority, so they share its "
+                             "quota with interactive jobs and yield to them; the conversion options above then come from the worker")
+    parser.add_argument("--worker-host", default=client.DEFAULT_HOST)
+    parser.add_argument("--worker-port", type=int, default=client.DEFAULT_PORT)
+    parser.add_argument("--rpm", type=int, default=llm_scheduler.DEFAULT_RPM,
+                        help="Requests per minute allowed by the OpenAI account; 0 = unlimited")
+    parser.add_argument("--tpm", type=int, default=llm_scheduler.DEFAULT_TPM,
+                        help="Tokens per minute allowed by the OpenAI account; 0 = unlimited")
+    args = parser.parse_args()
+
+    docx_paths = collect_documents(args.directory, args.pattern, args.manifest)
+    if not docx_paths:
+        parser.error("No .docx files found; pass --dir, --glob or --manifest")
+
+    worker = None
+    if args.worker:
+        worker = (args.worker_host, args.worker_port)
+        if client.health(*worker) is None:
+            parser.error(f"No worker on {args.worker_host}:{args.worker_port}; start one with python worker.py")
+    else:
+        try:
+            set_backend(create_backend(args.pdf_backend, size=args.pdf_workers))
+        except ConversionError as e:
+            parser.error(str(e))
+        # Quota and priorities are per process: this batch does not see the queue of any other run
+        llm_scheduler.configure(rpm=args.rpm, tpm=args.tpm)
+
+    runner = BatchRunner(
+        output_dir=args.output_dir,
+        render_workers=args.render_workers,
+        ocr_documents=args.ocr_documents,
+        max_concurrency=args.max_concurrency,
+        dpi=args.dpi,
+        page_window=args.page_window,
+        shard_workers=args.shard_workers,
+        worker=worker
+    )
+    # Batch pages queue behind interactive calls on this process's scheduler; jobs sent to a worker carry the priority themselves
+    with metrics.collect() as batch_metrics, job_priority(BATCH):
+        summary = asyncio.run(runner.run(docx_paths))
+    # Rasterization runs in worker processes, so its per-page records are not part of the batch report
+    batch_metrics.write(args.output_dir, name="batch")
+    print(json.dumps(summary, indent=2))
+
+if __name__ == "__main__":
+    main()
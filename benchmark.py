@@ -0,0 +1,432 @@
+import os
+import sys
+import json
+import time
+import shutil
+import random
+import zipfile
+import argparse
+import tempfile
+import statistics
+import subprocess
+from typing import Any, Callable, Dict, List, Tuple
+from PIL import Image, ImageDraw
+
+from fake_openai import FakeOpenAIServer, FakeSettings
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+SYNTHETIC_DIR = os.path.join(ROOT, "test_files", "synthetic")
+RESULTS_PATH = os.path.join(ROOT, "bench_results", "results.jsonl")
+
+WORDS = ("signal frame carrier uplink downlink channel band power control report "
+         "resource block symbol slot antenna beam measurement threshold timer value").split()
+
+# --- Synthetic documents -------------------------------------------------------
+
+def _sentence(rng: random.Random) -> str:
+    return " ".join(rng.choice(WORDS) for _ in range(rng.randint(8, 18))).capitalize() + "."
+
+def synthetic_page_text(page: int, seed: int, paragraphs: int = 6) -> List[str]:
+    rng = random.Random(seed * 100003 + page)
+    return [" ".join(_sentence(rng) for _ in range(rng.randint(2, 5))) for _ in range(paragraphs)]
+
+def render_page_image(page: int, seed: int, size: Tuple[int, int] = (1275, 1650)) -> Image.Image:
+    """Draw a letter-size page at 150 dpi with a heading and wrapped paragraphs."""
+    image = Image.new("RGB", size, "white")
+    draw = ImageDraw.Draw(image)
+    y = 120
+    draw.text((120, y), f"Section {page}", fill="black")
+    for paragraph in synthetic_page_text(page, seed):
+        y += 40
+        words = paragraph.split()
+        for start in range(0, len(words), 14):
+            draw.text((120, y), " ".join(words[start:start + 14]), fill="black")
+            y += 22
+    return image
+
+def write_synthetic_pdf(path: str, pages: int, seed: int = 0) -> str:
+    images = [render_page_image(n, seed) for n in range(1, pages + 1)]
+    images[0].save(path, "PDF", save_all=True, append_images=images[1:], resolution=150)
+    return path
+
+def write_synthetic_pngs(directory: str, pages: int, seed: int = 0) -> List[str]:
+    os.makedirs(directory, exist_ok=True)
+    paths = []
+    for n in range(1, pages + 1):
+        path = os.path.join(directory, f"page_{n}.png")
+        render_page_image(n, seed).save(path, "PNG")
+        paths.append(path)
+    return paths
+
+def _escape(text: str) -> str:
+    return text.replace("&", "&amp;").replace("<", "&lt;").replace(">", "&gt;")
+
+DOCX_NAMESPACES = (
+    'xmlns:w="http://schemas.openxmlformats.org/wordprocessingml/2006/main" '
+    'xmlns:r="http://schemas.openxmlformats.org/officeDocument/2006/relationships" '
+    'xmlns:m="http://schemas.openxmlformats.org/officeDocument/2006/math" '
+    'xmlns:wp="http://schemas.openxmlformats.org/drawingml/2006/wordprocessingDrawing" '
+    'xmlns:a="http://schemas.openxmlformats.org/drawingml/2006/main" '
+    'xmlns:pic="http://schemas.openxmlformats.org/drawingml/2006/picture"'
+)
+
+def _image_run(rel_id: str, index: int) -> str:
+    cx, cy = 5486400, 1828800
+    return (
+        f'<w:r><w:drawing><wp:inline><wp:extent cx="{cx}" cy="{cy}"/><wp:docPr id="{index}" name="Figure {index}"/>'
+        '<a:graphic><a:graphicData uri="http://schemas.openxmlformats.org/drawingml/2006/picture"><pic:pic>'
+        f'<pic:nvPicPr><pic:cNvPr id="{index}" name="figure{index}.png"/><pic:cNvPicPr/></pic:nvPicPr>'
+        f'<pic:blipFill><a:blip r:embed="{rel_id}"/><a:stretch><a:fillRect/></a:stretch></pic:blipFill>'
+        f'<pic:spPr><a:xfrm><a:off x="0" y="0"/><a:ext cx="{cx}" cy="{cy}"/></a:xfrm><a:prstGeom prst="rect"/></pic:spPr>'
+        '</pic:pic></a:graphicData></a:graphic></wp:inline></w:drawing></w:r>'
+    )
+
+def write_synthetic_docx(path: str, pages: int, seed: int = 0, images_per_page: int = 0, edits: int = 0) -> str:
+    """
+    Write a DOCX of `pages` page-broken sections with headings, text, an equation
+    and optionally embedded figures; `edits` changes that many paragraphs (for comparison runs).
+    """
+    rng = random.Random(seed + 7)
+    edited = set(rng.sample(range(pages * 6), min(edits, pages * 6)))
+    body, relationships, media = [], [], []
+    for page in range(1, pages + 1):
+        body.append(f'<w:p><w:pPr><w:pStyle w:val="Heading1"/></w:pPr><w:r><w:t>Section {page}</w:t></w:r></w:p>')
+        for index, paragraph in enumerate(synthetic_page_text(page, seed)):
+            if (page - 1) * 6 + index in edited:
+                paragraph = paragraph.replace(" ", " revised ", 1)
+            body.append(f'<w:p><w:r><w:t xml:space="preserve">{_escape(paragraph)}</w:t></w:r></w:p>')
+        body.append(
+            '<w:p><m:oMathPara><m:oMath><m:r><m:t>E</m:t></m:r><m:r><m:t>=</m:t></m:r>'
+            f'<m:sSup><m:e><m:r><m:t>x</m:t></m:r></m:e><m:sup><m:r><m:t>{page}</m:t></m:r></m:sup></m:sSup>'
+            '</m:oMath></m:oMathPara></w:p>'
+        )
+        for figure in range(images_per_page):
+            rel_id = f"rIdImg{len(media) + 1}"
+            name = f"media/figure{len(media) + 1}.png"
+            image = Image.new("RGB", (600, 200), "white")
+            ImageDraw.Draw(image).text((20, 80), f"Figure {page}.{figure + 1}: " + " ".join(synthetic_page_text(page, seed + figure, 1)[0].split()[:8]), fill="black")
+            media.append((name, image))
+            relationships.append(f'<Relationship Id="{rel_id}" Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/image" Target="{name}"/>')
+            body.append(f"<w:p>{_image_run(rel_id, len(media))}</w:p>")
+        if page < pages:
+            body.append('<w:p><w:r><w:br w:type="page"/></w:r></w:p>')
+
+    with zipfile.ZipFile(path, "w", zipfile.ZIP_DEFLATED) as docx:
+        docx.writestr("[Content_Types].xml",
+            '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+            '<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">'
+            '<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>'
+            '<Default Extension="xml" ContentType="application/xml"/>'
+            '<Default Extension="png" ContentType="image/png"/>'
+            '<Override PartName="/word/document.xml" ContentType="application/vnd.openxmlformats-officedocument.wordprocessingml.document.main+xml"/>'
+            '<Override PartName="/word/styles.xml" ContentType="application/vnd.openxmlformats-officedocument.wordprocessingml.styles+xml"/>'
+            '</Types>')
+        docx.writestr("_rels/.rels",
+            '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+            '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+            '<Relationship Id="rId1" Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/officeDocument" Target="word/document.xml"/>'
+            '</Relationships>')
+        docx.writestr("word/_rels/document.xml.rels",
+            '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+            '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+            '<Relationship Id="rIdStyles" Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/styles" Target="styles.xml"/>'
+            + "".join(relationships) + '</Relationships>')
+        docx.writestr("word/styles.xml",
+            f'<?xml version="1.0" encoding="UTF-8" standalone="yes"?><w:styles {DOCX_NAMESPACES}>'
+            '<w:style w:type="paragraph" w:styleId="Heading1"><w:name w:val="heading 1"/>'
+            '<w:pPr><w:outlineLvl w:val="0"/></w:pPr><w:rPr><w:b/><w:sz w:val="32"/></w:rPr></w:style></w:styles>')
+        docx.writestr("word/document.xml",
+            f'<?xml version="1.0" encoding="UTF-8" standalone="yes"?><w:document {DOCX_NAMESPACES}><w:body>'
+            + "".join(body) + '<w:sectPr/></w:body></w:document>')
+        for name, image in media:
+            buffer = tempfile.SpooledTemporaryFile()
+            image.save(buffer, "PNG")
+            buffer.seek(0)
+            docx.writestr(f"word/{name}", buffer.read())
+    return path
+
+def prepare_inputs(scenario: str, pages: int, seed: int, images_per_page: int) -> str:
+    """Generate (once) the synthetic input of a scenario under test_files/synthetic/ and return its path."""
+    os.makedirs(SYNTHETIC_DIR, exist_ok=True)
+    stem = os.path.join(SYNTHETIC_DIR, f"synthetic_{pages}p_s{seed}_i{images_per_page}")
+    if scenario == "ocr":
+        png_dir = f"{stem}_png"
+        if not os.path.isdir(png_dir):
+            write_synthetic_pngs(png_dir, pages, seed)
+        return png_dir
+    if scenario == "in-memory":
+        if not os.path.exists(f"{stem}.pdf"):
+            write_synthetic_pdf(f"{stem}.pdf", pages, seed)
+        return f"{stem}.pdf"
+    if scenario == "compare":
+        if not os.path.exists(f"{stem}_updated.docx"):
+            write_synthetic_docx(f"{stem}_original.docx", pages, seed, images_per_page)
+            write_synthetic_docx(f"{stem}_updated.docx", pages, seed, images_per_page, edits=max(1, pages // 2))
+        return f"{stem}.docx"
+    if not os.path.exists(f"{stem}.docx"):
+        write_synthetic_docx(f"{stem}.docx", pages, seed, images_per_page)
+    return f"{stem}.docx"
+
+# --- Scenarios (run in a fresh child process each) ------------------------------
+
+def _copy_input(input_path: str, workdir: str) -> str:
+    """Copy inputs into a scratch directory so no journal, cache or output of an earlier run is reused."""
+    if os.path.isdir(input_path):
+        target = os.path.join(workdir, os.path.basename(input_path))
+        shutil.copytree(input_path, target)
+        return target
+    if input_path.endswith(".docx") and not os.path.exists(input_path):
+        # Comparison input: only the _original/_updated pair exists
+        for suffix in ("_original.docx", "_updated.docx"):
+            shutil.copy(input_path[:-5] + suffix, workdir)
+        return os.path.join(workdir, os.path.basename(input_path))
+    shutil.copy(input_path, workdir)
+    return os.path.join(workdir, os.path.basename(input_path))
+
+def _run_native(input_path: str, config: Dict[str, Any]) -> Dict[str, Any]:
+    from pipeline import fast_graph
+    from state import initial_state
+    return fast_graph.invoke(initial_state(input_path))
+
+def _run_fast(input_path: str, config: Dict[str, Any]) -> Dict[str, Any]:
+    from pipeline import rasterizing_graph
+    from state import initial_state
+    return rasterizing_graph.invoke(initial_state(input_path))
+
+def _run_in_memory(input_path: str, config: Dict[str, Any]) -> Dict[str, Any]:
+    from tools import pdf_to_markdown_converter
+    result = pdf_to_markdown_converter.invoke({
+        "pdf_path": input_path,
+        "output_dir": os.path.dirname(input_path),
+        "max_concurrency": config["max_concurrency"]
+    })
+    return {"error": result.error} if not result.success else {"markdown_path": result.markdown_path}
+
+def _run_ocr(input_path: str, config: Dict[str, Any]) -> Dict[str, Any]:
+    from tools import png_to_markdown_converter
+    png_paths = sorted((os.path.join(input_path, f) for f in os.listdir(input_path)), key=lambda p: int(p.rsplit("_", 1)[1][:-4]))
+    result = png_to_markdown_converter.invoke({
+        "png_paths": png_paths,
+        "output_dir": os.path.dirname(input_path),
+        "max_concurrency": config["max_concurrency"]
+    })
+    return {"error": result.error} if not result.success else {"markdown_path": result.markdown_path}
+
+def _run_agentic(input_path: str, config: Dict[str, Any]) -> Dict[str, Any]:
+    from main import graph
+    from state import initial_state
+    return graph.invoke(initial_state(input_path))
+
+def _run_compare(input_path: str, config: Dict[str, Any]) -> Dict[str, Any]:
+    from old_files.chains import compare_graph
+    return compare_graph.invoke({"input_path": input_path})
+
+# name -> (runner, requirements)
+SCENARIOS: Dict[str, Tuple[Callable[[str, Dict[str, Any]], Dict[str, Any]], Tuple[str, ...]]] = {
+    "native": (_run_native, ()),
+    "ocr": (_run_ocr, ()),
+    "in-memory": (_run_in_memory, ("poppler",)),
+    "fast": (_run_fast, ("poppler", "pdf_backend")),
+    "agentic": (_run_agentic, ("poppler", "pdf_backend")),
+    "compare": (_run_compare, ("poppler", "pdf_backend"))
+}
+
+def missing_requirements(scenario: str) -> List[str]:
+    """Return what this machine lacks to run `scenario`."""
+    missing = []
+    for requirement in SCENARIOS[scenario][1]:
+        if requirement == "poppler" and not shutil.which("pdfinfo"):
+            missing.append("poppler (pdfinfo)")
+        elif requirement == "pdf_backend":
+            from converters import ConversionError, create_backend
+            try:
+                create_backend().close()
+            except ConversionError as e:
+                missing.append(str(e))
+    return missing
+
+def run_child(config: Dict[str, Any]) -> Dict[str, Any]:
+    """Run one scenario in this (fresh) process and return its measurements."""
+    import resource
+    import tracemalloc
+    if config["trace_python_memory"]:
+        tracemalloc.start()
+    import metrics
+
+    runner = SCENARIOS[config["scenario"]][0]
+    with tempfile.TemporaryDirectory(prefix="bench-") as workdir:
+        input_path = _copy_input(config["input_path"], workdir)
+        with metrics.collect() as run_metrics:
+            started = time.perf_counter()
+            state = runner(input_path, config)
+            seconds = time.perf_counter() - started
+
+    report = run_metrics.report()
+    peak_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return {
+        "success": not state.get("error"),
+        "error": state.get("error", ""),
+        "seconds": seconds,
+        "pages_per_second": config["pages"] / seconds if seconds else 0.0,
+        # ru_maxrss is in KiB on Linux and in bytes on macOS
+        "peak_rss_mb": peak_rss / (1024 * 1024 if sys.platform == "darwin" else 1024),
+        "peak_python_mb": tracemalloc.get_traced_memory()[1] / 2 ** 20 if config["trace_python_memory"] else None,
+        "stages": {node: v["seconds"] for node, v in report["nodes"].items()},
+        "page_seconds": report["pages"]["seconds"],
+        "rasterize_seconds": report["rasterization"]["seconds"],
+        "llm": {purpose: {k: v[k] for k in ("calls", "failed", "retries", "latency", "input_tokens", "output_tokens")} for purpose, v in report["llm"].items()}
+    }
+
+# --- Harness --------------------------------------------------------------------
+
+def git_revision() -> Dict[str, Any]:
+    def git(*args):
+        return subprocess.run(["git", *args], cwd=ROOT, capture_output=True, text=True).stdout.strip()
+    return {"commit": git("rev-parse", "--short", "HEAD"), "dirty": bool(git("status", "--porcelain", "--untracked-files=no"))}
+
+def run_benchmark(
+    scenario: str,
+    pages: int,
+    settings: FakeSettings,
+    max_concurrency: int,
+    images_per_page: int,
+    seed: int = 0,
+    trace_python_memory: bool = False
+) -> Dict[str, Any]:
+    """Run one scenario against a fresh fake API in a child process; returns the result record."""
+    input_path = prepare_inputs(scenario, pages, seed, images_per_page)
+    config = {
+        "scenario": scenario,
+        "input_path": input_path,
+        "pages": pages,
+        "max_concurrency": max_concurrency,
+        "trace_python_memory": trace_python_memory
+    }
+    server = FakeOpenAIServer(settings).start()
+    try:
+        with tempfile.TemporaryDirectory(prefix="bench-cache-") as cache_dir:
+            env = {
+                **os.environ,
+                "OPENAI_BASE_URL": server.base_url,
+                "OPENAI_API_BASE": server.base_url,
+                "OPENAI_API_KEY": "sk-benchmark",
+                # An empty page cache and artifact store per run, so no run is answered by an earlier one
+                "PAGE_CACHE_PATH": os.path.join(cache_dir, "page_cache.sqlite3"),
+                "ARTIFACT_STORE_PATH": os.path.join(cache_dir, "artifacts")
+            }
+            child = subprocess.run(
+                [sys.executable, os.path.abspath(__file__), "--child", json.dumps(config)],
+                cwd=ROOT, env=env, capture_output=True, text=True
+            )
+        if child.returncode != 0:
+            measurements = {"success": False, "error": child.stderr.strip().splitlines()[-1] if child.stderr.strip() else f"exit {child.returncode}"}
+        else:
+            measurements = json.loads(child.stdout.strip().splitlines()[-1])
+    finally:
+        server.stop()
+    return {
+        **git_revision(),
+        "timestamp": time.time(),
+        "scenario": scenario,
+        "pages": pages,
+        "images_per_page": images_per_page,
+        "max_concurrency": max_concurrency,
+        "fake_api": {k: v for k, v in vars(settings).items() if k != "seed"},
+        "api_stats": server.snapshot(),
+        **measurements
+    }
+
+def _key(record: Dict[str, Any]) -> Tuple:
+    """Records with the same key measured the same workload and can be compared across commits."""
+    return (record["scenario"], record["pages"], record["images_per_page"], record["max_concurrency"], json.dumps(record["fake_api"], sort_keys=True))
+
+def load_results(path: str = RESULTS_PATH) -> List[Dict[str, Any]]:
+    if not os.path.exists(path):
+        return []
+    with open(path) as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+def _median(records: List[Dict[str, Any]], field: str) -> float:
+    values = [r[field] for r in records if r.get("success") and r.get(field) is not None]
+    return statistics.median(values) if values else float("nan")
+
+def print_table(records: List[Dict[str, Any]], baseline: List[Dict[str, Any]]) -> None:
+    groups: Dict[Tuple, List[Dict[str, Any]]] = {}
+    for record in records:
+        groups.setdefault(_key(record), []).append(record)
+    base_groups: Dict[Tuple, List[Dict[str, Any]]] = {}
+    for record in baseline:
+        base_groups.setdefault(_key(record), []).append(record)
+
+    print(f"{'scenario':<10} {'pages':>5} {'runs':>4} {'seconds':>9} {'pages/s':>8} {'p50 page':>9} {'p90 page':>9} {'rss MB':>8} {'vs base':>8}")
+    for key, group in groups.items():
+        seconds = _median(group, "seconds")
+        ok = [r for r in group if r.get("success")]
+        p50 = statistics.median(r["page_seconds"]["p50"] for r in ok) if ok else float("nan")
+        p90 = statistics.median(r["page_seconds"]["p90"] for r in ok) if ok else float("nan")
+        change = ""
+        if key in base_groups:
+            base_seconds = _median(base_groups[key], "seconds")
+            change = f"{(seconds / base_seconds - 1):+.1%}" if base_seconds == base_seconds and base_seconds else ""
+        print(f"{key[0]:<10} {key[1]:>5} {len(ok)}/{len(group):<2} {seconds:>9.2f} {_median(group, 'pages_per_second'):>8.2f} "
+              f"{p50:>9.3f} {p90:>9.3f} {_median(group, 'peak_rss_mb'):>8.1f} {change:>8}")
+        for record in group:
+            if not record.get("success"):
+                print(f"    failed: {record.get('error')}")
+
+def main():
+    """
+    Benchmark the conversion graphs offline against a local fake OpenAI API.
+
+    Example: python benchmark.py --scenarios native ocr --pages 10 50 --latency 0.8 --rate-limit-rate 0.05 --repeat 3
+    Results are appended to bench_results/results.jsonl with the git commit; --baseline COMMIT compares against an earlier one.
+    """
+    if len(sys.argv) == 3 and sys.argv[1] == "--child":
+        print(json.dumps(run_child(json.loads(sys.argv[2]))))
+        return
+
+    parser = argparse.ArgumentParser(description="Offline throughput and latency benchmark of the conversion pipelines")
+    parser.add_argument("--scenarios", nargs="+", choices=list(SCENARIOS), default=["native", "ocr"])
+    parser.add_argument("--pages", nargs="+", type=int, default=[10])
+    parser.add_argument("--images-per-page", type=int, default=1, help="Figures per page in synthetic DOCX files")
+    parser.add_argument("--repeat", type=int, default=1)
+    parser.add_argument("--max-concurrency", type=int, default=4)
+    parser.add_argument("--latency", type=float, default=FakeSettings.latency)
+    parser.add_argument("--jitter", type=float, default=FakeSettings.jitter)
+    parser.add_argument("--error-rate", type=float, default=FakeSettings.error_rate)
+    parser.add_argument("--rate-limit-rate", type=float, default=FakeSettings.rate_limit_rate)
+    parser.add_argument("--rpm-limit", type=int, default=FakeSettings.rpm_limit)
+    parser.add_argument("--retry-after", type=float, default=FakeSettings.retry_after)
+    parser.add_argument("--trace-python-memory", action="store_true", help="Also report the Python heap peak (slows the run)")
+    parser.add_argument("--baseline", default="", help="Commit whose recorded results to compare against")
+    parser.add_argument("--results", default=RESULTS_PATH)
+    args = parser.parse_args()
+
+    settings = FakeSettings(
+        latency=args.latency,
+        jitter=args.jitter,
+        error_rate=args.error_rate,
+        rate_limit_rate=args.rate_limit_rate,
+        rpm_limit=args.rpm_limit,
+        retry_after=args.retry_after
+    )
+    records = []
+    for scenario in args.scenarios:
+        missing = missing_requirements(scenario)
+        if missing:
+            print(f"skipping {scenario}: missing {', '.join(missing)}", file=sys.stderr)
+            continue
+        for pages in args.pages:
+            for _ in range(args.repeat):
+                record = run_benchmark(scenario, pages, settings, args.max_concurrency, args.images_per_page,
+                                       trace_python_memory=args.trace_python_memory)
+                records.append(record)
+                os.makedirs(os.path.dirname(args.results), exist_ok=True)
+                with open(args.results, "a") as f:
+                    f.write(json.dumps(record) + "\n")
+
+    baseline = [r for r in load_results(args.results) if args.baseline and r["commit"] == args.baseline]
+    print_table(records, baseline)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,148 @@
+"""
+Thin command line client for the conversion worker (worker.py).
+
+Only the standard library is imported up front, so a conversion costs a
+process start plus one local HTTP request. When no worker is running, the
+document is converted in this process instead (importing the pipeline on
+demand), or with --spawn a worker is started in the background first.
+
+Example: python client.py test_files/test_updated.docx --mode fast
+"""
+import argparse
+import http.client
+import json
+import os
+import subprocess
+import sys
+import time
+from typing import Any, Dict, Iterator, Optional
+
+DEFAULT_HOST = os.getenv("DOCX_MARKDOWN_WORKER_HOST", "127.0.0.1")
+DEFAULT_PORT = int(os.getenv("DOCX_MARKDOWN_WORKER_PORT", "8766"))
+SPAWN_TIMEOUT = 60.0
+
+def health(host: str, port: int, timeout: float = 2.0) -> Optional[Dict[str, Any]]:
+    """Return the worker's health report, or None when no worker answers."""
+    connection = http.client.HTTPConnection(host, port, timeout=timeout)
+    try:
+        connection.request("GET", "/health")
+        return json.loads(connection.getresponse().read())
+    except (OSError, ValueError):
+        return None
+    finally:
+        connection.close()
+
+def spawn_worker(host: str, port: int, timeout: float = SPAWN_TIMEOUT) -> bool:
+    """Start a detached worker and wait until it is warm; returns whether it came up."""
+    worker = os.path.join(os.path.dirname(os.path.abspath(__file__)), "worker.py")
+    subprocess.Popen(
+        [sys.executable, worker, "--host", host, "--port", str(port)],
+        stdin=subprocess.DEVNULL,
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+        start_new_session=True
+    )
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if health(host, port) is not None:
+            return True
+        time.sleep(0.2)
+    return False
+
+def submit(host: str, port: int, job: Dict[str, Any]) -> Iterator[Dict[str, Any]]:
+    """Send a job to the worker and yield its events as they arrive."""
+    connection = http.client.HTTPConnection(host, port)
+    try:
+        connection.request("POST", "/jobs", body=json.dumps(job), headers={"Content-Type": "application/json"})
+        response = connection.getresponse()
+        if response.status != 200:
+            yield {"event": "error", "error": json.loads(response.read() or b"{}").get("error", response.reason)}
+            return
+        for line in response:
+            if line.strip():
+                yield json.loads(line)
+    finally:
+        connection.close()
+
+def print_events(events: Iterator[Dict[str, Any]], stream: bool) -> int:
+    """Print job events the way main.py does; returns the exit code."""
+    exit_code = 1
+    for event in events:
+        if event["event"] == "page" and stream:
+            status = "ok" if event["success"] else f"failed: {event['error']}"
+            print(f"page {event['page_number']} ({event['pages_done']}/{event['page_count'] or '?'}) {status}", file=sys.stderr)
+        elif event["event"] == "done":
+            result = event["state"]
+            if stream:
+                first_page = event["time_to_first_page"]
+                print(f"first page after {first_page:.2f}s" if first_page is not None else "no pages produced", file=sys.stderr)
+                print(f"total {event['total_seconds']:.2f}s", file=sys.stderr)
+            print(result.get("markdown_path") or result.get("error") or result.get("final_message", ""))
+            exit_code = 1 if result.get("error") else 0
+        elif event["event"] == "metrics":
+            print(f"metrics: {event['report']}, {event['prometheus']}", file=sys.stderr)
+        elif event["event"] == "error":
+            print(f"An error occurred: {event['error']}")
+    return exit_code
+
+def run_local(args: argparse.Namespace) -> int:
+    """Convert in this process, paying the pipeline's import and warm-up cost once; returns the exit code."""
+    import asyncio
+    import main
+    result = asyncio.run(main.main(args.input_path, args.mode, args.png_dir, native=not args.no_native, stream=args.stream, metrics_dir=args.metrics_dir, resume=not args.no_resume))
+    return 1 if result.get("error") else 0
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Convert a DOCX document to Markdown through the warm worker")
+    parser.add_argument("input_path", nargs="?", default="./test_files/test_updated.docx")
+    parser.add_argument("--mode", choices=["agentic", "fast", "in-memory"], default="agentic")
+    parser.add_argument("--png-dir", default="", help="in-memory mode: also save page PNGs to this directory")
+    parser.add_argument("--no-native", action="store_true", help="fast/in-memory modes: always rasterize")
+    parser.add_argument("--stream", action="store_true", help="report each page as it completes on stderr")
+    parser.add_argument("--metrics-dir", default="", help="where to write the run report (default: the document's job directory)")
+    parser.add_argument("--no-resume", action="store_true", help="convert from scratch even if an interrupted earlier run left a journal")
+    parser.add_argument("--priority", choices=["interactive", "batch"], default="interactive",
+                        help="queue position of the job's LLM calls on the worker")
+    parser.add_argument("--host", default=DEFAULT_HOST)
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT)
+    parser.add_argument("--spawn", action="store_true", help="start a background worker when none is running")
+    parser.add_argument("--local", action="store_true", help="convert in this process without contacting a worker")
+    parser.add_argument("--status", action="store_true", help="print the worker's health report and exit")
+    parser.add_argument("--stop", action="store_true", help="stop the running worker and exit")
+    args = parser.parse_args()
+
+    if args.status:
+        report = health(args.host, args.port)
+        print(json.dumps(report, indent=2) if report else f"no worker on {args.host}:{args.port}")
+        return 0 if report else 1
+    if args.stop:
+        connection = http.client.HTTPConnection(args.host, args.port, timeout=5)
+        try:
+            connection.request("POST", "/shutdown")
+            connection.getresponse().read()
+        except OSError:
+            print(f"no worker on {args.host}:{args.port}")
+            return 1
+        finally:
+            connection.close()
+        return 0
+
+    if args.local:
+        return run_local(args)
+    if health(args.host, args.port) is None and not (args.spawn and spawn_worker(args.host, args.port)):
+        return run_local(args)
+
+    # The worker may run in another directory, so paths are sent absolute
+    job = {
+        "input_path": os.path.abspath(args.input_path),
+        "mode": args.mode,
+        "native": not args.no_native,
+        "png_dir": os.path.abspath(args.png_dir) if args.png_dir else "",
+        "metrics_dir": os.path.abspath(args.metrics_dir) if args.metrics_dir else "",
+        "priority": args.priority,
+        "resume": not args.no_resume
+    }
+    return print_events(submit(args.host, args.port, job), args.stream)
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,259 @@
+import os
+import sys
+import time
+import queue
+import shutil
+import socket
+import atexit
+import tempfile
+import threading
+import subprocess
+from typing import List, Optional
+
+# DOCX_PDF_BACKEND selects the converter: "docx2pdf" (Microsoft Word), "libreoffice" or "auto"
+DEFAULT_BACKEND = os.getenv("DOCX_PDF_BACKEND", "auto")
+DEFAULT_POOL_SIZE = int(os.getenv("LIBREOFFICE_WORKERS", "2"))
+DEFAULT_JOB_TIMEOUT = float(os.getenv("LIBREOFFICE_JOB_TIMEOUT", "120"))
+# Each office process is restarted after this many conversions to bound leaks and fragmentation
+DEFAULT_MAX_JOBS = int(os.getenv("LIBREOFFICE_MAX_JOBS", "200"))
+STARTUP_TIMEOUT = 60.0
+
+class ConversionError(Exception):
+    pass
+
+class ConversionTimeout(ConversionError):
+    pass
+
+class Docx2PdfBackend:
+    """
+    Convert through Microsoft Word via docx2pdf (Windows and macOS only).
+
+    Every conversion drives the one Word application and quits it afterwards,
+    so conversions are serialized: a second session at once fails, or has its
+    Word quit under it.
+    """
+
+    name = "docx2pdf"
+    _word_lock = threading.Lock()
+
+    def convert(self, docx_path: str, pdf_path: str) -> None:
+        from docx2pdf import convert as docx2pdf_convert
+        try:
+            # Word automation over COM needs COM initialized on the calling thread
+            import pythoncom
+            pythoncom.CoInitialize()
+        except ImportError:
+            pass
+        with self._word_lock:
+            docx2pdf_convert(docx_path, pdf_path)
+
+    def close(self) -> None:
+        pass
+
+def find_soffice() -> str:
+    """Locate the LibreOffice executable, honouring SOFFICE_PATH."""
+    for candidate in (os.getenv("SOFFICE_PATH"), "soffice", "libreoffice",
+                      "/usr/lib/libreoffice/program/soffice",
+                      "/Applications/LibreOffice.app/Contents/MacOS/soffice"):
+        if candidate and shutil.which(candidate):
+            return shutil.which(candidate)
+    raise ConversionError("LibreOffice (soffice) not found; install it or set SOFFICE_PATH")
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+def _file_url(path: str) -> str:
+    import uno
+    return uno.systemPathToFileUrl(os.path.abspath(path))
+
+def _property(name: str, value):
+    from com.sun.star.beans import PropertyValue
+    prop = PropertyValue()
+    prop.Name, prop.Value = name, value
+    return prop
+
+class OfficeWorker:
+    """
+    One long-lived headless LibreOffice process, driven over a UNO socket.
+
+    Every worker has its own user profile directory, since LibreOffice only
+    allows one running instance per profile.
+    """
+
+    def __init__(self, soffice: str, worker_id: int, max_jobs: int = DEFAULT_MAX_JOBS):
+        self.soffice = soffice
+        self.worker_id = worker_id
+        self.max_jobs = max_jobs
+        self.process: Optional[subprocess.Popen] = None
+        self.desktop = None
+        self.jobs = 0
+        self.profile_dir = ""
+
+    def start(self) -> None:
+        import uno
+        from com.sun.star.connection import NoConnectException
+
+        self.profile_dir = tempfile.mkdtemp(prefix=f"soffice-worker-{self.worker_id}-")
+        port = _free_port()
+        self.process = subprocess.Popen([
+            self.soffice,
+            "--headless", "--invisible", "--nologo", "--nodefault", "--norestore", "--nolockcheck",
+            f"-env:UserInstallation={uno.systemPathToFileUrl(self.profile_dir)}",
+            f"--accept=socket,host=127.0.0.1,port={port};urp;StarOffice.ComponentContext"
+        ], stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+
+        local_context = uno.getComponentContext()
+        resolver = local_context.ServiceManager.createInstanceWithContext("com.sun.star.bridge.UnoUrlResolver", local_context)
+        deadline = time.monotonic() + STARTUP_TIMEOUT
+        while True:
+            try:
+                context = resolver.resolve(f"uno:socket,host=127.0.0.1,port={port};urp;StarOffice.ComponentContext")
+                break
+            except NoConnectException:
+                if self.process.poll() is not None or time.monotonic() > deadline:
+                    self.stop()
+                    raise ConversionError(f"LibreOffice worker {self.worker_id} did not start")
+                time.sleep(0.25)
+        self.desktop = context.ServiceManager.createInstanceWithContext("com.sun.star.frame.Desktop", context)
+        self.jobs = 0
+
+    def healthy(self) -> bool:
+        """Check that the process is alive and still answers over the bridge."""
+        if self.process is None or self.process.poll() is not None or self.desktop is None:
+            return False
+        try:
+            self.desktop.getComponents()
+            return True
+        except Exception:
+            return False
+
+    def convert(self, docx_path: str, pdf_path: str, timeout: float) -> None:
+        # A hung conversion blocks the UNO call; killing the process is the only way to interrupt it
+        timed_out = threading.Event()
+        def kill():
+            timed_out.set()
+            if self.process is not None:
+                self.process.kill()
+        timer = threading.Timer(timeout, kill)
+        timer.start()
+        document = None
+        try:
+            document = self.desktop.loadComponentFromURL(_file_url(docx_path), "_blank", 0, (_property("Hidden", True),))
+            if document is None:
+                raise ConversionError(f"LibreOffice could not open {docx_path}")
+            document.storeToURL(_file_url(pdf_path), (_property("FilterName", "writer_pdf_Export"),))
+        except Exception as e:
+            if timed_out.is_set():
+                raise ConversionTimeout(f"Conversion of {docx_path} exceeded {timeout:.0f}s") from e
+            raise
+        finally:
+            timer.cancel()
+            self.jobs += 1
+            if document is not None and not timed_out.is_set():
+                try:
+                    document.close(True)
+                except Exception:
+                    pass
+
+    @property
+    def exhausted(self) -> bool:
+        return self.jobs >= self.max_jobs
+
+    def stop(self) -> None:
+        if self.process is not None and self.process.poll() is None:
+            try:
+                if self.desktop is not None:
+                    self.desktop.terminate()
+                self.process.wait(timeout=10)
+            except Exception:
+                self.process.kill()
+                self.process.wait()
+        self.process = None
+        self.desktop = None
+        if self.profile_dir:
+            shutil.rmtree(self.profile_dir, ignore_errors=True)
+            self.profile_dir = ""
+
+    def restart(self) -> None:
+        self.stop()
+        self.start()
+
+class LibreOfficePool:
+    """
+    A fixed pool of warm headless LibreOffice workers.
+
+    Workers start lazily on first use and are then reused, so no document pays
+    the office startup cost. A worker is health-checked before each job and
+    restarted when it is dead, after a timeout or error, and after `max_jobs`
+    conversions. Throughput scales with `size` since each worker converts one
+    document at a time.
+    """
+
+    name = "libreoffice"
+
+    def __init__(self, size: int = DEFAULT_POOL_SIZE, job_timeout: float = DEFAULT_JOB_TIMEOUT, max_jobs: int = DEFAULT_MAX_JOBS):
+        try:
+            import uno  # noqa: F401
+        except ImportError:
+            raise ConversionError("The LibreOffice backend needs the UNO Python bindings (python3-uno) importable by this interpreter")
+        soffice = find_soffice()
+        self.job_timeout = job_timeout
+        self.workers: List[OfficeWorker] = [OfficeWorker(soffice, i, max_jobs) for i in range(max(1, size))]
+        self.idle: "queue.Queue[OfficeWorker]" = queue.Queue()
+        for worker in self.workers:
+            self.idle.put(worker)
+        self.closed = False
+
+    def convert(self, docx_path: str, pdf_path: str) -> None:
+        if self.closed:
+            raise ConversionError("Converter pool is closed")
+        worker = self.idle.get()
+        try:
+            if not worker.healthy() or worker.exhausted:
+                worker.restart()
+            try:
+                worker.convert(docx_path, pdf_path, self.job_timeout)
+            except Exception:
+                # The process may be wedged or dead; the next job gets a fresh one
+                worker.stop()
+                raise
+        finally:
+            self.idle.put(worker)
+
+    def close(self) -> None:
+        self.closed = True
+        for worker in self.workers:
+            worker.stop()
+
+_backend = None
+_backend_lock = threading.Lock()
+
+def create_backend(name: str = DEFAULT_BACKEND, **options):
+    """Create a converter backend by name; "auto" means Word where it exists, LibreOffice elsewhere."""
+    if name == "auto":
+        name = "docx2pdf" if sys.platform in ("win32", "darwin") else "libreoffice"
+    if name == "docx2pdf":
+        return Docx2PdfBackend()
+    if name == "libreoffice":
+        return LibreOfficePool(**options)
+    raise ValueError(f"Unknown DOCX->PDF backend: {name}")
+
+def get_backend():
+    """Return the process-wide converter backend, created on first use and shut down at exit."""
+    global _backend
+    with _backend_lock:
+        if _backend is None:
+            _backend = create_backend()
+            atexit.register(_backend.close)
+        return _backend
+
+def set_backend(backend) -> None:
+    """Replace the process-wide converter backend, closing the previous one."""
+    global _backend
+    with _backend_lock:
+        if _backend is not None:
+            _backend.close()
+        _backend = backend
+        atexit.register(backend.close)
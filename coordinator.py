@@ -1,13 +1,11 @@
-import os
-from typing import List, Dict, Any
-from langchain_core.messages import BaseMessage, HumanMessage, SystemMessage, AIMessage
-from langchain_openai import ChatOpenAI
-from langchain.tools import Tool
-from tools import (
-    docx_to_pdf_converter,
-    pdf_to_png_converter,
-    png_to_markdown_converter
-)
+from typing import Dict, Any
+from functools import lru_cache
+from langchain_core.messages import HumanMessage, SystemMessage
+from state import DocumentState
+from tools import TOOLS, TOOL_STEPS
+from llm_scheduler import chat_model, get_scheduler
+
+COORDINATOR_MODEL = "gpt-4"
 
 SYSTEM_PROMPT = """
 You are an expert at document processing and can convert documents from .docx format to .Markdown format using the tools at your disposal.
@@ -20,106 +18,55 @@ Follow these steps:
 3. Convert the PNG files to Markdown using png_to_markdown_converter
 
 Check the success status of each conversion before proceeding to the next step.
+Artifact paths produced by earlier steps are tracked for you and filled into the tool arguments automatically.
+Once every step has succeeded, reply with the path of the Markdown file and do not call any more tools.
 
 Current Progress:
 {scratch_pad}
 """
 
-def coordinator(state: List[BaseMessage], scratch_pad: Dict[str, Any] = None) -> List[BaseMessage]:
+STEP_ORDER = list(TOOL_STEPS.values())
+
+def format_scratch_pad(state: DocumentState) -> str:
+    """Render a bounded progress summary of the run for the coordinator prompt."""
+    step_status = state.get("step_status", {})
+    completed_steps = [step for step in STEP_ORDER if step_status.get(step) == "success"]
+    current_step = next((step for step in STEP_ORDER if step not in completed_steps), "complete")
+    return "\n".join([
+        f"- Completed Steps: {', '.join(completed_steps) if completed_steps else 'None'}",
+        f"- Current Step: {current_step}",
+        f"- Last Result: {state.get('last_result')}"
+    ])
+
+@lru_cache(maxsize=None)
+def coordinator_llm():
+    """The coordinator model with the tools bound, built once per process and shared by every step."""
+    return chat_model(COORDINATOR_MODEL).bind_tools(TOOLS)
+
+def coordinator(state: DocumentState) -> Dict[str, Any]:
     """
     Coordinate the document processing workflow using LLM.
-    Uses scratch_pad to track progress and previous results.
-    Returns the state with the LLM's complete response appended.
+    The prompt carries only the input path and a bounded progress summary built
+    from the typed state, never the full transcript of earlier steps.
+    Returns either the next tool call or the coordinator's final message.
     """
     try:
-        # Initialize scratch_pad if None
-        if scratch_pad is None:
-            scratch_pad = {
-                "completed_steps": [],
-                "current_step": "start",
-                "last_result": None
-            }
-        
-        # Initialize tools with descriptions from their docstrings
-        tools = [
-            Tool(
-                func=docx_to_pdf_converter,
-                name="docx_to_pdf_converter",
-                description=(docx_to_pdf_converter.__doc__ or "Convert DOCX file to PDF format").strip()
-            ),
-            Tool(
-                func=pdf_to_png_converter,
-                name="pdf_to_png_converter",
-                description=(pdf_to_png_converter.__doc__ or "Convert PDF file to PNG images").strip()
-            ),
-            Tool(
-                func=png_to_markdown_converter,
-                name="png_to_markdown_converter",
-                description=(png_to_markdown_converter.__doc__ or "Convert PNG files to Markdown format").strip()
-            )
-        ]
-
-        # Initialize LLM with bound tools
-        llm_with_tools = ChatOpenAI(model="gpt-4").bind_tools(tools)
-        
-        # Get input path and validate if this is the first message
-        if len(state) == 1:
-            input_path = state[0].content.strip()
-            if not input_path.endswith('.docx'):
-                return state + [HumanMessage(content="Error: Input must be a path to a .docx file")]
-            output_dir = os.path.dirname(input_path)
-        else:
-            # For subsequent messages, get the paths from the first message
-            input_path = state[0].content.strip()
-            output_dir = os.path.dirname(input_path)
-        
-        # Update scratch_pad based on the last message if it contains a tool result
-        if len(state) > 1:
-            try:
-                last_result = eval(state[-1].content)
-                if isinstance(last_result, dict) and "success" in last_result:
-                    scratch_pad["last_result"] = last_result
-                    if last_result["success"]:
-                        # Determine which step was completed based on the result type
-                        if "pdf_path" in last_result:
-                            scratch_pad["completed_steps"].append("docx_to_pdf")
-                            scratch_pad["current_step"] = "pdf_to_png"
-                        elif "png_paths" in last_result:
-                            scratch_pad["completed_steps"].append("pdf_to_png")
-                            scratch_pad["current_step"] = "png_to_markdown"
-                        elif "markdown_path" in last_result:
-                            scratch_pad["completed_steps"].append("png_to_markdown")
-                            scratch_pad["current_step"] = "complete"
-            except:
-                pass  # If we can't parse the last message as a result, continue without updating scratch_pad
+        input_path = state["input_path"].strip()
+        if not input_path.endswith('.docx'):
+            return {"tool_call": None, "error": "Input must be a path to a .docx file"}
         
-        # Format scratch pad for prompt
-        scratch_pad_text = "\n".join([
-            f"- Completed Steps: {', '.join(scratch_pad['completed_steps']) if scratch_pad['completed_steps'] else 'None'}",
-            f"- Current Step: {scratch_pad['current_step']}",
-            f"- Last Result: {scratch_pad['last_result']}"
-        ])
-        
-        # Execute LLM with system prompt (including scratch pad) and conversation history
         messages = [
-            SystemMessage(content=SYSTEM_PROMPT.format(scratch_pad=scratch_pad_text)),
-            HumanMessage(content=f"Process the document at {input_path} with output directory {output_dir}")
+            SystemMessage(content=SYSTEM_PROMPT.format(scratch_pad=format_scratch_pad(state))),
+            HumanMessage(content=f"Process the document at {input_path} with output directory {state['output_dir']}")
         ]
         
-        # Add any additional context from previous messages
-        if len(state) > 1:
-            messages.extend(state[1:])
-        
-        result = llm_with_tools.invoke(messages)
-        
-        # Return the complete result including any tool calls
-        # Package the entire result (including tool_calls if present) as a JSON string
-        result_dict = {
-            "content": result.content,
-            "additional_kwargs": result.additional_kwargs
-        }
+        # Recorded as "coordinator" calls: pure overhead on top of the conversion steps
+        result = get_scheduler().invoke(coordinator_llm(), messages, purpose="coordinator", output_tokens=200)
         
-        return state + [HumanMessage(content=str(result_dict))]
+        if result.tool_calls:
+            tool_call = result.tool_calls[0]
+            return {"tool_call": {"name": tool_call["name"], "args": tool_call["args"]}}
+        return {"tool_call": None, "final_message": result.content}
         
     except Exception as e:
-        return state + [HumanMessage(content=f"Error in coordination: {str(e)}")] 
\ No newline at end of file
+        return {"tool_call": None, "error": f"Error in coordination: {str(e)}"}
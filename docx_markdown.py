@@ -0,0 +1,513 @@
+import os
+import re
+import io
+import zipfile
+import posixpath
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, Tuple
+from lxml import etree
+
+W = "http://schemas.openxmlformats.org/wordprocessingml/2006/main"
+M = "http://schemas.openxmlformats.org/officeDocument/2006/math"
+R = "http://schemas.openxmlformats.org/officeDocument/2006/relationships"
+A = "http://schemas.openxmlformats.org/drawingml/2006/main"
+V = "urn:schemas-microsoft-com:vml"
+PKG_RELS = "http://schemas.openxmlformats.org/package/2006/relationships"
+NS = {"w": W, "m": M, "r": R, "a": A, "v": V, "rel": PKG_RELS}
+
+# Image formats the vision model accepts directly; other raster formats are converted to PNG first
+VISION_IMAGE_TYPES = {".png": "image/png", ".jpg": "image/jpeg", ".jpeg": "image/jpeg", ".gif": "image/gif", ".webp": "image/webp"}
+RASTER_IMAGE_TYPES = {".bmp", ".tif", ".tiff"}
+
+IMAGE_PLACEHOLDER = "<!--docx-image:{index}-->"
+
+VERT_ALIGN_TAGS = {"subscript": "sub", "superscript": "sup"}
+# Markup with no visible content of its own; every other unknown element sends the document to rasterization
+RUN_IGNORED = {"rPr", "lastRenderedPageBreak", "fldChar", "instrText", "delText", "delInstrText",
+               "commentReference", "annotationRef", "softHyphen"}
+INLINE_IGNORED = {"pPr", "bookmarkStart", "bookmarkEnd", "proofErr", "permStart", "permEnd", "del", "moveFrom",
+                  "commentRangeStart", "commentRangeEnd", "moveFromRangeStart", "moveFromRangeEnd",
+                  "moveToRangeStart", "moveToRangeEnd"}
+# Wrappers whose content is rendered like the paragraph's own runs
+INLINE_CONTAINERS = {"ins", "moveTo", "smartTag", "fldSimple", "customXml", "dir", "bdo"}
+BLOCK_IGNORED = {"sectPr", "bookmarkStart", "bookmarkEnd", "proofErr", "permStart", "permEnd",
+                 "commentRangeStart", "commentRangeEnd", "moveFromRangeStart", "moveFromRangeEnd",
+                 "moveToRangeStart", "moveToRangeEnd"}
+
+class UnsupportedContent(Exception):
+    """Raised for document content the native parser cannot render faithfully."""
+
+@dataclass
+class EmbeddedImage:
+    index: int
+    name: str
+    data: bytes
+    mime_type: str
+
+@dataclass
+class NativeConversion:
+    """Markdown produced from the DOCX package, with images still to be transcribed."""
+    markdown: str = ""
+    images: List[EmbeddedImage] = field(default_factory=list)
+    # Reasons the document must go through rasterization instead; empty when the native result is complete
+    unsupported: List[str] = field(default_factory=list)
+
+    @property
+    def needs_rasterization(self) -> bool:
+        return bool(self.unsupported)
+
+def _w(name: str) -> str:
+    return f"{{{W}}}{name}"
+
+def _m(name: str) -> str:
+    return f"{{{M}}}{name}"
+
+def _val(element: Optional[etree._Element], attribute: str = "val", ns: str = W) -> Optional[str]:
+    if element is None:
+        return None
+    return element.get(f"{{{ns}}}{attribute}")
+
+# --- OMML -> LaTeX -----------------------------------------------------------
+
+NARY_SYMBOLS = {"∑": r"\sum", "∏": r"\prod", "∐": r"\coprod", "∫": r"\int", "∬": r"\iint",
+                "∭": r"\iiint", "∮": r"\oint", "⋃": r"\bigcup", "⋂": r"\bigcap"}
+ACCENTS = {"\u0302": r"\hat", "\u0303": r"\tilde", "\u0307": r"\dot", "\u0308": r"\ddot",
+           "\u20d7": r"\vec", "\u0304": r"\bar", "\u030c": r"\check", "\u0301": r"\acute", "\u0300": r"\grave"}
+DELIMITERS = {"{": r"\{", "}": r"\}", "〈": r"\langle", "〉": r"\rangle", "⟨": r"\langle", "⟩": r"\rangle",
+              "|": "|", "‖": r"\|", "⌊": r"\lfloor", "⌋": r"\rfloor", "⌈": r"\lceil", "⌉": r"\rceil", "": "."}
+LATEX_ESCAPES = {"{": r"\{", "}": r"\}", "%": r"\%", "#": r"\#", "&": r"\&", "$": r"\$"}
+KNOWN_FUNCTIONS = {"sin", "cos", "tan", "cot", "sec", "csc", "log", "ln", "exp", "lim", "max", "min",
+                   "sinh", "cosh", "tanh", "arg", "det", "sup", "inf", "arcsin", "arccos", "arctan"}
+# Function names are typeset upright, whether a run holds just the name or also its argument ("max\u2061(0,")
+FUNCTION_NAME = re.compile(r"(?<![A-Za-z])(" + "|".join(sorted(KNOWN_FUNCTIONS, key=len, reverse=True)) + r")(?![A-Za-z])")
+# Property and control elements that carry no content
+OMML_IGNORED = {"rPr", "ctrlPr", "fPr", "sSupPr", "sSubPr", "sSubSupPr", "sPrePr", "radPr", "dPr", "naryPr",
+                "funcPr", "accPr", "barPr", "limLowPr", "limUppPr", "mPr", "mrPr", "eqArrPr", "boxPr",
+                "borderBoxPr", "oMathParaPr", "argPr"}
+
+def _omml_pr(element: etree._Element, pr: str, name: str) -> Optional[str]:
+    return _val(element.find(f"m:{pr}/m:{name}", NS), ns=M)
+
+def _omml_children(element: Optional[etree._Element]) -> str:
+    if element is None:
+        return ""
+    return "".join(omml_to_latex(child) for child in element)
+
+def _group(latex: str) -> str:
+    return latex if len(latex) == 1 else "{" + latex + "}"
+
+def omml_to_latex(element: etree._Element) -> str:
+    """
+    Convert an OMML element to LaTeX.
+
+    Only constructs with an unambiguous LaTeX equivalent are handled; anything
+    else raises UnsupportedContent so the caller can fall back to OCR.
+    """
+    if not isinstance(element.tag, str):
+        return ""  # Comments and processing instructions
+    ns, _, tag = element.tag[1:].partition("}")
+    if ns == W:
+        if tag in ("rPr", "bookmarkStart", "bookmarkEnd", "proofErr"):
+            return ""
+        raise UnsupportedContent(f"Word element w:{tag} inside an equation")
+    if ns != M:
+        raise UnsupportedContent(f"Foreign element {element.tag} inside an equation")
+    if tag in OMML_IGNORED:
+        return ""
+
+    if tag in ("oMath", "e", "num", "den", "sub", "sup", "deg", "lim", "fName"):
+        return _omml_children(element)
+    if tag == "r":
+        # U+2061 is the invisible "function application" character Word puts after function names
+        text = "".join(t.text or "" for t in element.findall("m:t", NS)).replace("\u2061", "")
+        text = "".join(LATEX_ESCAPES.get(c, c) for c in text)
+        return FUNCTION_NAME.sub(r"\\\1 ", text)
+    if tag == "f":
+        num, den = _omml_children(element.find("m:num", NS)), _omml_children(element.find("m:den", NS))
+        if _omml_pr(element, "fPr", "type") == "lin":
+            return f"{_group(num)}/{_group(den)}"
+        return f"\\frac{{{num}}}{{{den}}}"
+    if tag == "sSup":
+        return f"{_group(_omml_children(element.find('m:e', NS)))}^{{{_omml_children(element.find('m:sup', NS))}}}"
+    if tag == "sSub":
+        return f"{_group(_omml_children(element.find('m:e', NS)))}_{{{_omml_children(element.find('m:sub', NS))}}}"
+    if tag == "sSubSup":
+        base = _group(_omml_children(element.find("m:e", NS)))
+        return f"{base}_{{{_omml_children(element.find('m:sub', NS))}}}^{{{_omml_children(element.find('m:sup', NS))}}}"
+    if tag == "sPre":
+        sub, sup = _omml_children(element.find("m:sub", NS)), _omml_children(element.find("m:sup", NS))
+        return f"{{}}_{{{sub}}}^{{{sup}}}{_group(_omml_children(element.find('m:e', NS)))}"
+    if tag == "rad":
+        degree = _omml_children(element.find("m:deg", NS))
+        body = _omml_children(element.find("m:e", NS))
+        if _omml_pr(element, "radPr", "degHide") in ("1", "on", "true") or not degree:
+            return f"\\sqrt{{{body}}}"
+        return f"\\sqrt[{degree}]{{{body}}}"
+    if tag == "d":
+        begin = _omml_pr(element, "dPr", "begChr")
+        end = _omml_pr(element, "dPr", "endChr")
+        separator = _omml_pr(element, "dPr", "sepChr")
+        begin = "(" if begin is None else begin
+        end = ")" if end is None else end
+        separator = "," if separator is None else separator
+        parts = [_omml_children(e) for e in element.findall("m:e", NS)]
+        return f"\\left{DELIMITERS.get(begin, begin)}{separator.join(parts)}\\right{DELIMITERS.get(end, end)} "
+    if tag == "nary":
+        symbol = _omml_pr(element, "naryPr", "chr") or "∫"
+        if symbol not in NARY_SYMBOLS:
+            raise UnsupportedContent(f"n-ary operator {symbol!r}")
+        latex = NARY_SYMBOLS[symbol]
+        if _omml_pr(element, "naryPr", "subHide") not in ("1", "on", "true"):
+            sub = _omml_children(element.find("m:sub", NS))
+            if sub:
+                latex += f"_{{{sub}}}"
+        if _omml_pr(element, "naryPr", "supHide") not in ("1", "on", "true"):
+            sup = _omml_children(element.find("m:sup", NS))
+            if sup:
+                latex += f"^{{{sup}}}"
+        return f"{latex} {_omml_children(element.find('m:e', NS))}"
+    if tag == "func":
+        return f"{_omml_children(element.find('m:fName', NS))}{_omml_children(element.find('m:e', NS))}"
+    if tag == "limLow":
+        return f"{_group(_omml_children(element.find('m:e', NS)))}_{{{_omml_children(element.find('m:lim', NS))}}}"
+    if tag == "limUpp":
+        return f"{_group(_omml_children(element.find('m:e', NS)))}^{{{_omml_children(element.find('m:lim', NS))}}}"
+    if tag == "acc":
+        accent = _omml_pr(element, "accPr", "chr") or "\u0302"
+        if accent not in ACCENTS:
+            raise UnsupportedContent(f"accent {accent!r}")
+        return f"{ACCENTS[accent]}{{{_omml_children(element.find('m:e', NS))}}}"
+    if tag == "bar":
+        command = r"\underline" if _omml_pr(element, "barPr", "pos") == "bot" else r"\overline"
+        return f"{command}{{{_omml_children(element.find('m:e', NS))}}}"
+    if tag in ("box", "borderBox"):
+        return _omml_children(element.find("m:e", NS))
+    if tag == "m":
+        rows = [" & ".join(_omml_children(e) for e in mr.findall("m:e", NS)) for mr in element.findall("m:mr", NS)]
+        return "\\begin{matrix}" + r" \\ ".join(rows) + "\\end{matrix}"
+    if tag == "eqArr":
+        rows = [_omml_children(e) for e in element.findall("m:e", NS)]
+        return "\\begin{aligned}" + r" \\ ".join(rows) + "\\end{aligned}"
+    raise UnsupportedContent(f"equation element m:{tag}")
+
+# --- DOCX package -------------------------------------------------------------
+
+class DocxPackage:
+    """Read access to the parts of a DOCX package needed to render its body."""
+
+    def __init__(self, docx_path: str):
+        self.zip = zipfile.ZipFile(docx_path)
+        self.document = etree.fromstring(self.zip.read("word/document.xml"))
+        self.relationships = self._read_relationships("word/_rels/document.xml.rels")
+        self.heading_styles, self.style_numbering = self._read_styles()
+        self.numbering_formats = self._read_numbering()
+
+    def _read_part(self, name: str) -> Optional[etree._Element]:
+        try:
+            return etree.fromstring(self.zip.read(name))
+        except KeyError:
+            return None
+
+    def _read_relationships(self, name: str) -> Dict[str, Tuple[str, str]]:
+        """Map relationship id -> (target, target mode)."""
+        rels = self._read_part(name)
+        if rels is None:
+            return {}
+        return {
+            rel.get("Id"): (rel.get("Target"), rel.get("TargetMode", "Internal"))
+            for rel in rels.findall("rel:Relationship", NS)
+        }
+
+    def _read_styles(self) -> Tuple[Dict[str, int], Dict[str, Tuple[str, str]]]:
+        """Return heading levels and list numbering (numId, ilvl) per paragraph style id."""
+        headings, numbering = {}, {}
+        styles = self._read_part("word/styles.xml")
+        if styles is None:
+            return headings, numbering
+        for style in styles.findall("w:style[@w:type='paragraph']", NS):
+            style_id = style.get(_w("styleId"))
+            name = (_val(style.find("w:name", NS)) or "").lower()
+            outline = _val(style.find("w:pPr/w:outlineLvl", NS))
+            match = re.fullmatch(r"heading (\d)", name)
+            if name == "title":
+                headings[style_id] = 1
+            elif match:
+                headings[style_id] = int(match.group(1))
+            elif outline is not None and outline.isdigit() and int(outline) < 9:
+                headings[style_id] = int(outline) + 1
+            num_pr = style.find("w:pPr/w:numPr", NS)
+            if num_pr is not None:
+                numbering[style_id] = (_val(num_pr.find("w:numId", NS)), _val(num_pr.find("w:ilvl", NS)) or "0")
+        return headings, numbering
+
+    def _read_numbering(self) -> Dict[Tuple[str, str], str]:
+        """Map (numId, ilvl) -> numFmt ("bullet", "decimal", ...)."""
+        numbering = self._read_part("word/numbering.xml")
+        if numbering is None:
+            return {}
+        abstract_formats = {}
+        for abstract in numbering.findall("w:abstractNum", NS):
+            for level in abstract.findall("w:lvl", NS):
+                abstract_formats[(abstract.get(_w("abstractNumId")), level.get(_w("ilvl")))] = _val(level.find("w:numFmt", NS)) or "decimal"
+        formats = {}
+        for num in numbering.findall("w:num", NS):
+            abstract_id = _val(num.find("w:abstractNumId", NS))
+            for (abstract, ilvl), num_format in abstract_formats.items():
+                if abstract == abstract_id:
+                    formats[(num.get(_w("numId")), ilvl)] = num_format
+        return formats
+
+    def read_media(self, rel_id: str) -> Tuple[str, bytes]:
+        target, mode = self.relationships.get(rel_id, (None, None))
+        if target is None or mode == "External":
+            raise UnsupportedContent(f"linked (external) image {rel_id}")
+        name = posixpath.normpath(posixpath.join("word", target)) if not target.startswith("/") else target.lstrip("/")
+        return name, self.zip.read(name)
+
+    def close(self) -> None:
+        self.zip.close()
+
+# --- Body rendering -----------------------------------------------------------
+
+class _Renderer:
+    def __init__(self, package: DocxPackage):
+        self.package = package
+        self.images: List[EmbeddedImage] = []
+        self.unsupported: List[str] = []
+
+    def unsupported_region(self, reason: str) -> str:
+        if reason not in self.unsupported:
+            self.unsupported.append(reason)
+        return ""
+
+    def image(self, rel_id: Optional[str]) -> str:
+        if not rel_id:
+            return self.unsupported_region("image without embedded data")
+        try:
+            name, data = self.package.read_media(rel_id)
+        except (UnsupportedContent, KeyError) as e:
+            return self.unsupported_region(str(e))
+        extension = os.path.splitext(name)[1].lower()
+        if extension in RASTER_IMAGE_TYPES:
+            from PIL import Image
+            with Image.open(io.BytesIO(data)) as image:
+                buffer = io.BytesIO()
+                image.save(buffer, "PNG")
+            data, mime_type = buffer.getvalue(), "image/png"
+        elif extension in VISION_IMAGE_TYPES:
+            mime_type = VISION_IMAGE_TYPES[extension]
+        else:
+            return self.unsupported_region(f"{extension or 'unknown'} image {name}")
+        index = len(self.images)
+        self.images.append(EmbeddedImage(index=index, name=name, data=data, mime_type=mime_type))
+        return IMAGE_PLACEHOLDER.format(index=index)
+
+    def equation(self, element: etree._Element, display: bool) -> str:
+        try:
+            if display:
+                latex = r" \\ ".join(omml_to_latex(m) for m in element.findall("m:oMath", NS))
+                return f"\n$$\n{latex}\n$$\n"
+            return f"${omml_to_latex(element)}$"
+        except UnsupportedContent as e:
+            return self.unsupported_region(str(e))
+
+    def runs(self, parent: etree._Element) -> str:
+        """Render the inline content of a paragraph (or hyperlink) with bold/italic and sub/superscript merged across runs."""
+        segments: List[Tuple[str, bool, bool, Optional[str]]] = []
+        output: List[str] = []
+
+        def flush():
+            output.append(_format_segments(segments))
+            segments.clear()
+
+        for child in parent:
+            if not isinstance(child.tag, str):
+                continue
+            _, _, tag = child.tag.rpartition("}")
+            if child.tag == _w("r"):
+                bold = _is_on(child.find("w:rPr/w:b", NS))
+                italic = _is_on(child.find("w:rPr/w:i", NS))
+                vert = VERT_ALIGN_TAGS.get(_val(child.find("w:rPr/w:vertAlign", NS)))
+                for part in child:
+                    if not isinstance(part.tag, str):
+                        continue
+                    _, _, part_tag = part.tag.rpartition("}")
+                    if part.tag == _w("t"):
+                        segments.append((part.text or "", bold, italic, vert))
+                    elif part.tag in (_w("tab"), _w("ptab")):
+                        segments.append(("\t", bold, italic, vert))
+                    elif part.tag == _w("noBreakHyphen"):
+                        segments.append(("-", bold, italic, vert))
+                    elif part.tag in (_w("br"), _w("cr")):
+                        segments.append(("  \n", False, False, None))
+                    elif part.tag in (_w("drawing"), _w("pict"), _w("object")):
+                        flush()
+                        output.append(self.drawing(part))
+                    elif part.tag == "{http://schemas.openxmlformats.org/markup-compatibility/2006}AlternateContent":
+                        flush()
+                        output.append(self.unsupported_region("alternate content (text box or shape)"))
+                    elif not (part.tag.startswith(f"{{{W}}}") and part_tag in RUN_IGNORED):
+                        # Footnote references, symbol-font characters and the like have no faithful rendering here
+                        output.append(self.unsupported_region(f"run content {part_tag}"))
+            elif child.tag == _w("hyperlink"):
+                flush()
+                text = self.runs(child)
+                target, _ = self.package.relationships.get(child.get(f"{{{R}}}id"), (None, None))
+                output.append(f"[{text}]({target})" if target and text else text)
+            elif child.tag == _w("sdt") or (child.tag.startswith(f"{{{W}}}") and tag in INLINE_CONTAINERS):
+                flush()
+                content = child.find("w:sdtContent", NS) if child.tag == _w("sdt") else child
+                output.append(self.runs(content) if content is not None else "")
+            elif child.tag == _m("oMath"):
+                flush()
+                output.append(self.equation(child, display=False))
+            elif child.tag == _m("oMathPara"):
+                flush()
+                output.append(self.equation(child, display=True))
+            elif not (child.tag.startswith(f"{{{W}}}") and tag in INLINE_IGNORED):
+                output.append(self.unsupported_region(f"inline content {tag}"))
+        flush()
+        return "".join(output)
+
+    def drawing(self, element: etree._Element) -> str:
+        if element.find(".//w:txbxContent", NS) is not None:
+            return self.unsupported_region("text box")
+        blip = element.find(".//a:blip", NS)
+        if blip is not None:
+            return self.image(blip.get(f"{{{R}}}embed"))
+        imagedata = element.find(".//v:imagedata", NS)
+        if imagedata is not None:
+            return self.image(imagedata.get(f"{{{R}}}id"))
+        return self.unsupported_region("drawing or embedded object")
+
+    def paragraph(self, p: etree._Element) -> str:
+        text = self.runs(p).strip()
+        if not text:
+            return ""
+        style = _val(p.find("w:pPr/w:pStyle", NS))
+        level = self.package.heading_styles.get(style)
+        outline = _val(p.find("w:pPr/w:outlineLvl", NS))
+        if level is None and outline is not None and outline.isdigit() and int(outline) < 9:
+            level = int(outline) + 1
+        if level:
+            return f"{'#' * min(level, 6)} {text}"
+
+        num_pr = p.find("w:pPr/w:numPr", NS)
+        numbering = None
+        if num_pr is not None:
+            numbering = (_val(num_pr.find("w:numId", NS)), _val(num_pr.find("w:ilvl", NS)) or "0")
+        elif style in self.package.style_numbering:
+            numbering = self.package.style_numbering[style]
+        if numbering and numbering[0] != "0":
+            num_format = self.package.numbering_formats.get(numbering, "bullet")
+            marker = "-" if num_format in ("bullet", "none") else "1."
+            return f"{'    ' * int(numbering[1])}{marker} {text}"
+        return text
+
+    def table(self, tbl: etree._Element) -> str:
+        rows = []
+        for tr in tbl.findall("w:tr", NS):
+            cells = []
+            for tc in tr.findall("w:tc", NS):
+                if tc.find("w:tblPr", NS) is not None or tc.find("w:tbl", NS) is not None:
+                    self.unsupported_region("nested table")
+                content = "<br>".join(filter(None, (self.paragraph(p) for p in tc.findall("w:p", NS))))
+                vmerge = tc.find("w:tcPr/w:vMerge", NS)
+                if vmerge is not None and _val(vmerge) != "restart":
+                    content = ""  # Continuation of a vertically merged cell
+                cells.append(content.replace("|", "\\|").replace("\n", " "))
+                span = _val(tc.find("w:tcPr/w:gridSpan", NS))
+                cells.extend([""] * (int(span) - 1 if span and span.isdigit() else 0))
+            rows.append(cells)
+        if not rows:
+            return ""
+        width = max(len(r) for r in rows)
+        rows = [r + [""] * (width - len(r)) for r in rows]
+        lines = ["| " + " | ".join(rows[0]) + " |", "|" + "---|" * width]
+        lines.extend("| " + " | ".join(r) + " |" for r in rows[1:])
+        return "\n".join(lines)
+
+    def blocks(self, container: etree._Element) -> List[str]:
+        blocks = []
+        for child in container:
+            if child.tag == _w("p"):
+                blocks.append(self.paragraph(child))
+            elif child.tag == _w("tbl"):
+                blocks.append(self.table(child))
+            elif child.tag == _w("sdt"):
+                content = child.find("w:sdtContent", NS)
+                if content is not None:
+                    blocks.extend(self.blocks(content))
+            elif child.tag == _m("oMathPara"):
+                blocks.append(self.equation(child, display=True))
+            elif child.tag == _w("customXml"):
+                blocks.extend(self.blocks(child))
+            elif isinstance(child.tag, str) and not (child.tag.startswith(f"{{{W}}}") and child.tag.rpartition("}")[2] in BLOCK_IGNORED):
+                blocks.append(self.unsupported_region(f"block content {child.tag.rpartition('}')[2]}"))
+        return blocks
+
+def _is_on(element: Optional[etree._Element]) -> bool:
+    return element is not None and _val(element) not in ("0", "false", "off")
+
+def _outside_spaces(text: str) -> Tuple[str, str, str]:
+    stripped = text.strip()
+    leading = text[:len(text) - len(text.lstrip())]
+    return leading, stripped, text[len(leading) + len(stripped):]
+
+def _format_segments(segments: List[Tuple[str, bool, bool, Optional[str]]]) -> str:
+    """
+    Merge runs with the same formatting, wrap sub/superscripts in <sub>/<sup> and
+    then runs of equal emphasis in markdown markers, keeping spaces outside both.
+    """
+    merged: List[List] = []
+    for text, bold, italic, vert in segments:
+        if merged and merged[-1][1:] == [bold, italic, vert]:
+            merged[-1][0] += text
+        else:
+            merged.append([text, bold, italic, vert])
+    emphasized: List[List] = []
+    for text, bold, italic, vert in merged:
+        leading, stripped, trailing = _outside_spaces(text)
+        if vert and stripped:
+            text = f"{leading}<{vert}>{stripped}</{vert}>{trailing}"
+        if emphasized and emphasized[-1][1:] == [bold, italic]:
+            emphasized[-1][0] += text
+        else:
+            emphasized.append([text, bold, italic])
+    output = []
+    for text, bold, italic in emphasized:
+        marker = ("**" if bold else "") + ("*" if italic else "")
+        leading, stripped, trailing = _outside_spaces(text)
+        if not marker or not stripped:
+            output.append(text)
+            continue
+        output.append(f"{leading}{marker}{stripped}{marker[::-1]}{trailing}")
+    return "".join(output)
+
+def convert_docx(docx_path: str) -> NativeConversion:
+    """
+    Render a DOCX package directly as markdown.
+
+    Text, headings, lists, tables, hyperlinks and equations with a LaTeX
+    equivalent are rendered natively. Embedded raster images are collected for
+    the vision model and marked with placeholders. Content with no faithful
+    rendering (text boxes, unsupported equation constructs, vector drawings,
+    linked images, footnotes, symbol-font characters and any other element the
+    renderer does not know) is listed in `unsupported`, meaning the document has to be
+    rasterized instead.
+    """
+    package = DocxPackage(docx_path)
+    try:
+        renderer = _Renderer(package)
+        body = package.document.find("w:body", NS)
+        blocks = renderer.blocks(body) if body is not None else []
+        markdown = "\n\n".join(block.strip("\n") for block in blocks if block.strip())
+        return NativeConversion(markdown=markdown + "\n", images=renderer.images, unsupported=renderer.unsupported)
+    finally:
+        package.close()
+
+def fill_images(markdown: str, image_markdown: Dict[int, str]) -> str:
+    """Replace image placeholders with the transcription of each image."""
+    for index, text in image_markdown.items():
+        markdown = markdown.replace(IMAGE_PLACEHOLDER.format(index=index), text.strip())
+    return markdown
@@ -0,0 +1,210 @@
+import re
+import json
+import time
+import random
+import hashlib
+import argparse
+import threading
+from collections import deque
+from dataclasses import dataclass, asdict
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, List, Optional
+
+# Tokens billed for one high-detail image tile set, roughly what the real API charges for a page
+IMAGE_TOKENS = 765
+
+@dataclass
+class FakeSettings:
+    """Behaviour of the stand-in API."""
+    latency: float = 0.5  # Mean seconds per completion
+    jitter: float = 0.2  # Latency is drawn uniformly from latency +/- jitter
+    error_rate: float = 0.0  # Share of requests answered with HTTP 500
+    rate_limit_rate: float = 0.0  # Share of requests answered with HTTP 429
+    rpm_limit: int = 0  # Requests per rolling minute before every request gets 429; 0 = unlimited
+    retry_after: float = 1.0  # Seconds sent in the Retry-After header of a 429
+    output_tokens: int = 300
+    seed: int = 0
+
+@dataclass
+class FakeStats:
+    requests: int = 0
+    completions: int = 0
+    rate_limited: int = 0
+    errors: int = 0
+    prompt_tokens: int = 0
+    completion_tokens: int = 0
+
+def _prompt_tokens(messages: List[Dict[str, Any]]) -> int:
+    tokens = 0
+    for message in messages:
+        content = message.get("content") or ""
+        parts = content if isinstance(content, list) else [{"type": "text", "text": content}]
+        for part in parts:
+            if part.get("type") == "image_url":
+                tokens += IMAGE_TOKENS
+            else:
+                tokens += len(part.get("text", "")) // 4
+    return tokens
+
+def _text_of(messages: List[Dict[str, Any]]) -> str:
+    texts = []
+    for message in messages:
+        content = message.get("content") or ""
+        if isinstance(content, list):
+            texts.extend(part.get("text", "") for part in content if part.get("type") == "text")
+        else:
+            texts.append(content)
+    return "\n".join(texts)
+
+def _coordinator_reply(body: Dict[str, Any]) -> Dict[str, Any]:
+    """Play the coordinator: call the tool for the step the prompt reports as current, or finish."""
+    text = _text_of(body.get("messages", []))
+    match = re.search(r"Current Step: (\w+)", text)
+    step = match.group(1) if match else "complete"
+    tools = {t["function"]["name"] for t in body.get("tools", [])}
+    tool_name = f"{step}_converter"
+    if step == "complete" or tool_name not in tools:
+        return {"role": "assistant", "content": "All steps completed."}
+    return {
+        "role": "assistant",
+        "content": None,
+        "tool_calls": [{
+            "id": f"call_{hashlib.sha1(text.encode()).hexdigest()[:12]}",
+            "type": "function",
+            "function": {"name": tool_name, "arguments": "{}"}
+        }]
+    }
+
+def _markdown_reply(body: Dict[str, Any], output_tokens: int) -> Dict[str, Any]:
+    """Deterministic markdown of roughly `output_tokens` tokens, distinct per request content."""
+    digest = hashlib.sha1(json.dumps(body.get("messages", []), sort_keys=True).encode()).hexdigest()
+    words = (f"word{digest[i % 40]}" for i in range(max(1, output_tokens * 3 // 4)))
+    return {"role": "assistant", "content": f"## Section {digest[:8]}\n\n" + " ".join(words)}
+
+class FakeOpenAIServer:
+    """
+    A local OpenAI-compatible /v1/chat/completions endpoint for offline benchmarks.
+
+    Answers vision and explanation requests with synthetic markdown and
+    coordinator requests (those offering tools) with the next tool call, after
+    a configurable latency, and injects 500s and 429s with Retry-After.
+    """
+
+    def __init__(self, settings: Optional[FakeSettings] = None, host: str = "127.0.0.1", port: int = 0):
+        self.settings = settings or FakeSettings()
+        self.stats = FakeStats()
+        self._lock = threading.Lock()
+        self._random = random.Random(self.settings.seed)
+        self._recent = deque()
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, *args):
+                pass
+
+            def do_POST(self):
+                body = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+                status, payload, headers = server.handle(self.path, body)
+                data = json.dumps(payload).encode()
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(data)))
+                for key, value in headers.items():
+                    self.send_header(key, value)
+                self.end_headers()
+                self.wfile.write(data)
+
+        self.httpd = ThreadingHTTPServer((host, port), Handler)
+        self.httpd.daemon_threads = True
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def base_url(self) -> str:
+        host, port = self.httpd.server_address[:2]
+        return f"http://{host}:{port}/v1"
+
+    def handle(self, path: str, body: Dict[str, Any]):
+        if not path.rstrip("/").endswith("/chat/completions"):
+            return 404, {"error": {"message": f"Unknown path {path}", "type": "invalid_request_error"}}, {}
+
+        with self._lock:
+            self.stats.requests += 1
+            now = time.monotonic()
+            while self._recent and now - self._recent[0] > 60:
+                self._recent.popleft()
+            over_limit = self.settings.rpm_limit and len(self._recent) >= self.settings.rpm_limit
+            roll = self._random.random()
+            delay = max(0.0, self.settings.latency + self._random.uniform(-self.settings.jitter, self.settings.jitter))
+            if over_limit or roll < self.settings.rate_limit_rate:
+                self.stats.rate_limited += 1
+                error = {"error": {"message": "Rate limit reached", "type": "requests", "code": "rate_limit_exceeded"}}
+                return 429, error, {"Retry-After": f"{self.settings.retry_after:g}"}
+            self._recent.append(now)
+
+        time.sleep(delay)
+        if roll < self.settings.rate_limit_rate + self.settings.error_rate:
+            with self._lock:
+                self.stats.errors += 1
+            return 500, {"error": {"message": "Injected server error", "type": "server_error"}}, {}
+
+        messages = body.get("messages", [])
+        if body.get("tools"):
+            message = _coordinator_reply(body)
+        else:
+            message = _markdown_reply(body, self.settings.output_tokens)
+        prompt_tokens = _prompt_tokens(messages)
+        completion_tokens = self.settings.output_tokens if message.get("content") else 20
+        with self._lock:
+            self.stats.completions += 1
+            self.stats.prompt_tokens += prompt_tokens
+            self.stats.completion_tokens += completion_tokens
+        return 200, {
+            "id": f"chatcmpl-{self.stats.requests}",
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": body.get("model", "fake"),
+            "choices": [{"index": 0, "message": message, "finish_reason": "tool_calls" if message.get("tool_calls") else "stop"}],
+            "usage": {"prompt_tokens": prompt_tokens, "completion_tokens": completion_tokens, "total_tokens": prompt_tokens + completion_tokens}
+        }, {}
+
+    def start(self) -> "FakeOpenAIServer":
+        self._thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+    def snapshot(self) -> Dict[str, int]:
+        with self._lock:
+            return asdict(self.stats)
+
+def main():
+    """Run the stand-in API in the foreground, e.g. to point a manual run at it with OPENAI_BASE_URL."""
+    parser = argparse.ArgumentParser(description="Local OpenAI-compatible stand-in for offline benchmarks")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--latency", type=float, default=FakeSettings.latency)
+    parser.add_argument("--jitter", type=float, default=FakeSettings.jitter)
+    parser.add_argument("--error-rate", type=float, default=FakeSettings.error_rate)
+    parser.add_argument("--rate-limit-rate", type=float, default=FakeSettings.rate_limit_rate)
+    parser.add_argument("--rpm-limit", type=int, default=FakeSettings.rpm_limit)
+    parser.add_argument("--retry-after", type=float, default=FakeSettings.retry_after)
+    args = parser.parse_args()
+    settings = FakeSettings(
+        latency=args.latency,
+        jitter=args.jitter,
+        error_rate=args.error_rate,
+        rate_limit_rate=args.rate_limit_rate,
+        rpm_limit=args.rpm_limit,
+        retry_after=args.retry_after
+    )
+    server = FakeOpenAIServer(settings, port=args.port)
+    print(f"Serving on {server.base_url}")
+    try:
+        server.httpd.serve_forever()
+    except KeyboardInterrupt:
+        server.stop()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,116 @@
+import os
+import json
+import hashlib
+from typing import Any, Dict, Optional
+
+JOURNAL_DIR = ".checkpoints"
+
+def journal_path_for(input_path: str, output_dir: str) -> str:
+    """Return where the run journal of `input_path` lives inside its output directory."""
+    doc_name = os.path.splitext(os.path.basename(input_path))[0]
+    return os.path.join(output_dir, JOURNAL_DIR, f"{doc_name}.jsonl")
+
+def file_fingerprint(path: str) -> str:
+    """Content hash of an input file; a journal written for other content is never resumed."""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+class RunJournal:
+    """
+    Append-only on-disk record of the finished stages and pages of one conversion run.
+
+    Every finished stage and every converted page is appended as one JSON line
+    and fsynced, so a run that dies part way can be resumed from its journal by
+    skipping what is already recorded. The first line holds the fingerprint of
+    the input and settings the journal belongs to. A run that completes
+    discards its journal.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self.fingerprint = ""
+        self.stages: Dict[str, Dict[str, Any]] = {}
+        self.pages: Dict[int, str] = {}
+        self._load()
+
+    def _load(self) -> None:
+        if not os.path.exists(self.path):
+            return
+        with open(self.path) as f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except json.JSONDecodeError:
+                    continue  # A torn final line from an interrupted run
+                kind = record.get("type")
+                if kind == "header":
+                    self.fingerprint = record.get("fingerprint", "")
+                elif kind == "stage":
+                    self.stages[record["stage"]] = record.get("artifacts", {})
+                elif kind == "page":
+                    self.pages[record["page"]] = record["markdown"]
+
+    def _append(self, record: Dict[str, Any]) -> None:
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        with open(self.path, "a") as f:
+            f.write(json.dumps(record) + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+
+    def reset(self, fingerprint: str) -> None:
+        """Discard all progress and start a journal for the input with `fingerprint`."""
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        with open(self.path, "w") as f:
+            f.write(json.dumps({"type": "header", "fingerprint": fingerprint}) + "\n")
+        self.fingerprint = fingerprint
+        self.stages, self.pages = {}, {}
+
+    def discard(self) -> None:
+        """Delete the journal, e.g. once its run has completed; only interrupted runs are resumed."""
+        try:
+            os.remove(self.path)
+        except FileNotFoundError:
+            pass
+        self.fingerprint = ""
+        self.stages, self.pages = {}, {}
+
+    def stage_artifacts(self, stage: str) -> Optional[Dict[str, Any]]:
+        """Return the artifacts of a finished stage, or None if it has to run (again)."""
+        artifacts = self.stages.get(stage)
+        if artifacts is None:
+            return None
+        # A stage whose files were deleted since is not finished any more
+        for value in artifacts.values():
+            paths = value if isinstance(value, list) else [value]
+            if any(isinstance(p, str) and p and not os.path.exists(p) for p in paths):
+                return None
+        return artifacts
+
+    def record_stage(self, stage: str, **artifacts) -> None:
+        self._append({"type": "stage", "stage": stage, "artifacts": artifacts})
+        self.stages[stage] = artifacts
+
+    def record_page(self, page_number: int, markdown: str) -> None:
+        self._append({"type": "page", "page": page_number, "markdown": markdown})
+        self.pages[page_number] = markdown
+
+def run_fingerprint(input_path: str, settings: Optional[Dict[str, Any]] = None) -> str:
+    """Fingerprint of a run: the input's content plus the settings that change its output (models, prompts, DPI)."""
+    payload = json.dumps({"input": file_fingerprint(input_path), "settings": settings or {}}, sort_keys=True)
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+def open_journal(journal_path: str, input_path: str, settings: Optional[Dict[str, Any]] = None) -> RunJournal:
+    """
+    Open the journal of a run on `input_path` with `settings`, starting it afresh if either changed.
+
+    Callers that only pass a journal_path down to the tools must open it with
+    this function first, since the tools trust whatever the journal holds.
+    """
+    journal = RunJournal(journal_path)
+    fingerprint = run_fingerprint(input_path, settings)
+    if journal.fingerprint != fingerprint:
+        journal.reset(fingerprint)
+    return journal
@@ -0,0 +1,321 @@
+import io
+import os
+import time
+import math
+import heapq
+import base64
+import random
+import itertools
+import threading
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Dict, List, Optional
+from PIL import Image
+from tenacity import RetryCallState, Retrying, retry_if_exception, stop_after_attempt, stop_never, wait_random_exponential
+import metrics
+
+# Account quota; 0 leaves a dimension unlimited
+DEFAULT_RPM = int(os.getenv("OPENAI_RPM", "0"))
+DEFAULT_TPM = int(os.getenv("OPENAI_TPM", "0"))
+DEFAULT_ATTEMPTS = int(os.getenv("OPENAI_ATTEMPTS", "6"))  # 0 retries until the call succeeds
+# Completion tokens reserved per request when the caller does not say how long the answer may be
+DEFAULT_OUTPUT_TOKENS = 1000
+
+INTERACTIVE = 0
+BATCH = 10
+PRIORITIES = {"interactive": INTERACTIVE, "batch": BATCH}
+
+_priority: ContextVar[int] = ContextVar("llm_priority", default=INTERACTIVE)
+
+@contextmanager
+def job_priority(priority: int):
+    """
+    Run the block's LLM calls at `priority`; lower values are served first (INTERACTIVE before BATCH).
+
+    Priorities only order calls waiting on the same scheduler, i.e. in the same
+    process. Separate CLI runs and batches do not see each other's queue; to
+    let interactive jobs overtake a batch, run both through one worker
+    (worker.py, batch.py --worker).
+    """
+    token = _priority.set(priority)
+    try:
+        yield
+    finally:
+        _priority.reset(token)
+
+# --- Token estimation -----------------------------------------------------------
+
+try:
+    import tiktoken
+    _encoding = tiktoken.get_encoding("cl100k_base")
+    def count_text_tokens(text: str) -> int:
+        return len(_encoding.encode(text))
+except Exception:
+    # No tokenizer data available (e.g. offline); roughly four characters per token
+    def count_text_tokens(text: str) -> int:
+        return len(text) // 4 + 1
+
+def image_tokens(width: int, height: int, detail: str = "high") -> int:
+    """Tokens billed for an image, following OpenAI's tiling rule for vision models."""
+    if detail == "low":
+        return 85
+    scale = min(1.0, 2048 / max(width, height))
+    width, height = width * scale, height * scale
+    scale = min(1.0, 768 / min(width, height))
+    width, height = width * scale, height * scale
+    return 170 * math.ceil(width / 512) * math.ceil(height / 512) + 85
+
+def _data_url_tokens(url: str, detail: str) -> int:
+    if not url.startswith("data:"):
+        return image_tokens(2048, 2048, detail)  # Unknown remote image: assume the largest
+    try:
+        data = base64.b64decode(url.split(",", 1)[1])
+        with Image.open(io.BytesIO(data)) as image:  # Only the header is parsed
+            return image_tokens(*image.size, detail)
+    except Exception:
+        return image_tokens(2048, 2048, detail)
+
+def estimate_tokens(messages: List[Any], output_tokens: int = DEFAULT_OUTPUT_TOKENS) -> int:
+    """Estimate the tokens a request will consume: prompt text, images and the expected completion."""
+    tokens = output_tokens
+    for message in messages:
+        content = getattr(message, "content", message)
+        parts = content if isinstance(content, list) else [content]
+        for part in parts:
+            if isinstance(part, str):
+                tokens += count_text_tokens(part) + 4
+            elif part.get("type") == "image_url":
+                image_url = part["image_url"]
+                tokens += _data_url_tokens(image_url["url"], image_url.get("detail", "high"))
+            else:
+                tokens += count_text_tokens(part.get("text", "")) + 4
+    return tokens
+
+def request_bytes(messages: List[Any]) -> int:
+    """Approximate payload size of a request: text and data URLs."""
+    size = 0
+    for message in messages:
+        content = getattr(message, "content", message)
+        parts = content if isinstance(content, list) else [content]
+        for part in parts:
+            if isinstance(part, str):
+                size += len(part)
+            elif part.get("type") == "image_url":
+                size += len(part["image_url"]["url"])
+            else:
+                size += len(part.get("text", ""))
+    return size
+
+# --- Rate limiting --------------------------------------------------------------
+
+class TokenBucket:
+    """Refills `per_minute` units per minute, holding at most one minute's worth."""
+
+    def __init__(self, per_minute: int):
+        self.capacity = float(per_minute)
+        self.level = float(per_minute)
+        self.updated = time.monotonic()
+
+    @property
+    def unlimited(self) -> bool:
+        return self.capacity <= 0
+
+    def _refill(self, now: float) -> None:
+        self.level = min(self.capacity, self.level + (now - self.updated) * self.capacity / 60)
+        self.updated = now
+
+    def wait_time(self, amount: float, now: float) -> float:
+        """Seconds until `amount` can be taken; requests above capacity only wait for a full bucket."""
+        if self.unlimited:
+            return 0.0
+        self._refill(now)
+        amount = min(amount, self.capacity)
+        return max(0.0, (amount - self.level) * 60 / self.capacity)
+
+    def take(self, amount: float) -> None:
+        if not self.unlimited:
+            self.level -= min(amount, self.capacity)
+
+    def give_back(self, amount: float) -> None:
+        """Correct an estimate once the real usage is known; a negative amount is a debt."""
+        if not self.unlimited:
+            self.level = min(self.capacity, self.level + amount)
+
+def _status_code(error: BaseException) -> Optional[int]:
+    status = getattr(error, "status_code", None)
+    if status is None and getattr(error, "response", None) is not None:
+        status = getattr(error.response, "status_code", None)
+    return status
+
+def retry_after_seconds(error: BaseException) -> Optional[float]:
+    """Read the server's requested delay from a rate-limit error's headers."""
+    response = getattr(error, "response", None)
+    headers = getattr(response, "headers", None) or {}
+    try:
+        if headers.get("retry-after-ms"):
+            return float(headers["retry-after-ms"]) / 1000
+        if headers.get("retry-after"):
+            return float(headers["retry-after"])
+    except ValueError:
+        pass  # An HTTP date; fall back to our own backoff
+    return None
+
+def is_retryable(error: BaseException) -> bool:
+    """Rate limits, server errors, timeouts and dropped connections are worth another attempt."""
+    status = _status_code(error)
+    if status is not None:
+        return status == 429 or status == 408 or status >= 500
+    return type(error).__name__ in ("APIConnectionError", "APITimeoutError", "ConnectError", "ReadTimeout", "RemoteProtocolError")
+
+class LLMScheduler:
+    """
+    One gate for every model request of the process.
+
+    Before a request is sent, it waits for room in both the requests/min and
+    tokens/min buckets. Waiting requests are admitted strictly by priority and
+    then arrival, so interactive work overtakes queued batch work. A 429 pauses
+    the whole scheduler for the server's Retry-After, rather than letting every
+    worker hammer the API. The failed request is retried with jittered
+    exponential backoff. Token estimates are corrected with the usage the API
+    reports.
+
+    Quota and queue are per process: two processes each get the full rpm/tpm
+    and cannot see each other's priorities.
+    """
+
+    def __init__(self, rpm: int = DEFAULT_RPM, tpm: int = DEFAULT_TPM, attempts: int = DEFAULT_ATTEMPTS):
+        self.requests = TokenBucket(rpm)
+        self.tokens = TokenBucket(tpm)
+        self.attempts = attempts
+        self._paused_until = 0.0
+        self._waiting: List[tuple] = []
+        self._sequence = itertools.count()
+        self._condition = threading.Condition()
+
+    def acquire(self, tokens: int, priority: Optional[int] = None) -> float:
+        """Block until a request of `tokens` may be sent; returns the seconds spent waiting."""
+        started = time.monotonic()
+        ticket = (_priority.get() if priority is None else priority, next(self._sequence))
+        with self._condition:
+            heapq.heappush(self._waiting, ticket)
+            try:
+                while True:
+                    if self._waiting[0] != ticket:
+                        self._condition.wait()
+                        continue
+                    now = time.monotonic()
+                    wait = max(self._paused_until - now, self.requests.wait_time(1, now), self.tokens.wait_time(tokens, now))
+                    if wait <= 0:
+                        self.requests.take(1)
+                        self.tokens.take(tokens)
+                        return time.monotonic() - started
+                    self._condition.wait(timeout=wait)
+            finally:
+                self._waiting.remove(ticket)
+                heapq.heapify(self._waiting)
+                self._condition.notify_all()
+
+    def pause(self, seconds: float) -> None:
+        """Hold back every request for `seconds`, e.g. after the server asked to retry later."""
+        with self._condition:
+            self._paused_until = max(self._paused_until, time.monotonic() + seconds)
+            self._condition.notify_all()
+
+    def settle(self, estimated: int, actual: int) -> None:
+        with self._condition:
+            self.tokens.give_back(estimated - actual)
+            self._condition.notify_all()
+
+    def _wait(self, retry_state: RetryCallState) -> float:
+        backoff = wait_random_exponential(multiplier=1, max=60)(retry_state)
+        retry_after = retry_after_seconds(retry_state.outcome.exception())
+        if retry_after is None:
+            return backoff
+        # Honour the server's delay and spread the retries of concurrent callers over a little jitter
+        return retry_after + random.uniform(0, min(backoff, retry_after + 1))
+
+    def invoke(
+        self,
+        llm: Any,
+        messages: List[Any],
+        purpose: str,
+        output_tokens: int = DEFAULT_OUTPUT_TOKENS,
+        priority: Optional[int] = None,
+        **fields
+    ) -> Any:
+        """
+        Send `messages` to `llm` through the scheduler and return its response.
+
+        Every attempt is admitted by the rate limiter; the call is recorded as
+        one "llm_call" metric with the queueing time, attempts and token usage.
+        """
+        estimated = estimate_tokens(messages, output_tokens)
+        # Models bound with tools are wrapped in a RunnableBinding
+        model = getattr(getattr(llm, "bound", llm), "model_name", "")
+        record = {"purpose": purpose, "model": model, "request_bytes": request_bytes(messages), "estimated_tokens": estimated, **fields}
+        attempts, queued = 0, 0.0
+        started = time.perf_counter()
+
+        def send():
+            nonlocal attempts, queued
+            queued += self.acquire(estimated, priority)
+            attempts += 1
+            try:
+                return llm.invoke(messages)
+            except Exception as e:
+                if _status_code(e) == 429:
+                    self.pause(retry_after_seconds(e) or 1.0)
+                raise
+
+        try:
+            response = Retrying(
+                stop=stop_after_attempt(self.attempts) if self.attempts else stop_never,
+                wait=self._wait,
+                retry=retry_if_exception(is_retryable),
+                reraise=True
+            )(send)
+        except Exception:
+            metrics.record("llm_call", **record, attempts=attempts, queued_seconds=queued, success=False,
+                           input_tokens=0, output_tokens=0, seconds=time.perf_counter() - started)
+            raise
+
+        usage = metrics.token_usage(response)
+        if usage["input_tokens"] or usage["output_tokens"]:
+            self.settle(estimated, usage["input_tokens"] + usage["output_tokens"])
+        metrics.record("llm_call", **record, attempts=attempts, queued_seconds=queued, success=True,
+                       **usage, seconds=time.perf_counter() - started)
+        return response
+
+_scheduler: Optional[LLMScheduler] = None
+_scheduler_lock = threading.Lock()
+_clients: Dict[str, Any] = {}
+_clients_lock = threading.Lock()
+
+def chat_model(model: str) -> Any:
+    """
+    Return the process-wide ChatOpenAI client for `model`.
+
+    Clients are created once and shared by every call site and thread, so the
+    HTTP connection pool stays warm between pages, steps and documents.
+    Retries are left to the scheduler (max_retries=0).
+    """
+    with _clients_lock:
+        if model not in _clients:
+            from langchain_openai import ChatOpenAI
+            _clients[model] = ChatOpenAI(model=model, max_retries=0)
+        return _clients[model]
+
+def get_scheduler() -> LLMScheduler:
+    """Return the process-wide scheduler shared by every LLM call site."""
+    global _scheduler
+    with _scheduler_lock:
+        if _scheduler is None:
+            _scheduler = LLMScheduler()
+        return _scheduler
+
+def configure(rpm: int = DEFAULT_RPM, tpm: int = DEFAULT_TPM, attempts: int = DEFAULT_ATTEMPTS) -> LLMScheduler:
+    """Replace the process-wide scheduler, e.g. from command line quota settings."""
+    global _scheduler
+    with _scheduler_lock:
+        _scheduler = LLMScheduler(rpm, tpm, attempts)
+        return _scheduler
@@ -1,67 +1,50 @@
-from typing import List
 from dotenv import load_dotenv
+import argparse
 import asyncio
-import json
+import os
+import sys
+import time
+from typing import Any, AsyncIterator, Dict
 load_dotenv()
 
-from langchain_core.messages import BaseMessage, HumanMessage
-from langgraph.graph import END, MessageGraph
+from langgraph.graph import END, StateGraph
+from langgraph.types import StreamWriter
 from coordinator import coordinator
 from tools import local_tool_call
+from pipeline import fast_graph, in_memory_graph, rasterizing_graph, rasterizing_in_memory_graph
+from journal import RunJournal
+from state import DocumentState, initial_state, job_lock
+import metrics
 
-def should_continue(state: List[BaseMessage]) -> str:
+def should_continue(state: DocumentState) -> str:
     """
-    Determine the next node based on the last message in the state.
-    Returns "local_tool" if a tool call is detected, "end" otherwise.
+    Determine the next node from the typed state.
+    Returns "local_tool" if the coordinator requested a tool call, END otherwise.
     """
-    try:
-        # Get the last message
-        last_message = state[-1].content
-        
-        # Parse the result dictionary
-        result_dict = eval(last_message)
-        
-        # Check for tool calls in additional_kwargs
-        if (result_dict.get("additional_kwargs") and 
-            "tool_calls" in result_dict["additional_kwargs"] and 
-            result_dict["additional_kwargs"]["tool_calls"]):
-            
-            # Extract tool call information
-            tool_call = result_dict["additional_kwargs"]["tool_calls"][0]
-            
-            # Prepare tool info for local_tool_call
-            if "function" in tool_call:
-                tool_info = {
-                    "tool_name": tool_call["function"]["name"],
-                    "tool_args": json.loads(tool_call["function"]["arguments"])
-                }
-                # Update the last message with the formatted tool info
-                state[-1] = HumanMessage(content=json.dumps(tool_info))
-                return "local_tool"
-    except:
-        pass
-    
-    # If no tool call is detected or there's an error parsing,
-    # extract just the content for the final message
-    try:
-        result_dict = eval(last_message)
-        state[-1] = HumanMessage(content=str(result_dict.get("content", last_message)))
-    except:
-        pass
-    
-    return "end"
+    if state.get("tool_call") and not state.get("error"):
+        return "local_tool"
+    return END
+
+def coordinator_node(state: DocumentState) -> Dict[str, Any]:
+    with metrics.timed("node", node="coordinator"):
+        return coordinator(state)
+
+def local_tool_node(state: DocumentState, writer: StreamWriter) -> Dict[str, Any]:
+    with metrics.timed("node", node="local_tool", tool=(state.get("tool_call") or {}).get("name", "")):
+        return local_tool_call(state, writer)
 
 # Build the graph
-builder = MessageGraph()
+builder = StateGraph(DocumentState)
 
 # Add nodes
-builder.add_node("coordinator", coordinator)
-builder.add_node("local_tool", local_tool_call)
+builder.add_node("coordinator", coordinator_node)
+builder.add_node("local_tool", local_tool_node)
 
 # Add conditional edge from coordinator
 builder.add_conditional_edges(
     "coordinator",
-    should_continue
+    should_continue,
+    ["local_tool", END]
 )
 
 # Add edge from local_tool back to coordinator
@@ -73,18 +56,126 @@ builder.set_entry_point("coordinator")
 # Compile the graph
 graph = builder.compile()
 
-async def main():
-    """Main function to run the document processing workflow"""
+def select_graph(mode: str = "agentic", native: bool = True):
+    """Return the compiled graph for a run mode."""
+    if mode == "agentic":
+        return graph
+    # Deterministic pipeline: no coordinator LLM between steps
+    if native:
+        return in_memory_graph if mode == "in-memory" else fast_graph
+    return rasterizing_in_memory_graph if mode == "in-memory" else rasterizing_graph
+
+async def stream_document(
+    input_path: str,
+    mode: str = "agentic",
+    png_dir: str = "",
+    native: bool = True,
+    output_root: str = ""
+) -> AsyncIterator[Dict[str, Any]]:
+    """
+    Run the workflow and yield progress events as they happen.
+
+    Events are dicts with an "event" key:
+    - "page": one page's markdown (or its error), in page order, with pages_done/page_count
+    - "document": the whole markdown of a natively converted document
+    - "step": a graph node finished, with its state update
+    - "done": the final state, plus time_to_first_page and total_seconds
+
+    The Markdown file is appended page by page, so it can also be tailed.
+    The job directory is created under `output_root` (default: next to the document).
+    """
+    state = initial_state(input_path, output_root)
+    state["png_dir"] = png_dir
+    started = time.perf_counter()
+    time_to_first_page = None
+    final_state = dict(state)
+    async for stream_mode, chunk in select_graph(mode, native).astream(state, stream_mode=["custom", "updates"]):
+        if stream_mode == "custom":
+            if time_to_first_page is None and chunk.get("event") in ("page", "document"):
+                time_to_first_page = time.perf_counter() - started
+            yield chunk
+            continue
+        for node, update in chunk.items():
+            update = update or {}
+            for key, value in update.items():
+                if key in ("step_status", "timings"):
+                    final_state[key] = {**final_state.get(key, {}), **value}
+                else:
+                    final_state[key] = value
+            yield {"event": "step", "node": node, "update": update}
+    yield {
+        "event": "done",
+        "state": final_state,
+        "time_to_first_page": time_to_first_page,
+        "total_seconds": time.perf_counter() - started
+    }
+
+async def main(input_path: str = "./test_files/test_updated.docx", mode: str = "agentic", png_dir: str = "", native: bool = True, stream: bool = False, metrics_dir: str = "", resume: bool = True) -> Dict[str, Any]:
+    """Main function to run the document processing workflow; returns the final state (with "error" when the run failed)"""
+    # Each document has its own job directory; a second run of the same document waits for the first
+    state = initial_state(input_path)
+    job_dir = state["output_dir"]
+    lock = job_lock(job_dir)
+    await asyncio.to_thread(lock.acquire)
     try:
-        input_message = "./test_files/test_updated.docx"
-        result = await graph.ainvoke([HumanMessage(content=input_message)])
+        if not resume:
+            RunJournal(state["journal_path"]).discard()
+        # Timing and cost of the run are written as a JSON report and a Prometheus text file
+        with metrics.collect() as run_metrics:
+            result = await run(input_path, mode, png_dir, native, stream)
+    finally:
+        lock.release()
+    paths = run_metrics.write(metrics_dir or os.path.join(job_dir, "metrics"))
+    print(f"metrics: {paths['report']}, {paths['prometheus']}", file=sys.stderr)
+    return result
+
+async def run(input_path: str, mode: str, png_dir: str, native: bool, stream: bool) -> Dict[str, Any]:
+    """Run the document processing workflow, print its outcome and return the final state"""
+    try:
+        if stream:
+            async for event in stream_document(input_path, mode, png_dir, native):
+                if event["event"] == "page":
+                    status = "ok" if event["success"] else f"failed: {event['error']}"
+                    print(f"page {event['page_number']} ({event['pages_done']}/{event['page_count'] or '?'}) {status}", file=sys.stderr)
+                elif event["event"] == "done":
+                    result = event["state"]
+                    first_page = event["time_to_first_page"]
+                    print(f"first page after {first_page:.2f}s" if first_page is not None else "no pages produced", file=sys.stderr)
+                    print(f"total {event['total_seconds']:.2f}s", file=sys.stderr)
+                    print(result.get("markdown_path") or result.get("error") or result.get("final_message", ""))
+            return result
+
+        if mode in ("fast", "in-memory"):
+            state = initial_state(input_path)
+            state["png_dir"] = png_dir
+            result = await select_graph(mode, native).ainvoke(state)
+            print(result.get("markdown_path") or result.get("error"))
+            return result
+        
+        result = await graph.ainvoke(initial_state(input_path))
         
-        # Extract the final message
-        final_message = result[-1].content
-        print(final_message)
+        # Report the coordinator's final answer, or the error that stopped the run
+        print(result.get("error") or result.get("final_message", ""))
+        return result
             
     except Exception as e:
         print(f"An error occurred: {str(e)}")
+        return {"error": str(e)}
 
 if __name__ == "__main__":
-    asyncio.run(main()) 
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="Convert a DOCX document to Markdown")
+    parser.add_argument("input_path", nargs="?", default="./test_files/test_updated.docx")
+    parser.add_argument("--mode", choices=["agentic", "fast", "in-memory"], default="agentic",
+                        help="agentic: coordinator LLM picks each step; fast: fixed docx->pdf->png->markdown pipeline; "
+                             "in-memory: fast pipeline without intermediate PNG files")
+    parser.add_argument("--png-dir", default="", help="in-memory mode: also save page PNGs to this directory")
+    parser.add_argument("--no-native", action="store_true",
+                        help="fast/in-memory modes: always rasterize instead of reading the DOCX XML directly first")
+    parser.add_argument("--stream", action="store_true",
+                        help="report each page as it completes, plus time to first page, on stderr")
+    parser.add_argument("--metrics-dir", default="",
+                        help="where to write run_report.json and run_metrics.prom (default: the document's job directory)")
+    parser.add_argument("--no-resume", action="store_true",
+                        help="convert from scratch even if an interrupted earlier run left a journal")
+    args = parser.parse_args()
+    asyncio.run(main(args.input_path, args.mode, args.png_dir, native=not args.no_native, stream=args.stream, metrics_dir=args.metrics_dir, resume=not args.no_resume))
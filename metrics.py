@@ -0,0 +1,229 @@
+import os
+import json
+import time
+import threading
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Dict, Iterator, List, Optional
+
+METRIC_PREFIX = "docx_markdown"
+QUANTILES = (0.5, 0.9, 0.99)
+
+class RunMetrics:
+    """
+    Thread-safe collector of the timing and cost records of one run (or batch).
+
+    Records are plain dicts with a "kind":
+    - "node": wall time of a graph node
+    - "page": wall time of one page through the vision step
+    - "rasterize": render time and encoded bytes of one page
+    - "llm_call": one model request (vision, coordinator or explain) with model,
+      payload size, latency, time queued by the rate limiter, attempts and token usage
+    - "route": the page classifier's class, model and prompt for one page
+    - "artifact": one artifact store lookup (PDF or page images), hit or miss
+    """
+
+    def __init__(self):
+        self.started = time.time()
+        self.records: List[Dict[str, Any]] = []
+        self._lock = threading.Lock()
+
+    def add(self, kind: str, **fields) -> None:
+        with self._lock:
+            self.records.append({"kind": kind, **fields})
+
+    def of_kind(self, kind: str) -> List[Dict[str, Any]]:
+        with self._lock:
+            return [r for r in self.records if r["kind"] == kind]
+
+    def report(self) -> Dict[str, Any]:
+        """Summarize the records into the JSON run report."""
+        nodes: Dict[str, Dict[str, float]] = {}
+        for record in self.of_kind("node"):
+            entry = nodes.setdefault(record["node"], {"calls": 0, "seconds": 0.0})
+            entry["calls"] += 1
+            entry["seconds"] += record["seconds"]
+
+        llm: Dict[str, Dict[str, Any]] = {}
+        for purpose in sorted({r["purpose"] for r in self.of_kind("llm_call")}):
+            calls = [r for r in self.of_kind("llm_call") if r["purpose"] == purpose]
+            latencies = [r["seconds"] for r in calls]
+            llm[purpose] = {
+                "calls": len(calls),
+                "failed": sum(1 for r in calls if not r["success"]),
+                "retries": sum(r["attempts"] - 1 for r in calls),
+                "seconds": sum(latencies),
+                "queued_seconds": sum(r.get("queued_seconds", 0.0) for r in calls),
+                "latency": _quantiles(latencies),
+                "request_bytes": sum(r["request_bytes"] for r in calls),
+                "input_tokens": sum(r["input_tokens"] for r in calls),
+                "output_tokens": sum(r["output_tokens"] for r in calls)
+            }
+
+        routes = self.of_kind("route")
+        routing: Dict[str, Dict[str, Any]] = {}
+        for page_class in sorted({r["page_class"] for r in routes}):
+            routed = [r for r in routes if r["page_class"] == page_class]
+            calls = [r for r in self.of_kind("llm_call") if r.get("page_class") == page_class]
+            routing[page_class] = {
+                "pages": len(routed),
+                "skipped": sum(1 for r in routed if r["skipped"]),
+                "models": sorted({r["model"] or "default" for r in routed if not r["skipped"]}),
+                "prompts": sorted({r["prompt"] for r in routed if not r["skipped"]}),
+                "calls": len(calls),
+                "input_tokens": sum(r["input_tokens"] for r in calls),
+                "output_tokens": sum(r["output_tokens"] for r in calls)
+            }
+
+        artifacts: Dict[str, Dict[str, int]] = {}
+        for record in self.of_kind("artifact"):
+            entry = artifacts.setdefault(record["artifact"], {"hits": 0, "misses": 0})
+            entry["hits" if record["hit"] else "misses"] += 1
+
+        pages = self.of_kind("page")
+        rasterized = self.of_kind("rasterize")
+        return {
+            "started": self.started,
+            "seconds": time.time() - self.started,
+            "nodes": nodes,
+            "pages": {
+                "count": len(pages),
+                "cached": sum(1 for r in pages if r.get("cached")),
+                "skipped": sum(1 for r in pages if r.get("skipped")),
+                "failed": sum(1 for r in pages if not r.get("success", True)),
+                "seconds": _quantiles([r["seconds"] for r in pages]),
+                "detail": pages
+            },
+            "rasterization": {
+                "pages": len(rasterized),
+                "seconds": sum(r["seconds"] for r in rasterized),
+                "bytes": sum(r["bytes"] for r in rasterized),
+                "detail": rasterized
+            },
+            "artifacts": artifacts,
+            "routing": {"classes": routing, "detail": routes},
+            "llm": llm,
+            "llm_calls": self.of_kind("llm_call")
+        }
+
+    def to_prometheus(self) -> str:
+        """Render the run report in the Prometheus text exposition format."""
+        report = self.report()
+        lines: List[str] = []
+
+        def family(name: str, kind: str, help_text: str) -> str:
+            full = f"{METRIC_PREFIX}_{name}"
+            lines.append(f"# HELP {full} {help_text}")
+            lines.append(f"# TYPE {full} {kind}")
+            return full
+
+        name = family("node_seconds_total", "counter", "Wall time spent in each graph node")
+        lines.extend(f'{name}{{node="{node}"}} {v["seconds"]:.6f}' for node, v in sorted(report["nodes"].items()))
+        name = family("node_calls_total", "counter", "Executions of each graph node")
+        lines.extend(f'{name}{{node="{node}"}} {v["calls"]}' for node, v in sorted(report["nodes"].items()))
+
+        name = family("page_seconds", "summary", "Wall time of one page through the vision step")
+        page_seconds = [r["seconds"] for r in report["pages"]["detail"]]
+        lines.extend(f'{name}{{quantile="{q}"}} {v:.6f}' for q, v in _quantile_values(page_seconds))
+        lines.append(f"{name}_sum {sum(page_seconds):.6f}")
+        lines.append(f"{name}_count {len(page_seconds)}")
+        name = family("pages_cached_total", "counter", "Pages answered from the page cache")
+        lines.append(f"{name} {report['pages']['cached']}")
+        name = family("pages_failed_total", "counter", "Pages that could not be converted")
+        lines.append(f"{name} {report['pages']['failed']}")
+        name = family("pages_skipped_total", "counter", "Blank pages never sent to the vision model")
+        lines.append(f"{name} {report['pages']['skipped']}")
+        routing = report["routing"]["classes"]
+        name = family("routed_pages_total", "counter", "Pages by the class the page classifier assigned")
+        lines.extend(f'{name}{{page_class="{page_class}"}} {v["pages"]}' for page_class, v in sorted(routing.items()))
+        for metric, help_text, key in (
+            ("routed_input_tokens_total", "Prompt tokens billed for pages of each class", "input_tokens"),
+            ("routed_output_tokens_total", "Completion tokens billed for pages of each class", "output_tokens")
+        ):
+            name = family(metric, "counter", help_text)
+            lines.extend(f'{name}{{page_class="{page_class}"}} {v[key]}' for page_class, v in sorted(routing.items()))
+
+        name = family("rasterize_seconds_total", "counter", "Time spent rendering PDF pages")
+        lines.append(f"{name} {report['rasterization']['seconds']:.6f}")
+        name = family("rasterize_bytes_total", "counter", "Encoded bytes of rendered page images")
+        lines.append(f"{name} {report['rasterization']['bytes']}")
+
+        name = family("artifact_lookups_total", "counter", "Artifact store lookups by artifact kind and result")
+        for kind, v in sorted(report["artifacts"].items()):
+            lines.append(f'{name}{{kind="{kind}",result="hit"}} {v["hits"]}')
+            lines.append(f'{name}{{kind="{kind}",result="miss"}} {v["misses"]}')
+
+        llm = report["llm"]
+        for metric, kind, help_text, key in (
+            ("llm_calls_total", "counter", "Model requests", "calls"),
+            ("llm_failed_calls_total", "counter", "Model requests that failed after all attempts", "failed"),
+            ("llm_retries_total", "counter", "Retried model request attempts", "retries"),
+            ("llm_queued_seconds_total", "counter", "Time model requests waited for the rate limiter", "queued_seconds"),
+            ("llm_request_bytes_total", "counter", "Request payload bytes sent to the model", "request_bytes"),
+            ("llm_input_tokens_total", "counter", "Prompt tokens billed", "input_tokens"),
+            ("llm_output_tokens_total", "counter", "Completion tokens billed", "output_tokens")
+        ):
+            name = family(metric, kind, help_text)
+            lines.extend(f'{name}{{purpose="{purpose}"}} {v[key]}' for purpose, v in sorted(llm.items()))
+        name = family("llm_latency_seconds", "summary", "Latency of a model request, including retries")
+        for purpose, v in sorted(llm.items()):
+            latencies = [r["seconds"] for r in report["llm_calls"] if r["purpose"] == purpose]
+            lines.extend(f'{name}{{purpose="{purpose}",quantile="{q}"}} {value:.6f}' for q, value in _quantile_values(latencies))
+            lines.append(f'{name}_sum{{purpose="{purpose}"}} {v["seconds"]:.6f}')
+            lines.append(f'{name}_count{{purpose="{purpose}"}} {v["calls"]}')
+        return "\n".join(lines) + "\n"
+
+    def write(self, directory: str, name: str = "run") -> Dict[str, str]:
+        """Write <name>_report.json and <name>_metrics.prom into `directory` and return their paths."""
+        os.makedirs(directory, exist_ok=True)
+        json_path = os.path.join(directory, f"{name}_report.json")
+        prom_path = os.path.join(directory, f"{name}_metrics.prom")
+        with open(json_path, "w") as f:
+            json.dump(self.report(), f, indent=2)
+        with open(prom_path, "w") as f:
+            f.write(self.to_prometheus())
+        return {"report": json_path, "prometheus": prom_path}
+
+def _quantile_values(values: List[float]):
+    ordered = sorted(values)
+    for q in QUANTILES:
+        yield q, ordered[min(len(ordered) - 1, int(q * len(ordered)))] if ordered else 0.0
+
+def _quantiles(values: List[float]) -> Dict[str, float]:
+    return {f"p{int(q * 100)}": v for q, v in _quantile_values(values)}
+
+_current: ContextVar[Optional[RunMetrics]] = ContextVar("run_metrics", default=None)
+
+def current() -> Optional[RunMetrics]:
+    return _current.get()
+
+def record(kind: str, **fields) -> None:
+    """Add a record to the collector of the current context; a no-op when nothing is collecting."""
+    collector = _current.get()
+    if collector is not None:
+        collector.add(kind, **fields)
+
+@contextmanager
+def collect(collector: Optional[RunMetrics] = None) -> Iterator[RunMetrics]:
+    """Collect the records of everything run inside the block (and the threads and tasks it starts with its context)."""
+    collector = collector or RunMetrics()
+    token = _current.set(collector)
+    try:
+        yield collector
+    finally:
+        _current.reset(token)
+
+@contextmanager
+def timed(kind: str, **fields) -> Iterator[Dict[str, Any]]:
+    """Record the wall time of the block; fields added to the yielded dict end up in the record."""
+    started = time.perf_counter()
+    extra: Dict[str, Any] = {}
+    try:
+        yield extra
+    finally:
+        record(kind, **fields, **extra, seconds=time.perf_counter() - started)
+
+def token_usage(message: Any) -> Dict[str, int]:
+    """Return input/output token counts from a LangChain AIMessage, zero when the provider reported none."""
+    usage = getattr(message, "usage_metadata", None) or {}
+    return {"input_tokens": usage.get("input_tokens", 0), "output_tokens": usage.get("output_tokens", 0)}
@@ -0,0 +1,116 @@
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+import base64
+import contextvars
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from pydantic import BaseModel, Field
+from langchain_openai import ChatOpenAI
+from langchain_core.messages import HumanMessage
+from page_cache import PageCache, page_cache_key
+from llm_scheduler import chat_model, get_scheduler
+from page_classifier import PageRoute
+from rasterizer import PageImage
+import metrics
+
+VISION_MODEL = "gpt-4-vision-preview"
+PAGE_PROMPT = "Convert this image to markdown. Extract any mathematical formulas as LaTeX."
+DEFAULT_MAX_CONCURRENCY = 4
+
+class PageResult(BaseModel):
+    page_number: int = Field(description="1-based page number within the document")
+    png_path: str = Field(default="", description="Path to the page image, empty for in-memory pages")
+    markdown: str = Field(default="", description="Markdown extracted from the page")
+    success: bool = Field(description="Whether the page was converted successfully")
+    error: str = Field(default="", description="Error message if the page failed")
+    cached: bool = Field(default=False, description="Whether the markdown came from the page cache")
+    resumed: bool = Field(default=False, description="Whether the markdown came from the journal of an earlier run")
+    skipped: bool = Field(default=False, description="Whether the page was classified blank and never sent to the model")
+    page_class: str = Field(default="", description="Class the page classifier assigned, empty when pages are not routed")
+
+def convert_page(
+    llm: ChatOpenAI,
+    page: PageImage,
+    cache: Optional[PageCache] = None,
+    prompt: str = PAGE_PROMPT,
+    page_class: str = ""
+) -> Tuple[str, bool]:
+    """
+    Return (markdown, cached) for a single page image.
+
+    When a cache is given, pages whose image bytes, model and prompt were seen
+    before are answered from the cache without calling the vision model.
+    """
+    image_bytes = page.read()
+    key = None
+    if cache is not None:
+        key = page_cache_key(image_bytes, llm.model_name, prompt)
+        markdown = cache.get(key)
+        if markdown is not None:
+            return markdown, True
+
+    img_base64 = base64.b64encode(image_bytes).decode("ascii")
+    message = HumanMessage(content=[
+        {"type": "text", "text": prompt},
+        {"type": "image_url", "image_url": {"url": f"data:{page.mime_type};base64,{img_base64}"}}
+    ])
+
+    # Rate limiting, retries and call metrics are handled by the shared scheduler
+    response = get_scheduler().invoke(llm, [message], purpose="vision", page_number=page.page_number, page_class=page_class)
+
+    if cache is not None:
+        cache.put(key, response.content)
+    return response.content, False
+
+def iter_convert_page_images(
+    pages: Iterable[PageImage],
+    max_concurrency: int = DEFAULT_MAX_CONCURRENCY,
+    llm: Optional[ChatOpenAI] = None,
+    cache: Optional[PageCache] = None,
+    routes: Optional[Dict[int, PageRoute]] = None
+) -> Iterator[PageResult]:
+    """
+    Convert page images to markdown with up to `max_concurrency` vision calls in flight.
+
+    Results are yielded in input order. `pages` is consumed lazily: only a
+    small window of pages beyond the ones in flight is pulled from it, so a
+    streaming rasterizer upstream never has to hold the whole document. A
+    failing page is reported in its PageResult instead of aborting the rest.
+
+    `routes` maps page numbers to the classifier's PageRoute: blank pages are
+    skipped and routed pages use the route's model and prompt. It is filled
+    upstream (iter_classified_pages) before each page reaches this function.
+    """
+    llm = llm or chat_model(VISION_MODEL)
+    max_concurrency = max(1, max_concurrency)
+
+    def run(page: PageImage) -> PageResult:
+        route = routes.get(page.page_number) if routes else None
+        page_class = route.page_class if route else ""
+        with metrics.timed("page", page_number=page.page_number, page_class=page_class) as page_record:
+            if route is not None and route.skip:
+                page_record.update(success=True, cached=False, skipped=True)
+                return PageResult(page_number=page.page_number, png_path=page.path, success=True, skipped=True, page_class=page_class)
+            try:
+                page_llm = chat_model(route.model) if route and route.model else llm
+                prompt = route.prompt if route and route.prompt else PAGE_PROMPT
+                markdown, cached = convert_page(page_llm, page, cache=cache, prompt=prompt, page_class=page_class)
+                page_record.update(success=True, cached=cached)
+                return PageResult(page_number=page.page_number, png_path=page.path, markdown=markdown, success=True, cached=cached, page_class=page_class)
+            except Exception as e:
+                page_record.update(success=False, cached=False)
+                return PageResult(page_number=page.page_number, png_path=page.path, success=False, error=str(e), page_class=page_class)
+
+    with ThreadPoolExecutor(max_workers=max_concurrency) as executor:
+        in_flight = deque()
+        for page in pages:
+            # Each worker runs in a copy of the caller's context so metrics and progress reach the caller's run
+            in_flight.append(executor.submit(contextvars.copy_context().run, run, page))
+            if len(in_flight) >= 2 * max_concurrency:
+                yield in_flight.popleft().result()
+        while in_flight:
+            yield in_flight.popleft().result()
+
+def page_images_from_paths(png_paths: List[str]) -> Iterator[PageImage]:
+    """Wrap page files on disk as PageImages numbered from 1; each file is read only when converted."""
+    for page_number, png_path in enumerate(png_paths, start=1):
+        yield PageImage(page_number=page_number, path=png_path)
@@ -0,0 +1,76 @@
+import argparse
+import difflib
+import random
+import textwrap
+import time
+from typing import List, Tuple
+
+from old_files.diff_engine import iter_hunks
+
+WORDS = ("signal frame carrier uplink downlink channel band power control report "
+         "resource block symbol slot antenna beam measurement threshold timer value").split()
+
+def synthetic_document(paragraphs: int, seed: int) -> List[str]:
+    """Generate markdown paragraphs of random sentences."""
+    rng = random.Random(seed)
+    document = []
+    for index in range(paragraphs):
+        sentences = [
+            " ".join(rng.choice(WORDS) for _ in range(rng.randint(6, 16))).capitalize() + "."
+            for _ in range(rng.randint(2, 6))
+        ]
+        document.append(f"Paragraph {index}: " + " ".join(sentences))
+    return document
+
+def revise(document: List[str], edits: int, seed: int) -> List[str]:
+    """Apply random sentence edits, paragraph insertions and deletions."""
+    rng = random.Random(seed)
+    revised = list(document)
+    for _ in range(edits):
+        index = rng.randrange(len(revised))
+        action = rng.random()
+        if action < 0.6:
+            revised[index] = revised[index].replace(rng.choice(WORDS), rng.choice(WORDS).upper(), 1)
+        elif action < 0.8:
+            revised.insert(index, "Inserted paragraph about the " + " ".join(rng.sample(WORDS, 8)) + ".")
+        elif len(revised) > 1:
+            del revised[index]
+    return revised
+
+def render(paragraphs: List[str], width: int) -> str:
+    """Wrap paragraphs at `width` columns, as page OCR would."""
+    return "\n\n".join(textwrap.fill(p, width) for p in paragraphs) + "\n"
+
+def run(paragraphs: int, edits: int, seed: int = 0) -> Tuple[float, int, float, int]:
+    original = synthetic_document(paragraphs, seed)
+    updated = revise(original, edits, seed + 1)
+    # The updated version is re-wrapped at a different width, like a reflowed page
+    original_text, updated_text = render(original, 80), render(updated, 72)
+
+    started = time.perf_counter()
+    line_hunks = sum(1 for line in difflib.unified_diff(original_text.splitlines(), updated_text.splitlines()) if line.startswith("@@"))
+    line_seconds = time.perf_counter() - started
+
+    started = time.perf_counter()
+    paragraph_hunks = sum(1 for _ in iter_hunks(original_text, updated_text))
+    paragraph_seconds = time.perf_counter() - started
+    return line_seconds, line_hunks, paragraph_seconds, paragraph_hunks
+
+def main():
+    """
+    Compare the line-based unified diff with the paragraph diff engine on large synthetic documents.
+
+    Example (from the repository root): python -m old_files.bench_diff --paragraphs 1000 5000
+    """
+    parser = argparse.ArgumentParser(description="Benchmark the paragraph diff engine")
+    parser.add_argument("--paragraphs", nargs="+", type=int, default=[1000, 5000, 20000])
+    parser.add_argument("--edits", type=int, default=50)
+    args = parser.parse_args()
+
+    print(f"{'paragraphs':>10} {'unified_diff s':>15} {'hunks':>7} {'diff_engine s':>14} {'hunks':>7}")
+    for paragraphs in args.paragraphs:
+        line_seconds, line_hunks, paragraph_seconds, paragraph_hunks = run(paragraphs, args.edits)
+        print(f"{paragraphs:>10} {line_seconds:>15.3f} {line_hunks:>7} {paragraph_seconds:>14.3f} {paragraph_hunks:>7}")
+
+if __name__ == "__main__":
+    main()
@@ -1,16 +1,22 @@
-from typing import Dict, List
+from typing import Annotated, Any, Callable, Dict, List, Optional
+from typing_extensions import TypedDict
 from dataclasses import dataclass
 import os
-from pathlib import Path
 import base64
+import asyncio
+import contextvars
 from concurrent.futures import ThreadPoolExecutor
-import difflib
 
-from langchain_core.messages import BaseMessage, HumanMessage
+from langchain_core.messages import HumanMessage
 from langchain_openai import ChatOpenAI
+from langgraph.graph import END, START, StateGraph
 from pydantic import BaseModel, Field
-from docx2pdf import convert as docx2pdf_convert
+import tiktoken
 from pdf2image import convert_from_path
+from old_files.page_match import match_unchanged_pages
+from old_files.diff_engine import pack_batches, read_hunks, write_diff
+from llm_scheduler import chat_model, get_scheduler
+from converters import get_backend
 
 @dataclass
 class DocumentPaths:
@@ -33,49 +39,33 @@ class MarkdownResult(BaseModel):
     markdown_path: str
     success: bool
     error: str = ""
+    page_markdown: List[Optional[str]] = []
+    llm_calls: int = 0
 
 class DiffResult(BaseModel):
-    diff_content: str
+    diff_path: str
+    hunks: int = 0
     success: bool
     error: str = ""
 
-def request_parser(state: List[BaseMessage]) -> List[BaseMessage]:
-    """Parse the initial request to identify document paths and verify file existence"""
-    try:
-        input_text = state[0].content.strip()
-        
-        # Extract the base path
-        if not input_text.endswith('.docx'):
-            return state + [HumanMessage(content="Error: Input must be a path to a .docx file")]
-        
-        # Form the paths for original and updated files
-        base_path = input_text[:-5]  # Remove .docx extension
-        original_path = f"{base_path}_original.docx"
-        updated_path = f"{base_path}_updated.docx"
-        
-        # Check if both files exist
-        if not os.path.exists(original_path):
-            return state + [HumanMessage(content=f"Error: Original file not found at {original_path}")]
-        if not os.path.exists(updated_path):
-            return state + [HumanMessage(content=f"Error: Updated file not found at {updated_path}")]
-        
-        # Get base directory and document name
-        base_dir = os.path.dirname(original_path)
-        doc_name = os.path.splitext(os.path.basename(original_path))[0]
-        
-        paths = DocumentPaths(
-            original_docx=original_path,
-            updated_docx=updated_path,
-            base_dir=base_dir,
-            doc_name=doc_name
-        )
-        
-        return state + [HumanMessage(content=str(paths.__dict__))]
-    except Exception as e:
-        return state + [HumanMessage(content=f"Error parsing request: {str(e)}")]
+def merge_dicts(left: Dict, right: Dict) -> Dict:
+    """Reducer that lets each node of a branch add its own keys to the branch's dict"""
+    return {**(left or {}), **(right or {})}
+
+class CompareState(TypedDict, total=False):
+    """State of the comparison graph; each version's branch only writes to its own key"""
+    input_path: str
+    paths: Dict[str, str]
+    original: Annotated[Dict[str, Any], merge_dicts]
+    updated: Annotated[Dict[str, Any], merge_dicts]
+    unchanged_pages: Dict[int, int]
+    diff: Dict[str, Any]
+    explanation_path: str
+    failed_batches: List[int]
+    error: str
 
 def docx_to_pdf_converter(docx_path: str, output_dir: str) -> DocxToPdfResult:
-    """Convert DOCX to PDF"""
+    """Convert DOCX to PDF through the shared converter backend, which is safe to call from both branches at once"""
     try:
         pdf_dir = os.path.join(output_dir, "pdf_files")
         os.makedirs(pdf_dir, exist_ok=True)
@@ -83,15 +73,15 @@ def docx_to_pdf_converter(docx_path: str, output_dir: str) -> DocxToPdfResult:
         doc_name = os.path.splitext(os.path.basename(docx_path))[0]
         pdf_path = os.path.join(pdf_dir, f"{doc_name}.pdf")
         
-        docx2pdf_convert(docx_path, pdf_path)
+        get_backend().convert(docx_path, pdf_path)
         return DocxToPdfResult(pdf_path=pdf_path, success=True)
     except Exception as e:
         return DocxToPdfResult(pdf_path="", success=False, error=str(e))
 
-def pdf_to_png_converter(pdf_path: str, output_dir: str, dpi: int = 300) -> PdfToPngResult:
-    """Convert PDF to PNG files"""
+def pdf_to_png_converter(pdf_path: str, output_dir: str, name: str, dpi: int = 300) -> PdfToPngResult:
+    """Convert PDF to PNG files under png_files/<name>/ so both versions can be rendered at once"""
     try:
-        png_dir = os.path.join(output_dir, "png_files")
+        png_dir = os.path.join(output_dir, "png_files", name)
         os.makedirs(png_dir, exist_ok=True)
         
         pages = convert_from_path(pdf_path, dpi=dpi)
@@ -106,124 +96,311 @@ def pdf_to_png_converter(pdf_path: str, output_dir: str, dpi: int = 300) -> PdfT
     except Exception as e:
         return PdfToPngResult(png_paths=[], success=False, error=str(e))
 
-def png_to_markdown_converter(png_paths: List[str], output_dir: str) -> MarkdownResult:
-    """Convert PNG files to Markdown"""
+def write_markdown_file(page_markdown: List[str], output_dir: str, name: str) -> str:
+    """Join page markdown into markdown_files/<name>.md and return its path"""
+    markdown_dir = os.path.join(output_dir, "markdown_files")
+    os.makedirs(markdown_dir, exist_ok=True)
+    markdown_path = os.path.join(markdown_dir, f"{name}.md")
+    with open(markdown_path, "w") as f:
+        f.write("\n\n".join(page_markdown))
+    return markdown_path
+
+def png_to_markdown_converter(png_paths: List[str], output_dir: str, name: str = "output", skip: Optional[set] = None) -> MarkdownResult:
+    """
+    Convert PNG files to Markdown.
+    Page indices in `skip` are not sent to the LLM; their page_markdown entry is None
+    and no file is written until the caller has filled them in.
+    """
     try:
-        markdown_dir = os.path.join(output_dir, "markdown_files")
-        os.makedirs(markdown_dir, exist_ok=True)
-        
-        llm = ChatOpenAI(model="gpt-4-vision-preview")
+        skip = skip or set()
+        llm = chat_model("gpt-4-vision-preview")
         markdown_content = []
+        llm_calls = 0
         
-        for png_path in png_paths:
+        for index, png_path in enumerate(png_paths):
+            if index in skip:
+                markdown_content.append(None)
+                continue
+            
             with open(png_path, "rb") as img_file:
                 img_base64 = base64.b64encode(img_file.read()).decode()
             
-            response = llm.invoke([
-                {"type": "text", "text": "Convert this image to markdown. Extract any mathematical formulas as LaTeX."},
-                {"type": "image_url", "image_url": f"data:image/png;base64,{img_base64}"}
-            ])
+            response = get_scheduler().invoke(llm, [
+                HumanMessage(content=[
+                    {"type": "text", "text": "Convert this image to markdown. Extract any mathematical formulas as LaTeX."},
+                    {"type": "image_url", "image_url": {"url": f"data:image/png;base64,{img_base64}"}}
+                ])
+            ], purpose="vision", page_number=index + 1)
+            llm_calls += 1
             
             markdown_content.append(response.content)
         
-        markdown_path = os.path.join(markdown_dir, "output.md")
-        with open(markdown_path, "w") as f:
-            f.write("\n\n".join(markdown_content))
-            
-        return MarkdownResult(markdown_path=markdown_path, success=True)
+        markdown_path = "" if skip else write_markdown_file(markdown_content, output_dir, name)
+        return MarkdownResult(markdown_path=markdown_path, success=True, page_markdown=markdown_content, llm_calls=llm_calls)
     except Exception as e:
         return MarkdownResult(markdown_path="", success=False, error=str(e))
 
+def request_parser(state: CompareState) -> Dict[str, Any]:
+    """Parse the initial request to identify document paths and verify file existence"""
+    try:
+        input_text = state["input_path"].strip()
+        
+        # Extract the base path
+        if not input_text.endswith('.docx'):
+            return {"error": "Input must be a path to a .docx file"}
+        
+        # Form the paths for original and updated files
+        base_path = input_text[:-5]  # Remove .docx extension
+        original_path = f"{base_path}_original.docx"
+        updated_path = f"{base_path}_updated.docx"
+        
+        # Check if both files exist
+        if not os.path.exists(original_path):
+            return {"error": f"Original file not found at {original_path}"}
+        if not os.path.exists(updated_path):
+            return {"error": f"Updated file not found at {updated_path}"}
+        
+        # Get base directory and document name
+        base_dir = os.path.dirname(original_path)
+        doc_name = os.path.splitext(os.path.basename(original_path))[0]
+        
+        paths = DocumentPaths(
+            original_docx=original_path,
+            updated_docx=updated_path,
+            base_dir=base_dir,
+            doc_name=doc_name
+        )
+        
+        return {"paths": paths.__dict__}
+    except Exception as e:
+        return {"error": f"Error parsing request: {str(e)}"}
+
+# Each version runs the same steps on its own branch of the state ("original" or
+# "updated"), so the two branches can execute concurrently without touching each other.
+def _version_name(state: CompareState, version: str) -> str:
+    return os.path.splitext(os.path.basename(state["paths"][f"{version}_docx"]))[0]
+
+def _docx_to_pdf(state: CompareState, version: str) -> Dict[str, Any]:
+    result = docx_to_pdf_converter(state["paths"][f"{version}_docx"], state["paths"]["base_dir"])
+    return {version: {"pdf": result.model_dump()}}
+
+def _pdf_to_png(state: CompareState, version: str) -> Dict[str, Any]:
+    pdf_result = state[version]["pdf"]
+    if not pdf_result["success"]:
+        return {version: {"png": PdfToPngResult(png_paths=[], success=False, error=pdf_result["error"]).model_dump()}}
+    result = pdf_to_png_converter(pdf_result["pdf_path"], state["paths"]["base_dir"], _version_name(state, version))
+    return {version: {"png": result.model_dump()}}
+
+def _png_to_markdown(state: CompareState, version: str, skip: Optional[set] = None) -> Dict[str, Any]:
+    png_result = state[version]["png"]
+    if not png_result["success"]:
+        return {version: {"markdown": MarkdownResult(markdown_path="", success=False, error=png_result["error"]).model_dump()}}
+    result = png_to_markdown_converter(png_result["png_paths"], state["paths"]["base_dir"], _version_name(state, version), skip=skip)
+    return {version: {"markdown": result.model_dump()}}
+
 # Node functions for the graph
-def original_docx_to_pdf(state: List[BaseMessage]) -> List[BaseMessage]:
+def original_docx_to_pdf(state: CompareState) -> Dict[str, Any]:
     """Convert original DOCX to PDF"""
-    paths = eval(state[-1].content)  # Parse the DocumentPaths dict
-    result = docx_to_pdf_converter(paths["original_docx"], paths["base_dir"])
-    return state + [HumanMessage(content=f"original:{str(result.dict())}")] 
+    return _docx_to_pdf(state, "original")
 
-def updated_docx_to_pdf(state: List[BaseMessage]) -> List[BaseMessage]:
+def updated_docx_to_pdf(state: CompareState) -> Dict[str, Any]:
     """Convert updated DOCX to PDF"""
-    paths = eval(state[-1].content)
-    result = docx_to_pdf_converter(paths["updated_docx"], paths["base_dir"])
-    return state + [HumanMessage(content=f"updated:{str(result.dict())}")] 
+    return _docx_to_pdf(state, "updated")
 
-def original_pdf_to_png(state: List[BaseMessage]) -> List[BaseMessage]:
+def original_pdf_to_png(state: CompareState) -> Dict[str, Any]:
     """Convert original PDF to PNG"""
-    last_result = eval(state[-1].content.split(":", 1)[1])
-    paths = eval(state[-2].content)
-    result = pdf_to_png_converter(last_result["pdf_path"], paths["base_dir"])
-    return state + [HumanMessage(content=f"original:{str(result.dict())}")] 
+    return _pdf_to_png(state, "original")
 
-def updated_pdf_to_png(state: List[BaseMessage]) -> List[BaseMessage]:
+def updated_pdf_to_png(state: CompareState) -> Dict[str, Any]:
     """Convert updated PDF to PNG"""
-    last_result = eval(state[-1].content.split(":", 1)[1])
-    paths = eval(state[-2].content)
-    result = pdf_to_png_converter(last_result["pdf_path"], paths["base_dir"])
-    return state + [HumanMessage(content=f"updated:{str(result.dict())}")] 
+    return _pdf_to_png(state, "updated")
+
+def match_pages(state: CompareState) -> Dict[str, Any]:
+    """Find updated pages that are identical to an original page, aligning across inserted and deleted pages"""
+    original_png = state["original"]["png"]
+    updated_png = state["updated"]["png"]
+    if not (original_png["success"] and updated_png["success"]):
+        return {"unchanged_pages": {}}
+    try:
+        return {"unchanged_pages": match_unchanged_pages(original_png["png_paths"], updated_png["png_paths"])}
+    except Exception:
+        # Matching is only an optimization; without it every page is converted
+        return {"unchanged_pages": {}}
 
-def original_png_to_markdown(state: List[BaseMessage]) -> List[BaseMessage]:
+def original_png_to_markdown(state: CompareState) -> Dict[str, Any]:
     """Convert original PNGs to Markdown"""
-    last_result = eval(state[-1].content.split(":", 1)[1])
-    paths = eval(state[-3].content)
-    result = png_to_markdown_converter(last_result["png_paths"], paths["base_dir"])
-    return state + [HumanMessage(content=f"original:{str(result.dict())}")] 
-
-def updated_png_to_markdown(state: List[BaseMessage]) -> List[BaseMessage]:
-    """Convert updated PNGs to Markdown"""
-    last_result = eval(state[-1].content.split(":", 1)[1])
-    paths = eval(state[-3].content)
-    result = png_to_markdown_converter(last_result["png_paths"], paths["base_dir"])
-    return state + [HumanMessage(content=f"updated:{str(result.dict())}")] 
-
-def generate_diff(state: List[BaseMessage]) -> List[BaseMessage]:
+    return _png_to_markdown(state, "original")
+
+def updated_png_to_markdown(state: CompareState) -> Dict[str, Any]:
+    """Convert only the new or changed updated PNGs to Markdown; unchanged pages are filled in from the original later"""
+    return _png_to_markdown(state, "updated", skip=set(state.get("unchanged_pages", {})))
+
+def fill_unchanged_pages(state: CompareState) -> Dict[str, Any]:
+    """Complete the updated markdown with the original markdown of its unchanged pages"""
+    original = state["original"]["markdown"]
+    updated = state["updated"]["markdown"]
+    unchanged = state.get("unchanged_pages", {})
+    if not unchanged or not updated["success"]:
+        return {}
+    if not original["success"]:
+        return {"updated": {"markdown": MarkdownResult(
+            markdown_path="", success=False,
+            error=f"Unchanged pages could not be taken from the original: {original['error']}"
+        ).model_dump()}}
+    
+    page_markdown = list(updated["page_markdown"])
+    for updated_index, original_index in unchanged.items():
+        page_markdown[updated_index] = original["page_markdown"][original_index]
+    markdown_path = write_markdown_file(page_markdown, state["paths"]["base_dir"], _version_name(state, "updated"))
+    return {"updated": {"markdown": {**updated, "markdown_path": markdown_path, "page_markdown": page_markdown}}}
+
+def generate_diff(state: CompareState) -> Dict[str, Any]:
     """Generate diff between original and updated markdown"""
     try:
-        # Find the markdown results in the state
-        original_result = None
-        updated_result = None
-        for message in reversed(state):
-            if message.content.startswith("original:") and "markdown_path" in message.content:
-                original_result = eval(message.content.split(":", 1)[1])
-            elif message.content.startswith("updated:") and "markdown_path" in message.content:
-                updated_result = eval(message.content.split(":", 1)[1])
-            
-            if original_result and updated_result:
-                break
-        
-        with open(original_result["markdown_path"], 'r') as f:
-            original_text = f.readlines()
-        with open(updated_result["markdown_path"], 'r') as f:
-            updated_text = f.readlines()
+        original_result = state["original"]["markdown"]
+        updated_result = state["updated"]["markdown"]
+        for result in (original_result, updated_result):
+            if not result["success"]:
+                raise RuntimeError(result["error"])
         
-        diff = list(difflib.unified_diff(original_text, updated_text))
-        diff_content = ''.join(diff)
+        # <doc>_diff.md next to the documents, named after the request (e.g. req.docx -> req_diff.md)
+        doc_name = os.path.splitext(os.path.basename(state["input_path"]))[0]
+        diff_path = os.path.join(state["paths"]["base_dir"], f"{doc_name}_diff.md")
+        hunks = write_diff(original_result["markdown_path"], updated_result["markdown_path"], diff_path)
         
-        result = DiffResult(diff_content=diff_content, success=True)
-        return state + [HumanMessage(content=str(result.dict()))]
+        result = DiffResult(diff_path=diff_path, hunks=hunks, success=True)
+        return {"diff": result.model_dump()}
     except Exception as e:
-        result = DiffResult(diff_content="", success=False, error=str(e))
-        return state + [HumanMessage(content=str(result.dict()))]
+        result = DiffResult(diff_path="", success=False, error=str(e))
+        return {"diff": result.model_dump()}
 
-def explain_diff(state: List[BaseMessage]) -> List[BaseMessage]:
-    """Explain the differences using LLM"""
+EXPLAIN_MODEL = "gpt-4"
+EXPLAIN_BATCH_TOKENS = 3000  # Diff tokens per request, leaving room for the prompt and the answer
+EXPLAIN_CONCURRENCY = 4
+
+EXPLAIN_PROMPT = """
+Analyze the following part of a paragraph-level diff and provide a clear, concise explanation of the changes.
+Lines starting with "-" are original paragraphs, "+" updated paragraphs, and "~" marks removed [-...-] and added {{+...+}} sentences:
+{diff}
+
+Focus on:
+1. What content was added or removed
+2. Any significant formatting changes
+3. The overall impact of these changes
+"""
+
+def _token_counter(model: str) -> Callable[[str], int]:
+    """Count tokens with tiktoken, or estimate ~4 characters per token if its encoding files cannot be loaded (offline)"""
+    try:
+        encoding = tiktoken.encoding_for_model(model)
+        return lambda text: len(encoding.encode(text))
+    except Exception:
+        return lambda text: len(text) // 4 + 1
+
+def _explain_batch(llm: ChatOpenAI, batch: List[str]) -> str:
+    """Explain one batch of hunks; retried on its own (by the scheduler) so a failure never redoes the other batches"""
+    messages = [HumanMessage(content=EXPLAIN_PROMPT.format(diff="".join(batch)))]
+    return get_scheduler().invoke(llm, messages, purpose="explain").content
+
+def explain_diff(state: CompareState) -> Dict[str, Any]:
+    """Explain the differences using LLM, one token-budgeted batch of hunks per request"""
     try:
-        diff_result = eval(state[-1].content)
+        diff_result = state["diff"]
         if not diff_result["success"]:
-            return state + [HumanMessage(content="Error: Failed to generate diff explanation")]
+            return {"error": f"Failed to generate diff explanation: {diff_result['error']}"}
         
-        llm = ChatOpenAI(model="gpt-4")
-        explanation = llm.invoke([
-            HumanMessage(content=f"""
-            Analyze the following unified diff and provide a clear, concise explanation of the changes:
-            {diff_result['diff_content']}
-            
-            Focus on:
-            1. What content was added or removed
-            2. Any significant formatting changes
-            3. The overall impact of these changes
-            """)
-        ])
-        
-        return state + [HumanMessage(content=f"diff_explanation:{explanation.content}")]
+        batches = list(pack_batches(read_hunks(diff_result["diff_path"]), EXPLAIN_BATCH_TOKENS, _token_counter(EXPLAIN_MODEL)))
+        
+        llm = chat_model(EXPLAIN_MODEL)
+        
+        def run(batch: List[str]) -> Optional[str]:
+            try:
+                return _explain_batch(llm, batch)
+            except Exception:
+                return None
+        
+        with ThreadPoolExecutor(max_workers=EXPLAIN_CONCURRENCY) as executor:
+            # Each batch runs in a copy of the caller's context so its calls keep the job's priority and metrics
+            futures = [executor.submit(contextvars.copy_context().run, run, batch) for batch in batches]
+            explanations = [future.result() for future in futures]
+        
+        # Assemble in document order; a batch that kept failing is marked rather than dropping the rest
+        sections = []
+        failed_batches = []
+        first_hunk = 1
+        for index, (batch, explanation) in enumerate(zip(batches, explanations)):
+            last_hunk = first_hunk + len(batch) - 1
+            heading = f"## Changes {first_hunk}-{last_hunk}" if last_hunk > first_hunk else f"## Change {first_hunk}"
+            if explanation is None:
+                failed_batches.append(index)
+                explanation = "_The explanation for these changes could not be generated._"
+            sections.append(f"{heading}\n\n{explanation}")
+            first_hunk = last_hunk + 1
+        if not sections:
+            sections.append("No differences were found between the original and updated documents.")
+        
+        doc_name = os.path.splitext(os.path.basename(state["input_path"]))[0]
+        explanation_path = os.path.join(state["paths"]["base_dir"], f"{doc_name}_diff_explanation.md")
+        with open(explanation_path, "w") as f:
+            f.write("\n\n".join(sections) + "\n")
+        
+        return {"explanation_path": explanation_path, "failed_batches": failed_batches}
     except Exception as e:
-        return state + [HumanMessage(content=f"Error explaining diff: {str(e)}")] 
\ No newline at end of file
+        return {"error": f"Error explaining diff: {str(e)}"}
+
+def _continue_if_parsed(state: CompareState) -> List[str]:
+    """Fan out to both versions once the request is parsed, or stop on a bad request"""
+    if state.get("error"):
+        return [END]
+    return ["original_docx_to_pdf", "updated_docx_to_pdf"]
+
+def build_compare_graph():
+    """
+    Compile the comparison graph.
+
+    The original and updated versions run on parallel branches that only meet where
+    they need each other: match_pages (after both are rasterized) and
+    fill_unchanged_pages (after both are converted), before generate_diff.
+    """
+    builder = StateGraph(CompareState)
+
+    builder.add_node("request", request_parser)
+    builder.add_node("original_docx_to_pdf", original_docx_to_pdf)
+    builder.add_node("updated_docx_to_pdf", updated_docx_to_pdf)
+    builder.add_node("original_pdf_to_png", original_pdf_to_png)
+    builder.add_node("updated_pdf_to_png", updated_pdf_to_png)
+    builder.add_node("match_pages", match_pages)
+    builder.add_node("original_png_to_markdown", original_png_to_markdown)
+    builder.add_node("updated_png_to_markdown", updated_png_to_markdown)
+    builder.add_node("fill_unchanged_pages", fill_unchanged_pages)
+    builder.add_node("generate_diff", generate_diff)
+    builder.add_node("explain_diff", explain_diff)
+
+    builder.add_edge(START, "request")
+    builder.add_conditional_edges("request", _continue_if_parsed, ["original_docx_to_pdf", "updated_docx_to_pdf", END])
+    builder.add_edge("original_docx_to_pdf", "original_pdf_to_png")
+    builder.add_edge("updated_docx_to_pdf", "updated_pdf_to_png")
+    builder.add_edge(["original_pdf_to_png", "updated_pdf_to_png"], "match_pages")
+    builder.add_edge("match_pages", "original_png_to_markdown")
+    builder.add_edge("match_pages", "updated_png_to_markdown")
+    builder.add_edge(["original_png_to_markdown", "updated_png_to_markdown"], "fill_unchanged_pages")
+    builder.add_edge("fill_unchanged_pages", "generate_diff")
+    builder.add_edge("generate_diff", "explain_diff")
+    builder.add_edge("explain_diff", END)
+
+    return builder.compile()
+
+compare_graph = build_compare_graph()
+
+async def main(input_path: str = "./test_files/test.docx"):
+    """
+    Compare the _original and _updated versions of a document.
+
+    Run from the repository root as a module, so the shared modules there are importable:
+    python -m old_files.chains
+    """
+    result = await compare_graph.ainvoke({"input_path": input_path})
+    print(result.get("error") or result.get("explanation_path", ""))
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,260 @@
+from typing import Callable, Iterable, Iterator, List, Sequence, Tuple
+from dataclasses import dataclass, field
+from bisect import bisect_left
+import difflib
+import hashlib
+import re
+
+# Opcodes follow difflib: (tag, a_start, a_end, b_start, b_end)
+Opcode = Tuple[str, int, int, int, int]
+
+SENTENCE_BOUNDARY = re.compile(r"(?<=[.!?])\s+")
+
+def split_paragraphs(text: str) -> List[str]:
+    """Split markdown into paragraphs (blocks separated by blank lines)."""
+    return [block.strip("\n") for block in re.split(r"\n\s*\n", text) if block.strip()]
+
+def split_sentences(paragraph: str) -> List[str]:
+    return [s for s in SENTENCE_BOUNDARY.split(paragraph.strip()) if s]
+
+def unit_hash(text: str) -> str:
+    """
+    Hash a paragraph or sentence with whitespace normalized.
+
+    Re-wrapping a paragraph over different lines (a reflowed page) does not
+    change its hash, so reflow alone never shows up as a change.
+    """
+    return hashlib.sha1(" ".join(text.split()).encode()).hexdigest()
+
+def _longest_increasing_run(pairs: List[Tuple[int, int]]) -> List[Tuple[int, int]]:
+    """Patience sorting: the longest subsequence of (a, b) pairs, sorted by a, whose b also increases."""
+    tails: List[int] = []
+    tail_index: List[int] = []
+    previous = [-1] * len(pairs)
+    for i, (_, b) in enumerate(pairs):
+        pos = bisect_left(tails, b)
+        if pos == len(tails):
+            tails.append(b)
+            tail_index.append(i)
+        else:
+            tails[pos] = b
+            tail_index[pos] = i
+        previous[i] = tail_index[pos - 1] if pos else -1
+    result = []
+    i = tail_index[-1] if tail_index else -1
+    while i != -1:
+        result.append(pairs[i])
+        i = previous[i]
+    return result[::-1]
+
+def patience_opcodes(a: Sequence[str], b: Sequence[str]) -> List[Opcode]:
+    """
+    Diff two sequences of unit hashes with the patience algorithm.
+
+    Units that occur exactly once on both sides anchor the alignment and the
+    gaps between anchors are diffed recursively. Only gaps without any unique
+    anchor fall back to difflib, so large documents stay close to linear time
+    and matches are never made on common, repeated units.
+    """
+    opcodes: List[Opcode] = []
+    stack = [(0, len(a), 0, len(b))]
+    while stack:
+        a_lo, a_hi, b_lo, b_hi = stack.pop()
+
+        # Common prefix and suffix
+        start_a, start_b = a_lo, b_lo
+        while a_lo < a_hi and b_lo < b_hi and a[a_lo] == b[b_lo]:
+            a_lo += 1
+            b_lo += 1
+        if a_lo > start_a:
+            opcodes.append(("equal", start_a, a_lo, start_b, b_lo))
+        end_a, end_b = a_hi, b_hi
+        while a_hi > a_lo and b_hi > b_lo and a[a_hi - 1] == b[b_hi - 1]:
+            a_hi -= 1
+            b_hi -= 1
+        if a_hi < end_a:
+            opcodes.append(("equal", a_hi, end_a, b_hi, end_b))
+
+        if a_lo == a_hi or b_lo == b_hi:
+            if a_lo < a_hi or b_lo < b_hi:
+                tag = "delete" if a_lo < a_hi else "insert"
+                opcodes.append((tag, a_lo, a_hi, b_lo, b_hi))
+            continue
+
+        counts = {}
+        for i in range(a_lo, a_hi):
+            counts.setdefault(a[i], [0, 0, i])[0] += 1
+        for j in range(b_lo, b_hi):
+            if b[j] in counts:
+                entry = counts[b[j]]
+                entry[1] += 1
+                entry.append(j)
+        unique = sorted((entry[2], entry[3]) for entry in counts.values() if entry[0] == 1 and entry[1] == 1)
+        anchors = _longest_increasing_run(unique)
+
+        if not anchors:
+            matcher = difflib.SequenceMatcher(None, a[a_lo:a_hi], b[b_lo:b_hi], autojunk=False)
+            for tag, i1, i2, j1, j2 in matcher.get_opcodes():
+                opcodes.append((tag, a_lo + i1, a_lo + i2, b_lo + j1, b_lo + j2))
+            continue
+
+        prev_a, prev_b = a_lo, b_lo
+        for anchor_a, anchor_b in anchors:
+            stack.append((prev_a, anchor_a, prev_b, anchor_b))
+            opcodes.append(("equal", anchor_a, anchor_a + 1, anchor_b, anchor_b + 1))
+            prev_a, prev_b = anchor_a + 1, anchor_b + 1
+        stack.append((prev_a, a_hi, prev_b, b_hi))
+
+    opcodes.sort(key=lambda op: (op[1], op[3]))
+    return _merge_equal(opcodes)
+
+def _merge_equal(opcodes: List[Opcode]) -> List[Opcode]:
+    """Coalesce adjacent opcodes of the same kind and turn delete+insert pairs into replace."""
+    merged: List[Opcode] = []
+    for op in opcodes:
+        if op[1] == op[2] and op[3] == op[4]:
+            continue
+        if merged:
+            tag, a1, a2, b1, b2 = merged[-1]
+            if a2 == op[1] and b2 == op[3] and (tag == op[0] or (tag != "equal" and op[0] != "equal")):
+                new_tag = tag if tag == op[0] else "replace"
+                merged[-1] = (new_tag, a1, op[2], b1, op[4])
+                continue
+        merged.append(op)
+    return merged
+
+def inline_sentence_diff(original: str, updated: str) -> str:
+    """Render one changed paragraph with removed sentences as [-...-] and added ones as {+...+}."""
+    old, new = split_sentences(original), split_sentences(updated)
+    parts = []
+    for tag, i1, i2, j1, j2 in patience_opcodes([unit_hash(s) for s in old], [unit_hash(s) for s in new]):
+        if tag == "equal":
+            parts.extend(new[j1:j2])
+            continue
+        if i2 > i1:
+            parts.append("[-" + " ".join(old[i1:i2]) + "-]")
+        if j2 > j1:
+            parts.append("{+" + " ".join(new[j1:j2]) + "+}")
+    # Keep the annotated paragraph on one line, whatever its original line wrapping
+    return " ".join(" ".join(parts).split())
+
+@dataclass
+class Hunk:
+    """A run of changed paragraphs together with its surrounding context paragraphs."""
+    original_start: int
+    updated_start: int
+    lines: List[str] = field(default_factory=list)
+    original_count: int = 0
+    updated_count: int = 0
+
+    def header(self) -> str:
+        return f"@@ -{self.original_start + 1},{self.original_count} +{self.updated_start + 1},{self.updated_count} @@"
+
+    def format(self) -> str:
+        return "\n".join([self.header(), *self.lines]) + "\n"
+
+def _paragraph_lines(prefix: str, paragraph: str) -> List[str]:
+    return [f"{prefix} {line}" for line in paragraph.splitlines()]
+
+def iter_hunks(original_text: str, updated_text: str, context: int = 1) -> Iterator[Hunk]:
+    """
+    Yield paragraph-level hunks between two markdown documents, in document order.
+
+    Every changed paragraph appears whole, so each hunk carries the full
+    sentences and paragraphs around a change. Up to `context` unchanged
+    paragraphs are included on each side. A paragraph replaced by exactly one
+    other paragraph also gets a "~" line that marks the changed sentences.
+    """
+    original = split_paragraphs(original_text)
+    updated = split_paragraphs(updated_text)
+    opcodes = patience_opcodes([unit_hash(p) for p in original], [unit_hash(p) for p in updated])
+
+    for group in _group_opcodes(opcodes, context):
+        first = group[0]
+        hunk = Hunk(original_start=first[1], updated_start=first[3])
+        for tag, i1, i2, j1, j2 in group:
+            hunk.original_count += i2 - i1
+            hunk.updated_count += j2 - j1
+            if tag == "equal":
+                for paragraph in updated[j1:j2]:
+                    hunk.lines.extend(_paragraph_lines(" ", paragraph))
+                continue
+            for paragraph in original[i1:i2]:
+                hunk.lines.extend(_paragraph_lines("-", paragraph))
+            for paragraph in updated[j1:j2]:
+                hunk.lines.extend(_paragraph_lines("+", paragraph))
+            if tag == "replace" and i2 - i1 == 1 and j2 - j1 == 1:
+                hunk.lines.append(f"~ {inline_sentence_diff(original[i1], updated[j1])}")
+        yield hunk
+
+def _group_opcodes(opcodes: List[Opcode], context: int) -> Iterator[List[Opcode]]:
+    """Group opcodes into hunks with `context` unchanged paragraphs around each change (as difflib does for lines)."""
+    codes = list(opcodes)
+    if not codes:
+        return
+    tag, i1, i2, j1, j2 = codes[0]
+    if tag == "equal":
+        codes[0] = (tag, max(i1, i2 - context), i2, max(j1, j2 - context), j2)
+    tag, i1, i2, j1, j2 = codes[-1]
+    if tag == "equal":
+        codes[-1] = (tag, i1, min(i2, i1 + context), j1, min(j2, j1 + context))
+
+    group: List[Opcode] = []
+    for tag, i1, i2, j1, j2 in codes:
+        # A long unchanged stretch closes the current hunk and opens the next one
+        if tag == "equal" and i2 - i1 > 2 * context:
+            group.append((tag, i1, min(i2, i1 + context), j1, min(j2, j1 + context)))
+            if any(op[0] != "equal" for op in group):
+                yield group
+            group = []
+            i1, j1 = max(i1, i2 - context), max(j1, j2 - context)
+        group.append((tag, i1, i2, j1, j2))
+    if any(op[0] != "equal" for op in group):
+        yield group
+
+def write_diff(original_path: str, updated_path: str, diff_path: str, context: int = 1) -> int:
+    """Stream the hunks between two markdown files into `diff_path`; returns the number of hunks."""
+    with open(original_path) as f:
+        original_text = f.read()
+    with open(updated_path) as f:
+        updated_text = f.read()
+
+    hunks = 0
+    with open(diff_path, "w") as out:
+        out.write(f"--- {original_path}\n+++ {updated_path}\n")
+        for hunk in iter_hunks(original_text, updated_text, context=context):
+            out.write(hunk.format())
+            hunks += 1
+    return hunks
+
+def read_hunks(diff_path: str) -> Iterator[str]:
+    """Stream the hunks of a diff file written by write_diff, each as one string."""
+    hunk: List[str] = []
+    with open(diff_path) as f:
+        for line in f:
+            if line.startswith("@@"):
+                if hunk:
+                    yield "".join(hunk)
+                hunk = [line]
+            elif hunk:
+                hunk.append(line)
+    if hunk:
+        yield "".join(hunk)
+
+def pack_batches(hunks: Iterable[str], max_tokens: int, count_tokens: Callable[[str], int]) -> Iterator[List[str]]:
+    """
+    Pack consecutive hunks into batches of at most `max_tokens` tokens, keeping document order.
+
+    A hunk that alone exceeds the budget becomes a batch of its own rather than being split.
+    """
+    batch: List[str] = []
+    batch_tokens = 0
+    for hunk in hunks:
+        tokens = count_tokens(hunk)
+        if batch and batch_tokens + tokens > max_tokens:
+            yield batch
+            batch, batch_tokens = [], 0
+        batch.append(hunk)
+        batch_tokens += tokens
+    if batch:
+        yield batch
@@ -0,0 +1,95 @@
+from typing import Dict, List, Tuple
+from dataclasses import dataclass
+import hashlib
+
+from PIL import Image, ImageChops
+
+HASH_SIZE = 16
+# Maximum Hamming distance (out of HASH_SIZE * HASH_SIZE bits) for two pages to be aligned
+MAX_HASH_DISTANCE = 24
+# Pixels whose gray level differs by more than this count as a real change, not rendering noise
+PIXEL_TOLERANCE = 64
+
+@dataclass
+class PageFingerprint:
+    png_path: str
+    sha256: str
+    dhash: int
+
+def difference_hash(image: Image.Image, hash_size: int = HASH_SIZE) -> int:
+    """Perceptual hash: one bit per horizontally adjacent pair of a downscaled grayscale image."""
+    small = image.convert("L").resize((hash_size + 1, hash_size), Image.LANCZOS)
+    pixels = list(small.getdata())
+    bits = 0
+    for row in range(hash_size):
+        offset = row * (hash_size + 1)
+        for col in range(hash_size):
+            bits = (bits << 1) | (pixels[offset + col] > pixels[offset + col + 1])
+    return bits
+
+def fingerprint_page(png_path: str) -> PageFingerprint:
+    """Compute the exact and perceptual fingerprint of a page image."""
+    with open(png_path, "rb") as f:
+        data = f.read()
+    with Image.open(png_path) as image:
+        dhash = difference_hash(image)
+    return PageFingerprint(png_path=png_path, sha256=hashlib.sha256(data).hexdigest(), dhash=dhash)
+
+def hash_distance(a: int, b: int) -> int:
+    return bin(a ^ b).count("1")
+
+def _similar(a: PageFingerprint, b: PageFingerprint) -> bool:
+    return a.sha256 == b.sha256 or hash_distance(a.dhash, b.dhash) <= MAX_HASH_DISTANCE
+
+def align_pages(original: List[PageFingerprint], updated: List[PageFingerprint]) -> List[Tuple[int, int]]:
+    """
+    Align two page sequences, tolerating inserted and deleted pages.
+
+    Returns (original_index, updated_index) pairs of pages that look alike, in
+    order, chosen as the longest common subsequence under perceptual similarity.
+    """
+    n, m = len(original), len(updated)
+    lengths = [[0] * (m + 1) for _ in range(n + 1)]
+    for i in range(n - 1, -1, -1):
+        for j in range(m - 1, -1, -1):
+            if _similar(original[i], updated[j]):
+                lengths[i][j] = lengths[i + 1][j + 1] + 1
+            else:
+                lengths[i][j] = max(lengths[i + 1][j], lengths[i][j + 1])
+
+    pairs = []
+    i = j = 0
+    while i < n and j < m:
+        if _similar(original[i], updated[j]) and lengths[i][j] == lengths[i + 1][j + 1] + 1:
+            pairs.append((i, j))
+            i += 1
+            j += 1
+        elif lengths[i + 1][j] >= lengths[i][j + 1]:
+            i += 1
+        else:
+            j += 1
+    return pairs
+
+def pages_identical(a: PageFingerprint, b: PageFingerprint) -> bool:
+    """
+    Confirm that two aligned pages carry the same content.
+
+    Perceptual hashes are too coarse to notice a single edited word, so a
+    perceptual match is only accepted if no pixel differs beyond rendering noise.
+    """
+    if a.sha256 == b.sha256:
+        return True
+    with Image.open(a.png_path) as image_a, Image.open(b.png_path) as image_b:
+        if image_a.size != image_b.size:
+            return False
+        diff = ImageChops.difference(image_a.convert("L"), image_b.convert("L"))
+        return diff.point(lambda v: 255 if v > PIXEL_TOLERANCE else 0).getbbox() is None
+
+def match_unchanged_pages(original_pngs: List[str], updated_pngs: List[str]) -> Dict[int, int]:
+    """Map each unchanged updated page index to the index of its identical original page."""
+    original = [fingerprint_page(p) for p in original_pngs]
+    updated = [fingerprint_page(p) for p in updated_pngs]
+    return {
+        j: i for i, j in align_pages(original, updated)
+        if pages_identical(original[i], updated[j])
+    }
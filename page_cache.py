@@ -0,0 +1,132 @@
+from typing import Optional
+import os
+import time
+import sqlite3
+import hashlib
+import threading
+from dataclasses import dataclass
+
+DEFAULT_CACHE_PATH = os.environ.get(
+    "PAGE_CACHE_PATH",
+    os.path.join(os.path.expanduser("~"), ".cache", "docx_markdown", "page_cache.sqlite3")
+)
+DEFAULT_MAX_ENTRIES = 20000
+DEFAULT_MAX_BYTES = 256 * 1024 * 1024
+
+@dataclass
+class CacheStats:
+    hits: int = 0
+    misses: int = 0
+    evictions: int = 0
+    entries: int = 0
+    size_bytes: int = 0
+
+def page_cache_key(image_bytes: bytes, model: str, prompt: str) -> str:
+    """
+    Build the content address of a page conversion.
+
+    The key covers the page image bytes, the model name and the prompt text, so
+    changing either the model or the prompt automatically misses old entries.
+    """
+    digest = hashlib.sha256()
+    for part in (model.encode(), prompt.encode(), image_bytes):
+        digest.update(len(part).to_bytes(8, "big"))
+        digest.update(part)
+    return digest.hexdigest()
+
+class PageCache:
+    """Persistent page->markdown cache stored in a local SQLite file with LRU eviction."""
+
+    def __init__(
+        self,
+        path: str = DEFAULT_CACHE_PATH,
+        max_entries: int = DEFAULT_MAX_ENTRIES,
+        max_bytes: int = DEFAULT_MAX_BYTES
+    ):
+        if path != ":memory:":
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self.path = path
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._stats = CacheStats()
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS pages ("
+            "key TEXT PRIMARY KEY, markdown TEXT NOT NULL, "
+            "size INTEGER NOT NULL, last_access REAL NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS pages_last_access ON pages (last_access)")
+        self._conn.commit()
+
+    def get(self, key: str) -> Optional[str]:
+        """Return the cached markdown for `key`, or None on a miss."""
+        with self._lock:
+            row = self._conn.execute("SELECT markdown FROM pages WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                self._stats.misses += 1
+                return None
+            self._conn.execute("UPDATE pages SET last_access = ? WHERE key = ?", (time.time(), key))
+            self._conn.commit()
+            self._stats.hits += 1
+            return row[0]
+
+    def put(self, key: str, markdown: str) -> None:
+        """Store the markdown for `key` and evict least recently used entries if over budget."""
+        size = len(markdown.encode())
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO pages (key, markdown, size, last_access) VALUES (?, ?, ?, ?)",
+                (key, markdown, size, time.time())
+            )
+            self._evict()
+            self._conn.commit()
+
+    def _evict(self) -> None:
+        entries, total = self._conn.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM pages").fetchone()
+        if entries <= self.max_entries and total <= self.max_bytes:
+            return
+        rows = self._conn.execute("SELECT key, size FROM pages ORDER BY last_access ASC").fetchall()
+        evicted = []
+        for key, size in rows:
+            if entries <= self.max_entries and total <= self.max_bytes:
+                break
+            evicted.append((key,))
+            entries -= 1
+            total -= size
+        self._conn.executemany("DELETE FROM pages WHERE key = ?", evicted)
+        self._stats.evictions += len(evicted)
+
+    def stats(self) -> CacheStats:
+        """Return hit/miss/eviction counters for this process plus the current cache size."""
+        with self._lock:
+            entries, total = self._conn.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM pages").fetchone()
+            return CacheStats(
+                hits=self._stats.hits,
+                misses=self._stats.misses,
+                evictions=self._stats.evictions,
+                entries=entries,
+                size_bytes=total
+            )
+
+    def clear(self) -> None:
+        """Remove every cached page."""
+        with self._lock:
+            self._conn.execute("DELETE FROM pages")
+            self._conn.commit()
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+_default_cache: Optional[PageCache] = None
+_default_cache_lock = threading.Lock()
+
+def get_default_cache() -> PageCache:
+    """Return the process-wide cache at DEFAULT_CACHE_PATH, opening it on first use."""
+    global _default_cache
+    with _default_cache_lock:
+        if _default_cache is None:
+            _default_cache = PageCache()
+        return _default_cache
@@ -0,0 +1,237 @@
+import io
+import os
+import glob
+import argparse
+import statistics
+from dataclasses import asdict, dataclass, replace
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+from PIL import Image, ImageStat
+from rasterizer import PageImage
+import metrics
+
+# Cheaper vision model for pages that are plain prose
+LIGHT_VISION_MODEL = os.getenv("LIGHT_VISION_MODEL", "gpt-4o-mini")
+MATH_PROMPT = (
+    "Convert this image to markdown. The page contains mathematical notation: transcribe every formula "
+    "as LaTeX, inline formulas between $...$ and display equations between $$...$$, keeping equation numbers."
+)
+
+BLANK = "blank"
+TEXT = "text"
+COMPLEX = "complex"
+MATH = "math"
+
+@dataclass
+class ClassifierSettings:
+    """
+    Thresholds of the page classifier, in terms of a grayscale copy of the page
+    scaled to `analysis_width` pixels. Lengths are relative to the page or to
+    the median text line height so they do not depend on the rendering DPI.
+    """
+    analysis_width: int = 800
+    ink_threshold: int = 200  # Gray level below which a pixel counts as ink
+    blank_ink: float = 0.001  # Pages with less ink than this share of pixels are blank
+    max_line_height: float = 0.03  # Bands taller than this share of the page are never text lines
+    tall_line: float = 1.3  # Lines this many times the median height hold fractions, sums or large symbols
+    figure_line: float = 4.0  # Bands this many times the median height are figures or tables
+    figure_share: float = 0.05  # Share of the page height covered by figure bands that makes a page complex
+    bar_height: float = 0.35  # Bands at most this many times the median height can be fraction bars
+    centered_tolerance: float = 0.08  # Offset from the column center, as a share of the column width
+    narrow_line: float = 0.75  # Lines narrower than this share of the column can be display equations
+    math_lines: int = 2  # Equation-like lines that make a page a math page
+    rule_fill: float = 0.85  # Rows inked over this share of the column are horizontal rules
+    table_rules: int = 3  # Horizontal rules that make a page a table page
+    light_model: str = LIGHT_VISION_MODEL
+
+@dataclass
+class PageFeatures:
+    ink_density: float
+    lines: int
+    line_height: float
+    equation_lines: int
+    figure_share: float
+    rules: int
+
+@dataclass
+class PageRoute:
+    """How one page is sent to the vision model; None model or prompt means the converter's default."""
+    page_number: int
+    page_class: str
+    features: PageFeatures
+    skip: bool = False
+    model: Optional[str] = None
+    prompt: Optional[str] = None
+
+    @property
+    def prompt_name(self) -> str:
+        return "math" if self.prompt == MATH_PROMPT else "page"
+
+def _ink_bands(row_ink: List[float]) -> List[Tuple[int, int]]:
+    """Return [top, bottom) row ranges of consecutive inked rows."""
+    bands, top = [], None
+    for y, value in enumerate(row_ink + [0.0]):
+        if value > 0 and top is None:
+            top = y
+        elif value <= 0 and top is not None:
+            bands.append((top, y))
+            top = None
+    return bands
+
+def _content_extent(band: Image.Image, column_right: int, column_width: int, line_height: float) -> Tuple[int, int]:
+    """Horizontal extent of a band's ink, ignoring an equation number set apart at the right margin."""
+    columns = [v > 0 for v in band.convert("F").resize((band.width, 1), Image.BOX).getdata()]
+    segments: List[List[int]] = []
+    for x, inked in enumerate(columns):
+        if not inked:
+            continue
+        if segments and x - segments[-1][1] <= 2 * line_height:
+            segments[-1][1] = x + 1
+        else:
+            segments.append([x, x + 1])
+    left, right = segments[0][0], segments[-1][1]
+    if len(segments) > 1:
+        last_left, last_right = segments[-1]
+        if last_right >= column_right - 0.05 * column_width and last_right - last_left <= 0.1 * column_width:
+            right = segments[-2][1]
+    return left, right
+
+def measure_page(image: Image.Image, settings: ClassifierSettings) -> PageFeatures:
+    """Compute ink density and the line, equation, figure and rule structure of a page image."""
+    gray = image.convert("L")
+    height = max(1, round(gray.height * settings.analysis_width / gray.width))
+    gray = gray.resize((settings.analysis_width, height), Image.BOX)
+    ink = gray.point(lambda v: 255 if v < settings.ink_threshold else 0)
+
+    ink_density = ImageStat.Stat(ink).mean[0] / 255
+    if ink_density < settings.blank_ink:
+        return PageFeatures(ink_density=ink_density, lines=0, line_height=0.0, equation_lines=0, figure_share=0.0, rules=0)
+
+    # Share of inked pixels per row, then bands of consecutive inked rows with their horizontal extent
+    row_ink = [v / 255 for v in ink.convert("F").resize((1, height), Image.BOX).getdata()]
+    bands = []
+    for top, bottom in _ink_bands(row_ink):
+        left, _, right, _ = ink.crop((0, top, ink.width, bottom)).getbbox()
+        bands.append((top, bottom, left, right))
+
+    line_bands = [b for b in bands if b[1] - b[0] <= settings.max_line_height * height]
+    line_height = statistics.median(b[1] - b[0] for b in line_bands) if line_bands else settings.max_line_height * height / 2
+    column_left = min((b[2] for b in line_bands), default=0)
+    column_right = max((b[3] for b in line_bands), default=ink.width)
+    column_width = max(1, column_right - column_left)
+    column_center = (column_left + column_right) / 2
+
+    equation_lines = 0
+    figure_rows = 0
+    for top, bottom, _, _ in bands:
+        band_height = bottom - top
+        if band_height >= settings.figure_line * line_height:
+            figure_rows += band_height
+            continue
+        band = ink.crop((0, top, ink.width, bottom))
+        left, right = _content_extent(band, column_right, column_width, line_height)
+        centered = abs((left + right) / 2 - column_center) <= settings.centered_tolerance * column_width
+        narrow = right - left <= settings.narrow_line * column_width
+        tall = band_height >= settings.tall_line * line_height
+        # A thin, solid band on its own is a fraction bar (a horizontal rule spans the whole column instead)
+        bar = band_height <= settings.bar_height * line_height and ImageStat.Stat(band.crop((left, 0, right, band_height))).mean[0] >= 128
+        # Display equations sit centered on their own line; big operators make them tall and fractions add bars
+        if centered and narrow and (tall or bar):
+            equation_lines += 1
+
+    # Count runs of rule rows, so a rule a few pixels thick counts once
+    rule_rows = [v * ink.width >= settings.rule_fill * column_width for v in row_ink]
+    rules = sum(1 for y, is_rule in enumerate(rule_rows) if is_rule and (y == 0 or not rule_rows[y - 1]))
+
+    return PageFeatures(
+        ink_density=ink_density,
+        lines=len(line_bands),
+        line_height=float(line_height),
+        equation_lines=equation_lines,
+        figure_share=figure_rows / height,
+        rules=rules
+    )
+
+def classify_features(features: PageFeatures, settings: ClassifierSettings) -> str:
+    """Pick the page class; a doubtful page gets the heavier route rather than the cheaper one."""
+    if features.ink_density < settings.blank_ink:
+        return BLANK
+    if features.equation_lines >= settings.math_lines:
+        return MATH
+    if features.figure_share >= settings.figure_share or features.rules >= settings.table_rules or features.equation_lines:
+        return COMPLEX
+    return TEXT
+
+def route_page(page_number: int, features: PageFeatures, settings: ClassifierSettings) -> PageRoute:
+    """Blank pages are skipped, prose goes to the light model, math pages get the math prompt."""
+    page_class = classify_features(features, settings)
+    if page_class == BLANK:
+        return PageRoute(page_number, page_class, features, skip=True)
+    if page_class == TEXT:
+        return PageRoute(page_number, page_class, features, model=settings.light_model)
+    if page_class == MATH:
+        return PageRoute(page_number, page_class, features, prompt=MATH_PROMPT)
+    return PageRoute(page_number, page_class, features)
+
+def classify_page(page: PageImage, settings: Optional[ClassifierSettings] = None) -> PageRoute:
+    """Measure and route a single page image."""
+    settings = settings or ClassifierSettings()
+    with Image.open(io.BytesIO(page.read())) as image:
+        features = measure_page(image, settings)
+    return route_page(page.page_number, features, settings)
+
+def iter_classified_pages(
+    pages: Iterable[PageImage],
+    settings: Optional[ClassifierSettings] = None,
+    routes: Optional[Dict[int, PageRoute]] = None
+) -> Iterator[PageImage]:
+    """
+    Classify pages lazily, storing each page's PageRoute in `routes` by page number.
+
+    Every decision is recorded as a "route" metric. Pages are yielded with their
+    image bytes loaded, so later steps do not read the file again.
+    """
+    settings = settings or ClassifierSettings()
+    for page in pages:
+        try:
+            page = replace(page, data=page.read())
+            route = classify_page(page, settings)
+        except Exception:
+            # A page that cannot be read or decoded keeps the default route; the
+            # vision step then records the error as that page's failure
+            yield page
+            continue
+        if routes is not None:
+            routes[page.page_number] = route
+        metrics.record(
+            "route",
+            page_number=page.page_number,
+            page_class=route.page_class,
+            skipped=route.skip,
+            model=route.model or "",
+            prompt=route.prompt_name,
+            **asdict(route.features)
+        )
+        yield page
+
+def main():
+    """
+    Print the class and features of page images offline, without any LLM calls, e.g. to tune the thresholds.
+
+    Example: python page_classifier.py test_files/png_files
+    """
+    parser = argparse.ArgumentParser(description="Classify page images the way the vision step routes them")
+    parser.add_argument("paths", nargs="+", help="PNG files or directories of PNG files")
+    args = parser.parse_args()
+
+    png_paths = []
+    for path in args.paths:
+        png_paths.extend(sorted(glob.glob(os.path.join(path, "*.png"))) if os.path.isdir(path) else [path])
+    settings = ClassifierSettings()
+    print(f"{'page':<40} {'class':<8} {'ink':>6} {'lines':>5} {'eqs':>4} {'figure':>6} {'rules':>5}")
+    for png_path in png_paths:
+        route = classify_page(PageImage(page_number=0, path=png_path), settings)
+        f = route.features
+        print(f"{os.path.basename(png_path):<40} {route.page_class:<8} {f.ink_density:>6.3f} {f.lines:>5} {f.equation_lines:>4} {f.figure_share:>6.2f} {f.rules:>5}")
+
+if __name__ == "__main__":
+    main()
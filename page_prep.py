@@ -0,0 +1,181 @@
+import io
+import os
+import math
+import glob
+import argparse
+from dataclasses import dataclass, replace
+from typing import Iterable, Iterator, List, Optional, Tuple
+from PIL import Image, ImageChops, ImageStat
+from rasterizer import PageImage, iter_page_images
+
+MIME_TYPES = {"JPEG": "image/jpeg", "WEBP": "image/webp", "PNG": "image/png"}
+
+@dataclass
+class PrepSettings:
+    """
+    How page images are shrunk before they are sent to the vision model.
+
+    The defaults follow the high-detail image budget of the OpenAI vision
+    models: an image is fitted inside 2048x2048 and then scaled so its short
+    side is at most 768px. Anything larger is downsampled by the API anyway.
+    """
+    max_long_side: int = 2048
+    max_short_side: int = 768
+    trim_margins: bool = True
+    blank_threshold: int = 245  # Gray level at or above which a pixel counts as blank paper
+    margin_padding: int = 12
+    grayscale: bool = False
+    image_format: str = "WEBP"
+    quality: int = 80
+
+@dataclass
+class PrepReport:
+    page_number: int
+    original_bytes: int
+    prepared_bytes: int
+    original_size: Tuple[int, int]
+    prepared_size: Tuple[int, int]
+
+    @property
+    def bytes_saved(self) -> int:
+        return self.original_bytes - self.prepared_bytes
+
+def trim_blank_margins(image: Image.Image, blank_threshold: int, padding: int) -> Image.Image:
+    """Crop away the blank paper around the page content, keeping `padding` pixels of border."""
+    ink = image.convert("L").point(lambda v: 255 if v < blank_threshold else 0)
+    bbox = ink.getbbox()
+    if bbox is None:
+        return image  # Blank page: nothing to anchor a crop on
+    left, top, right, bottom = bbox
+    return image.crop((
+        max(0, left - padding),
+        max(0, top - padding),
+        min(image.width, right + padding),
+        min(image.height, bottom + padding)
+    ))
+
+def fit_to_budget(image: Image.Image, max_long_side: int, max_short_side: int) -> Image.Image:
+    """Downscale (never upscale) so the image fits the model's resolution budget."""
+    width, height = image.size
+    # Fitting the long side first and then the short side comes down to the smaller of the two scales
+    scale = min(1.0, max_long_side / max(width, height), max_short_side / max(1, min(width, height)))
+    if scale >= 1.0:
+        return image
+    size = (max(1, round(width * scale)), max(1, round(height * scale)))
+    return image.resize(size, Image.LANCZOS)
+
+def shape_page(image: Image.Image, settings: PrepSettings) -> Image.Image:
+    """Apply the geometric and color steps of page preparation, without encoding."""
+    if settings.trim_margins:
+        image = trim_blank_margins(image, settings.blank_threshold, settings.margin_padding)
+    image = fit_to_budget(image, settings.max_long_side, settings.max_short_side)
+    if settings.grayscale:
+        image = image.convert("L")
+    elif image.mode not in ("RGB", "L"):
+        image = image.convert("RGB")
+    return image
+
+def encode_page(image: Image.Image, settings: PrepSettings) -> bytes:
+    """Encode a shaped page in the configured format."""
+    image_format = settings.image_format.upper()
+    buffer = io.BytesIO()
+    if image_format == "PNG":
+        image.save(buffer, "PNG", optimize=True)
+    else:
+        image.save(buffer, image_format, quality=settings.quality)
+    return buffer.getvalue()
+
+def prepare_page(page: PageImage, settings: PrepSettings) -> Tuple[PageImage, PrepReport]:
+    """Return a smaller copy of `page` ready for the vision model, plus what it saved."""
+    original = page.read()
+    with Image.open(io.BytesIO(original)) as image:
+        original_size = image.size
+        shaped = shape_page(image, settings)
+        data = encode_page(shaped, settings)
+        prepared_size = shaped.size
+
+    # The API downsamples oversized images itself, so a page that does not get smaller is sent as is
+    if len(data) >= len(original):
+        return replace(page, data=original), PrepReport(page.page_number, len(original), len(original), original_size, original_size)
+
+    report = PrepReport(page.page_number, len(original), len(data), original_size, prepared_size)
+    return replace(page, data=data, mime_type=MIME_TYPES[settings.image_format.upper()]), report
+
+def iter_prepared_pages(
+    pages: Iterable[PageImage],
+    settings: Optional[PrepSettings] = None,
+    reports: Optional[List[PrepReport]] = None
+) -> Iterator[PageImage]:
+    """Prepare pages lazily, appending a PrepReport per page to `reports` when given."""
+    settings = settings or PrepSettings()
+    for page in pages:
+        try:
+            prepared, report = prepare_page(page, settings)
+        except Exception:
+            # An image PIL cannot decode is left for the vision call to accept or reject
+            yield page
+            continue
+        if reports is not None:
+            reports.append(report)
+        yield prepared
+
+def _psnr(reference: Image.Image, candidate: Image.Image) -> float:
+    """Peak signal-to-noise ratio of `candidate` against `reference`, in dB."""
+    diff = ImageChops.difference(reference, candidate.convert(reference.mode))
+    mse = sum(v * v for v in ImageStat.Stat(diff).rms) / len(diff.getbands())
+    return float("inf") if mse == 0 else 10 * math.log10(255 ** 2 / mse)
+
+def _load_pages(paths: List[str], dpi: int) -> Iterator[Tuple[str, PageImage]]:
+    for path in paths:
+        if os.path.isdir(path):
+            for png_path in sorted(glob.glob(os.path.join(path, "*.png"))):
+                yield png_path, PageImage(page_number=0, path=png_path)
+        elif path.lower().endswith(".pdf"):
+            for page in iter_page_images(path, dpi=dpi):
+                yield f"{path}#{page.page_number}", page
+        else:
+            yield path, PageImage(page_number=0, path=path)
+
+def main():
+    """
+    Compare size and fidelity of page preparation settings offline, without any LLM calls.
+
+    Example: python page_prep.py test_files/pdf_files/test_updated.pdf --format JPEG WEBP --quality 60 85
+    """
+    parser = argparse.ArgumentParser(description="Measure the quality/size tradeoff of page preparation")
+    parser.add_argument("paths", nargs="+", help="PDF files, PNG files or directories of PNG files")
+    parser.add_argument("--format", nargs="+", default=["JPEG", "WEBP", "PNG"], dest="formats")
+    parser.add_argument("--quality", nargs="+", type=int, default=[60, 75, 85, 95], dest="qualities")
+    parser.add_argument("--grayscale", action="store_true")
+    parser.add_argument("--no-trim", action="store_true")
+    parser.add_argument("--dpi", type=int, default=300)
+    args = parser.parse_args()
+
+    pages = list(_load_pages(args.paths, args.dpi))
+    print(f"{'format':<6} {'quality':>7} {'original':>12} {'prepared':>12} {'saved':>7} {'min PSNR':>9}")
+    for image_format in args.formats:
+        qualities = [100] if image_format.upper() == "PNG" else args.qualities
+        for quality in qualities:
+            settings = PrepSettings(
+                image_format=image_format.upper(),
+                quality=quality,
+                grayscale=args.grayscale,
+                trim_margins=not args.no_trim
+            )
+            original_total = prepared_total = 0
+            worst_psnr = float("inf")
+            for _, page in pages:
+                prepared, report = prepare_page(page, settings)
+                original_total += report.original_bytes
+                prepared_total += report.prepared_bytes
+                # Fidelity of the encoding alone: compare against the same shaped page, losslessly kept
+                with Image.open(io.BytesIO(page.read())) as image:
+                    reference = shape_page(image, settings)
+                with Image.open(io.BytesIO(prepared.read())) as candidate:
+                    if candidate.size == reference.size:
+                        worst_psnr = min(worst_psnr, _psnr(reference, candidate))
+            saved = 1 - prepared_total / original_total if original_total else 0.0
+            print(f"{image_format.upper():<6} {quality:>7} {original_total:>12} {prepared_total:>12} {saved:>6.1%} {worst_psnr:>9.1f}")
+
+if __name__ == "__main__":
+    main()
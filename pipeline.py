@@ -0,0 +1,162 @@
+import time
+from typing import Any, Callable, Dict
+from langgraph.graph import END, START, StateGraph
+from langgraph.types import StreamWriter
+from journal import open_journal
+from progress import progress_listener
+import metrics
+from state import DocumentState
+from tools import (
+    docx_to_markdown_converter,
+    docx_to_pdf_converter,
+    pdf_to_markdown_converter,
+    pdf_to_png_converter,
+    conversion_settings,
+    png_to_markdown_converter
+)
+
+def _step_update(step: str, result: Any, started: float, **artifacts) -> Dict[str, Any]:
+    """Build the state update for a finished step from its tool result."""
+    update = {
+        "step_status": {step: "success" if result.success else "failed"},
+        "timings": {step: time.perf_counter() - started},
+        **artifacts
+    }
+    if not result.success:
+        update["error"] = f"{step}: {result.error}"
+    return update
+
+def _resumable(step: str, *artifact_keys: str, final: bool = False):
+    """
+    Skip a node whose step is recorded as finished in the run journal, and record it when it finishes.
+
+    The journal is (re)validated against the input file and the conversion
+    settings on every step, so an edited document or a changed model, prompt
+    or DPI never resumes from earlier progress. A `final` step that succeeds
+    completes the run and discards the journal, so only interrupted runs
+    resume. Progress events raised by the step's tools go to the node's StreamWriter.
+    """
+    def decorator(node: Callable[[DocumentState], Dict[str, Any]]) -> Callable[..., Dict[str, Any]]:
+        def run(state: DocumentState, writer: StreamWriter) -> Dict[str, Any]:
+            with metrics.timed("node", node=step) as node_record:
+                journal = open_journal(state["journal_path"], state["input_path"], conversion_settings()) if state.get("journal_path") else None
+                artifacts = journal.stage_artifacts(step) if journal is not None else None
+                node_record["resumed"] = artifacts is not None
+                if artifacts is not None:
+                    return {"step_status": {step: "success"}, **artifacts}
+                with progress_listener(writer):
+                    update = node(state)
+                if journal is not None and update["step_status"].get(step) == "success":
+                    if final:
+                        journal.discard()
+                    else:
+                        journal.record_stage(step, **{key: update[key] for key in artifact_keys})
+                return update
+        run.__name__ = run.__qualname__ = node.__name__
+        run.__doc__ = node.__doc__
+        return run
+    return decorator
+
+@_resumable("docx_to_markdown", "markdown_path", final=True)
+def docx_to_markdown(state: DocumentState) -> Dict[str, Any]:
+    """Convert the DOCX from its XML, leaving documents with unsupported content to the rasterizing steps."""
+    started = time.perf_counter()
+    result = docx_to_markdown_converter.invoke({
+        "docx_path": state["input_path"],
+        "output_dir": state["output_dir"]
+    })
+    if result.success and not result.needs_rasterization:
+        return _step_update("docx_to_markdown", result, started, markdown_path=result.markdown_path)
+    # Not an error for the run: the document simply takes the PDF route
+    reason = ", ".join(result.unsupported) if result.needs_rasterization else result.error
+    return {
+        "step_status": {"docx_to_markdown": "fallback"},
+        "timings": {"docx_to_markdown": time.perf_counter() - started},
+        "fallback_reason": reason
+    }
+
+@_resumable("docx_to_pdf", "pdf_path")
+def docx_to_pdf(state: DocumentState) -> Dict[str, Any]:
+    """Convert the input DOCX to PDF."""
+    started = time.perf_counter()
+    result = docx_to_pdf_converter.invoke({"docx_path": state["input_path"], "output_dir": state["output_dir"]})
+    return _step_update("docx_to_pdf", result, started, pdf_path=result.pdf_path)
+
+@_resumable("pdf_to_png", "png_paths")
+def pdf_to_png(state: DocumentState) -> Dict[str, Any]:
+    """Rasterize the PDF into page images."""
+    started = time.perf_counter()
+    result = pdf_to_png_converter.invoke({"pdf_path": state["pdf_path"]})
+    return _step_update("pdf_to_png", result, started, png_paths=result.png_paths)
+
+@_resumable("png_to_markdown", "markdown_path", final=True)
+def png_to_markdown(state: DocumentState) -> Dict[str, Any]:
+    """OCR the page images into a single markdown file."""
+    started = time.perf_counter()
+    result = png_to_markdown_converter.invoke({
+        "png_paths": state["png_paths"],
+        "output_dir": state["output_dir"],
+        "journal_path": state.get("journal_path", "")
+    })
+    return _step_update("png_to_markdown", result, started, markdown_path=result.markdown_path)
+
+@_resumable("pdf_to_markdown", "markdown_path", final=True)
+def pdf_to_markdown(state: DocumentState) -> Dict[str, Any]:
+    """Rasterize and OCR the PDF in one pass, handing pages over in memory."""
+    started = time.perf_counter()
+    result = pdf_to_markdown_converter.invoke({
+        "pdf_path": state["pdf_path"],
+        "output_dir": state["output_dir"],
+        "png_dir": state.get("png_dir", ""),
+        "journal_path": state.get("journal_path", "")
+    })
+    return _step_update("pdf_to_markdown", result, started, markdown_path=result.markdown_path)
+
+def _continue_if_ok(step: str, next_node: str) -> Callable[[DocumentState], str]:
+    """Route to `next_node` if `step` succeeded, otherwise stop the run."""
+    def route(state: DocumentState) -> str:
+        return next_node if state["step_status"].get(step) == "success" else END
+    return route
+
+def build_fast_graph(in_memory: bool = False, native: bool = True):
+    """
+    Compile the deterministic docx -> pdf -> png -> markdown graph.
+
+    Unlike the agentic graph in main.py, no coordinator LLM is consulted between
+    steps; the only model calls are the per-page vision requests. With
+    `in_memory`, rasterization and OCR run as a single pdf_to_markdown step and
+    page images never touch the disk unless the state names a png_dir. With
+    `native`, the DOCX XML is converted directly first and the run only goes on
+    to rasterization when the document holds content that step cannot render.
+    """
+    builder = StateGraph(DocumentState)
+
+    builder.add_node("docx_to_pdf", docx_to_pdf)
+    if native:
+        builder.add_node("docx_to_markdown", docx_to_markdown)
+        builder.add_edge(START, "docx_to_markdown")
+        builder.add_conditional_edges(
+            "docx_to_markdown",
+            lambda state: END if state["step_status"].get("docx_to_markdown") == "success" else "docx_to_pdf",
+            ["docx_to_pdf", END]
+        )
+    else:
+        builder.add_edge(START, "docx_to_pdf")
+
+    if in_memory:
+        builder.add_node("pdf_to_markdown", pdf_to_markdown)
+        builder.add_conditional_edges("docx_to_pdf", _continue_if_ok("docx_to_pdf", "pdf_to_markdown"))
+        builder.add_edge("pdf_to_markdown", END)
+    else:
+        builder.add_node("pdf_to_png", pdf_to_png)
+        builder.add_node("png_to_markdown", png_to_markdown)
+        builder.add_conditional_edges("docx_to_pdf", _continue_if_ok("docx_to_pdf", "pdf_to_png"))
+        builder.add_conditional_edges("pdf_to_png", _continue_if_ok("pdf_to_png", "png_to_markdown"))
+        builder.add_edge("png_to_markdown", END)
+
+    return builder.compile()
+
+fast_graph = build_fast_graph()
+in_memory_graph = build_fast_graph(in_memory=True)
+rasterizing_graph = build_fast_graph(native=False)
+rasterizing_in_memory_graph = build_fast_graph(in_memory=True, native=False)
@@ -0,0 +1,27 @@
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Callable, Dict, Iterator, Optional
+
+ProgressListener = Callable[[Dict[str, Any]], None]
+
+_listener: ContextVar[Optional[ProgressListener]] = ContextVar("progress_listener", default=None)
+
+def emit(event: str, **fields) -> None:
+    """Send a progress event to the listener of the current context, if any."""
+    listener = _listener.get()
+    if listener is not None:
+        listener({"event": event, **fields})
+
+@contextmanager
+def progress_listener(listener: Optional[ProgressListener]) -> Iterator[None]:
+    """
+    Route progress events emitted inside the block to `listener`.
+
+    Graph nodes pass their LangGraph StreamWriter here, so events raised deep
+    inside the tools reach graph.astream(stream_mode="custom") consumers.
+    """
+    token = _listener.set(listener)
+    try:
+        yield
+    finally:
+        _listener.reset(token)
@@ -0,0 +1,194 @@
+import io
+import os
+import math
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import Collection, Iterator, List, Optional, Tuple
+from PIL import Image
+from pdf2image import convert_from_path, pdfinfo_from_path
+import metrics
+
+DEFAULT_DPI = 300
+DEFAULT_PAGE_WINDOW = 4
+# Parallel poppler processes for sharded rasterization; 0 uses every core
+DEFAULT_RENDER_WORKERS = int(os.getenv("RENDER_WORKERS", "0")) or os.cpu_count() or 1
+# Shards per worker: more, smaller shards even out pages of uneven cost, fewer save poppler start-ups
+SHARDS_PER_WORKER = 2
+MIN_SHARD_PAGES = 4
+
+@dataclass
+class PageImage:
+    """An encoded page image handed from rasterization to OCR, in memory or backed by a file."""
+    page_number: int
+    data: Optional[bytes] = None
+    mime_type: str = "image/png"
+    path: str = ""
+
+    def read(self) -> bytes:
+        """Return the encoded image, loading it from `path` if it was not rendered in memory."""
+        if self.data is None:
+            with open(self.path, "rb") as img_file:
+                return img_file.read()
+        return self.data
+
+def count_pdf_pages(pdf_path: str) -> int:
+    """Return the number of pages in a PDF without rendering any of them."""
+    return int(pdfinfo_from_path(pdf_path)["Pages"])
+
+def iter_page_windows(page_count: int, page_window: int, skip_pages: Collection[int] = ()) -> Iterator[Tuple[int, int]]:
+    """Yield inclusive (first_page, last_page) ranges covering 1..page_count, except `skip_pages`."""
+    page_window = max(1, page_window)
+    first_page = None
+    for page_number in range(1, page_count + 2):
+        pending = page_number <= page_count and page_number not in skip_pages
+        if first_page is not None and (not pending or page_number - first_page == page_window):
+            yield first_page, page_number - 1
+            first_page = None
+        if pending and first_page is None:
+            first_page = page_number
+
+def _iter_rendered_pages(
+    pdf_path: str,
+    dpi: int,
+    page_window: int,
+    skip_pages: Collection[int] = ()
+) -> Iterator[Tuple[int, Image.Image, float]]:
+    """Yield (page_number, image, render_seconds) in bounded windows; see iter_pdf_pages."""
+    page_count = count_pdf_pages(pdf_path)
+    for first_page, last_page in iter_page_windows(page_count, page_window, skip_pages):
+        started = time.perf_counter()
+        images = convert_from_path(pdf_path, dpi=dpi, first_page=first_page, last_page=last_page)
+        # Render time is measured per window; each page of it is charged an equal share
+        render_seconds = (time.perf_counter() - started) / max(1, len(images))
+        page_number = first_page
+        while images:
+            image = images.pop(0)
+            try:
+                yield page_number, image, render_seconds
+            finally:
+                image.close()
+            page_number += 1
+
+def iter_pdf_pages(
+    pdf_path: str,
+    dpi: int = DEFAULT_DPI,
+    page_window: int = DEFAULT_PAGE_WINDOW,
+    skip_pages: Collection[int] = ()
+) -> Iterator[Tuple[int, Image.Image]]:
+    """
+    Render a PDF page by page, yielding (page_number, image) pairs.
+
+    At most `page_window` pages are held in memory at a time, so peak memory is
+    bounded by the window size rather than by the length of the document.
+    Each image is closed once the consumer moves on to the next page. Pages in
+    `skip_pages` are not rendered at all.
+    """
+    for page_number, image, _ in _iter_rendered_pages(pdf_path, dpi, page_window, skip_pages):
+        yield page_number, image
+
+def stream_pdf_to_png(
+    pdf_path: str,
+    png_dir: str,
+    dpi: int = DEFAULT_DPI,
+    page_window: int = DEFAULT_PAGE_WINDOW
+) -> Iterator[str]:
+    """Rasterize a PDF into `png_dir`, yielding each page_N.png path as soon as it is saved."""
+    os.makedirs(png_dir, exist_ok=True)
+    for page_number, image, render_seconds in _iter_rendered_pages(pdf_path, dpi, page_window):
+        started = time.perf_counter()
+        png_path = os.path.join(png_dir, f"page_{page_number}.png")
+        # Written aside and renamed, so an existing page_N.png linked into the artifact store is replaced, not overwritten
+        image.save(f"{png_path}.tmp", "PNG")
+        os.replace(f"{png_path}.tmp", png_path)
+        metrics.record("rasterize", page_number=page_number, render_seconds=render_seconds,
+                       seconds=render_seconds + time.perf_counter() - started, bytes=os.path.getsize(png_path))
+        yield png_path
+
+def _render_shard(pdf_path: str, png_dir: str, dpi: int, first_page: int, last_page: int) -> Tuple[List[Tuple[int, str]], float]:
+    """Render pages first_page..last_page with one poppler process straight into png_dir as page_N.png."""
+    started = time.perf_counter()
+    # A hidden prefix unique to the shard, so half-written output never looks like a page
+    prefix = f".shard_{first_page}_{last_page}_"
+    try:
+        rendered = convert_from_path(
+            pdf_path, dpi=dpi, first_page=first_page, last_page=last_page,
+            output_folder=png_dir, output_file=prefix, fmt="png", paths_only=True
+        )
+        if len(rendered) != last_page - first_page + 1:
+            raise RuntimeError(f"Expected pages {first_page}-{last_page}, poppler wrote {len(rendered)} images")
+        # Poppler zero-pads page numbers, so the sorted paths are in page order
+        pages = []
+        for page_number, rendered_path in zip(range(first_page, last_page + 1), rendered):
+            png_path = os.path.join(png_dir, f"page_{page_number}.png")
+            os.replace(rendered_path, png_path)
+            pages.append((page_number, png_path))
+        return pages, time.perf_counter() - started
+    finally:
+        for name in os.listdir(png_dir):
+            if name.startswith(prefix):
+                os.remove(os.path.join(png_dir, name))
+
+def shard_pdf_to_png(
+    pdf_path: str,
+    png_dir: str,
+    dpi: int = DEFAULT_DPI,
+    workers: int = DEFAULT_RENDER_WORKERS,
+    skip_pages: Collection[int] = ()
+) -> Iterator[str]:
+    """
+    Rasterize a PDF into `png_dir` with up to `workers` poppler processes at once.
+
+    The page range is split into contiguous shards, each rendered by its own
+    poppler process that writes PNGs directly, without decoding them in Python.
+    Paths are yielded in page order as soon as the shards holding them finish.
+    Pages in `skip_pages` are not rendered.
+    """
+    os.makedirs(png_dir, exist_ok=True)
+    page_count = count_pdf_pages(pdf_path)
+    pending = page_count - len(set(skip_pages) & set(range(1, page_count + 1)))
+    workers = max(1, workers)
+    shard_pages = max(MIN_SHARD_PAGES, math.ceil(pending / (workers * SHARDS_PER_WORKER)))
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        shards = [
+            executor.submit(_render_shard, pdf_path, png_dir, dpi, first_page, last_page)
+            for first_page, last_page in iter_page_windows(page_count, shard_pages, skip_pages)
+        ]
+        for shard in shards:
+            pages, seconds = shard.result()
+            for page_number, png_path in pages:
+                # Shard time is charged to its pages in equal shares
+                metrics.record("rasterize", page_number=page_number, render_seconds=seconds / len(pages),
+                               seconds=seconds / len(pages), bytes=os.path.getsize(png_path))
+                yield png_path
+
+def iter_page_images(
+    pdf_path: str,
+    dpi: int = DEFAULT_DPI,
+    page_window: int = DEFAULT_PAGE_WINDOW,
+    sink_dir: Optional[str] = None,
+    skip_pages: Collection[int] = ()
+) -> Iterator[PageImage]:
+    """
+    Rasterize a PDF into in-memory PNG buffers, yielding one PageImage per page.
+
+    Nothing touches the disk unless `sink_dir` is given, in which case the same
+    encoded buffer is also written there as page_N.png for debugging or reuse.
+    """
+    if sink_dir:
+        os.makedirs(sink_dir, exist_ok=True)
+    for page_number, image, render_seconds in _iter_rendered_pages(pdf_path, dpi, page_window, skip_pages):
+        started = time.perf_counter()
+        buffer = io.BytesIO()
+        image.save(buffer, "PNG")
+        # getvalue() hands back BytesIO's internal bytes object without copying it
+        data = buffer.getvalue()
+        path = ""
+        if sink_dir:
+            path = os.path.join(sink_dir, f"page_{page_number}.png")
+            with open(f"{path}.tmp", "wb") as f:
+                f.write(data)
+            os.replace(f"{path}.tmp", path)
+        metrics.record("rasterize", page_number=page_number, render_seconds=render_seconds,
+                       seconds=render_seconds + time.perf_counter() - started, bytes=len(data))
+        yield PageImage(page_number=page_number, data=data, path=path)
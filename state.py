@@ -0,0 +1,50 @@
+import os
+import hashlib
+from artifact_store import FileLock
+from journal import journal_path_for
+from typing import Annotated, Any, Dict, List, Optional
+from typing_extensions import TypedDict
+
+def merge_dicts(left: Dict, right: Dict) -> Dict:
+    """Reducer that lets each node add its own keys to a shared dict channel."""
+    return {**(left or {}), **(right or {})}
+
+class DocumentState(TypedDict, total=False):
+    """Typed state passed between the nodes of the conversion graphs."""
+    input_path: str
+    output_dir: str
+    pdf_path: str
+    png_paths: List[str]
+    png_dir: str  # Optional PNG sink for the in-memory pipeline
+    markdown_path: str
+    journal_path: str  # On-disk record of finished stages and pages, used to resume an interrupted run
+    fallback_reason: str  # Why the native DOCX conversion handed the document to rasterization
+    step_status: Annotated[Dict[str, str], merge_dicts]
+    timings: Annotated[Dict[str, float], merge_dicts]
+    error: str
+    # Agentic graph only: the pending tool call chosen by the coordinator,
+    # a compact summary of the last tool result and the coordinator's final answer
+    tool_call: Optional[Dict[str, Any]]
+    last_result: Dict[str, Any]
+    final_message: str
+
+def job_dir_for(docx_path: str, output_root: str) -> str:
+    """Return the per-document output directory, unique even for equal file names in different folders."""
+    doc_name = os.path.splitext(os.path.basename(docx_path))[0]
+    path_hash = hashlib.sha1(os.path.abspath(docx_path).encode()).hexdigest()[:10]
+    return os.path.join(output_root, f"{doc_name}-{path_hash}")
+
+def job_lock(job_dir: str) -> FileLock:
+    """Lock held by the run writing into `job_dir`; a second run of the same document waits, then resumes."""
+    return FileLock(os.path.join(job_dir, ".job.lock"))
+
+def initial_state(docx_path: str, output_root: str = "") -> DocumentState:
+    """Return the starting state for converting `docx_path`, writing into its own job directory under `output_root` (default: next to the document)."""
+    output_dir = job_dir_for(docx_path, output_root or os.path.dirname(docx_path))
+    return {
+        "input_path": docx_path,
+        "output_dir": output_dir,
+        "journal_path": journal_path_for(docx_path, output_dir),
+        "step_status": {},
+        "timings": {}
+    }
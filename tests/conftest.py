@@ -0,0 +1,33 @@
+import os
+import pytest
+from fake_openai import FakeOpenAIServer, FakeSettings
+
+@pytest.fixture(scope="session")
+def fake_openai():
+    """A local OpenAI-compatible API for the whole session; chat clients are shared per process, so it is set up once."""
+    server = FakeOpenAIServer(FakeSettings(latency=0.0, jitter=0.0, output_tokens=20)).start()
+    saved = {key: os.environ.get(key) for key in ("OPENAI_BASE_URL", "OPENAI_API_KEY")}
+    os.environ["OPENAI_BASE_URL"] = server.base_url
+    os.environ["OPENAI_API_KEY"] = "test"
+    yield server
+    server.stop()
+    for key, value in saved.items():
+        if value is None:
+            os.environ.pop(key, None)
+        else:
+            os.environ[key] = value
+
+@pytest.fixture
+def text_page_png(tmp_path):
+    """Return a factory writing a synthetic page of prose to tmp_path/page_<n>.png."""
+    from PIL import Image, ImageDraw
+
+    def make(page_number: int) -> str:
+        image = Image.new("RGB", (850, 1100), "white")
+        draw = ImageDraw.Draw(image)
+        for y in range(100, 900, 30):
+            draw.text((80, y), "Lorem ipsum dolor sit amet, consectetur adipiscing elit " * 2, fill="black")
+        path = str(tmp_path / f"page_{page_number}.png")
+        image.save(path)
+        return path
+    return make
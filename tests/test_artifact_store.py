@@ -0,0 +1,93 @@
+import os
+import time
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from artifact_store import Artifact, ArtifactStore, artifact_key
+
+def test_key_covers_parameters():
+    assert artifact_key("png", "abc", dpi=300) == artifact_key("png", "abc", dpi=300)
+    assert artifact_key("png", "abc", dpi=300) != artifact_key("png", "abc", dpi=200)
+    assert artifact_key("png", "abc") != artifact_key("pdf", "abc")
+
+def test_entry_is_invisible_until_commit(tmp_path):
+    store = ArtifactStore(str(tmp_path))
+    staging = store.stage("k1", "png")
+    staging.add_bytes("page_1.png", b"one")
+    assert store.get("k1") is None
+    staging.commit(pages=1)
+    artifact = store.get("k1")
+    assert artifact.files == ["page_1.png"] and artifact.meta == {"pages": 1}
+    with open(artifact.file("page_1.png"), "rb") as f:
+        assert f.read() == b"one"
+
+def test_parallel_jobs_build_once(tmp_path):
+    store = ArtifactStore(str(tmp_path))
+    builds = []
+    lock = threading.Lock()
+
+    def build(staging):
+        with lock:
+            builds.append(1)
+        time.sleep(0.1)
+        staging.add_bytes("out.pdf", b"pdf")
+
+    with ThreadPoolExecutor(max_workers=4) as executor:
+        results = list(executor.map(lambda _: store.get_or_build("k", "pdf", build, str(tmp_path / "job")), range(4)))
+    assert len(builds) == 1
+    assert sorted(hit for _, hit in results) == [False, True, True, True]
+
+def test_materialized_files_survive_gc(tmp_path):
+    store = ArtifactStore(str(tmp_path / "store"))
+    staging = store.stage("k", "png")
+    staging.add_bytes("page_1.png", b"page")
+    staging.commit()
+    paths = store.get("k").materialize(str(tmp_path / "job"))
+    assert store.gc(max_age=0).removed == 1
+    assert store.get("k") is None
+    with open(paths[0], "rb") as f:
+        assert f.read() == b"page"
+
+def test_gc_between_lookup_and_links_waits_for_checkout(tmp_path, monkeypatch):
+    store = ArtifactStore(str(tmp_path / "store"))
+    staging = store.stage("k", "png")
+    staging.add_bytes("page_1.png", b"page")
+    staging.commit()
+    materialize = Artifact.materialize
+
+    def gc_then_materialize(artifact, *args, **kwargs):
+        # Another job's gc runs right after the lookup found the entry
+        store.gc(max_age=-1)
+        return materialize(artifact, *args, **kwargs)
+
+    monkeypatch.setattr(Artifact, "materialize", gc_then_materialize)
+    paths = store.checkout("k", "png", str(tmp_path / "job"))
+    with open(paths[0], "rb") as f:
+        assert f.read() == b"page"
+    monkeypatch.undo()
+    assert store.gc(max_age=-1).removed == 1
+    assert store.checkout("k", "png", str(tmp_path / "job")) is None
+
+def test_gc_drops_least_recently_used_first(tmp_path):
+    store = ArtifactStore(str(tmp_path))
+    for key in ("old", "new"):
+        staging = store.stage(key, "pdf")
+        staging.add_bytes("out.pdf", b"x" * 100)
+        staging.commit()
+    past = time.time() - 60
+    os.utime(os.path.join(store._entry_path("old"), "manifest.json"), (past, past))
+    stats = store.gc(max_bytes=150)
+    assert stats.removed == 1 and stats.entries == 1
+    assert store.get("old") is None and store.get("new") is not None
+
+def test_removal_keeps_the_lock_file(tmp_path):
+    store = ArtifactStore(str(tmp_path))
+    store.get_or_build("k", "pdf", lambda staging: staging.add_bytes("out.pdf", b"x"), str(tmp_path / "job"))
+    assert store._remove("k")
+    assert os.path.exists(store.lock("k").path)
+
+def test_entry_being_built_is_not_removed(tmp_path):
+    store = ArtifactStore(str(tmp_path))
+    store.get_or_build("k", "pdf", lambda staging: staging.add_bytes("out.pdf", b"x"), str(tmp_path / "job"))
+    with store.lock("k"):
+        assert not store._remove("k")
+    assert store.get("k") is not None
@@ -0,0 +1,30 @@
+import llm_scheduler
+import metrics
+from llm_scheduler import BATCH, get_scheduler, job_priority
+from old_files import chains
+from old_files.diff_engine import write_diff
+
+def test_explain_batches_keep_the_callers_context(tmp_path, fake_openai, monkeypatch):
+    original, updated = tmp_path / "doc_original.md", tmp_path / "doc_updated.md"
+    original.write_text("\n\n".join(f"Paragraph {i} says one thing." for i in range(40)))
+    updated.write_text("\n\n".join(f"Paragraph {i} says {'another' if i % 10 == 0 else 'one'} thing." for i in range(40)))
+    diff_path = str(tmp_path / "doc_diff.md")
+    assert write_diff(str(original), str(updated), diff_path) == 4
+    monkeypatch.setattr(chains, "EXPLAIN_BATCH_TOKENS", 1)
+
+    priorities = []
+    scheduler = get_scheduler()
+    acquire = scheduler.acquire
+
+    def recording_acquire(tokens, priority=None):
+        priorities.append(llm_scheduler._priority.get())
+        return acquire(tokens, priority)
+
+    monkeypatch.setattr(scheduler, "acquire", recording_acquire)
+    state = {"input_path": str(tmp_path / "doc.docx"), "paths": {"base_dir": str(tmp_path)}, "diff": {"success": True, "diff_path": diff_path}}
+    with metrics.collect() as run_metrics, job_priority(BATCH):
+        result = chains.explain_diff(state)
+
+    assert result["failed_batches"] == []
+    assert [r["purpose"] for r in run_metrics.of_kind("llm_call")] == ["explain"] * 4
+    assert priorities == [BATCH] * 4
@@ -0,0 +1,112 @@
+import sys
+import time
+import threading
+import types
+from concurrent.futures import ThreadPoolExecutor
+import pytest
+import converters
+from converters import Docx2PdfBackend
+
+def test_word_conversions_are_serialized(monkeypatch):
+    active, peak = 0, 0
+    lock = threading.Lock()
+
+    def convert(docx_path, pdf_path):
+        nonlocal active, peak
+        with lock:
+            active += 1
+            peak = max(peak, active)
+        time.sleep(0.05)
+        with lock:
+            active -= 1
+
+    monkeypatch.setitem(sys.modules, "docx2pdf", types.SimpleNamespace(convert=convert))
+    backend = Docx2PdfBackend()
+    with ThreadPoolExecutor(max_workers=4) as executor:
+        list(executor.map(lambda i: backend.convert(f"{i}.docx", f"{i}.pdf"), range(4)))
+    assert peak == 1
+
+class FakeWorker:
+    """Stands in for an OfficeWorker; `alive` says whether its office process is up."""
+
+    def __init__(self, soffice, worker_id, max_jobs):
+        self.max_jobs = max_jobs
+        self.alive = False
+        self.jobs = 0
+        self.starts = 0
+        self.fail_next = False
+
+    def healthy(self):
+        return self.alive
+
+    @property
+    def exhausted(self):
+        return self.jobs >= self.max_jobs
+
+    def restart(self):
+        self.alive, self.jobs = True, 0
+        self.starts += 1
+
+    def stop(self):
+        self.alive = False
+
+    def convert(self, docx_path, pdf_path, timeout):
+        self.jobs += 1
+        if self.fail_next:
+            self.fail_next = False
+            raise RuntimeError("bridge disposed")
+
+@pytest.fixture
+def pool(monkeypatch):
+    monkeypatch.setitem(sys.modules, "uno", types.SimpleNamespace(systemPathToFileUrl=lambda path: f"file://{path}"))
+    monkeypatch.setattr(converters, "find_soffice", lambda: "soffice")
+    monkeypatch.setattr(converters, "OfficeWorker", FakeWorker)
+    return converters.LibreOfficePool(size=1, max_jobs=3)
+
+def test_pool_restarts_a_dead_worker(pool):
+    worker = pool.workers[0]
+    pool.convert("a.docx", "a.pdf")
+    pool.convert("b.docx", "b.pdf")
+    assert worker.starts == 1
+    worker.alive = False  # The office process crashed between jobs
+    pool.convert("c.docx", "c.pdf")
+    assert worker.starts == 2
+
+def test_pool_recycles_a_worker_after_max_jobs(pool):
+    for i in range(7):
+        pool.convert(f"{i}.docx", f"{i}.pdf")
+    assert pool.workers[0].starts == 3
+
+def test_failed_job_gets_a_fresh_worker_next(pool):
+    worker = pool.workers[0]
+    pool.convert("a.docx", "a.pdf")
+    worker.fail_next = True
+    with pytest.raises(RuntimeError):
+        pool.convert("b.docx", "b.pdf")
+    assert not worker.alive
+    pool.convert("c.docx", "c.pdf")
+    assert worker.starts == 2
+
+def test_hung_conversion_is_killed_and_reported_as_timeout(monkeypatch):
+    monkeypatch.setitem(sys.modules, "uno", types.SimpleNamespace(systemPathToFileUrl=lambda path: f"file://{path}"))
+    beans = types.ModuleType("com.sun.star.beans")
+    beans.PropertyValue = types.SimpleNamespace
+    for name in ("com", "com.sun", "com.sun.star"):
+        monkeypatch.setitem(sys.modules, name, types.ModuleType(name))
+    monkeypatch.setitem(sys.modules, "com.sun.star.beans", beans)
+
+    killed = threading.Event()
+
+    def load_forever(*args):
+        # The UNO call only returns once the office process is killed under it
+        killed.wait(5)
+        raise RuntimeError("bridge disposed")
+
+    worker = converters.OfficeWorker("soffice", 0)
+    worker.process = types.SimpleNamespace(kill=killed.set)
+    worker.desktop = types.SimpleNamespace(loadComponentFromURL=load_forever)
+    started = time.monotonic()
+    with pytest.raises(converters.ConversionTimeout):
+        worker.convert("slow.docx", "slow.pdf", timeout=0.05)
+    assert killed.is_set() and time.monotonic() - started < 5
+    assert worker.jobs == 1
@@ -0,0 +1,54 @@
+import random
+from old_files.diff_engine import iter_hunks, pack_batches, patience_opcodes, read_hunks, unit_hash, write_diff
+
+def apply(opcodes, a, b):
+    """Rebuild b from a and the opcodes; every b element must come from an equal run or an edit."""
+    out = []
+    for tag, i1, i2, j1, j2 in opcodes:
+        if tag == "equal":
+            assert a[i1:i2] == b[j1:j2]
+            out.extend(a[i1:i2])
+        else:
+            out.extend(b[j1:j2])
+    return out
+
+def test_opcodes_cover_both_sequences():
+    rng = random.Random(7)
+    for _ in range(200):
+        a = [rng.choice("abcdefgh") for _ in range(rng.randrange(30))]
+        b = [rng.choice("abcdefgh") for _ in range(rng.randrange(30))]
+        opcodes = patience_opcodes(a, b)
+        assert apply(opcodes, a, b) == b
+        assert sum(i2 - i1 for _, i1, i2, _, _ in opcodes) == len(a)
+
+def test_moved_unique_paragraphs_anchor_the_diff():
+    a = ["intro", "x", "x", "middle", "x", "end"]
+    b = ["intro", "x", "middle", "x", "x", "end"]
+    opcodes = patience_opcodes(a, b)
+    # "middle" occurs once on each side, so it is matched even though the repeated "x" shifted around it
+    assert any(tag == "equal" and i1 <= 3 < i2 and j1 + 3 - i1 == 2 for tag, i1, i2, j1, _ in opcodes)
+    assert opcodes[0][0] == opcodes[-1][0] == "equal"
+
+def test_reflowed_paragraph_is_unchanged():
+    assert unit_hash("one two\nthree") == unit_hash("one  two three")
+    assert list(iter_hunks("First para.\n\nSecond\npara.", "First para.\n\nSecond para.")) == []
+
+def test_replaced_paragraph_marks_changed_sentences():
+    original = "Intro.\n\nThe cat sat. It was warm.\n\nEnd."
+    updated = "Intro.\n\nThe cat sat. It was cold.\n\nEnd."
+    (hunk,) = list(iter_hunks(original, updated))
+    assert "~ The cat sat. [-It was warm.-] {+It was cold.+}" in hunk.lines
+    assert hunk.header() == "@@ -1,3 +1,3 @@"
+
+def test_diff_file_round_trip(tmp_path):
+    original, updated = tmp_path / "a.md", tmp_path / "b.md"
+    original.write_text("\n\n".join(f"Paragraph {i}." for i in range(20)))
+    updated.write_text("\n\n".join(f"Paragraph {i}{'!' if i in (3, 15) else '.'}" for i in range(20)))
+    diff_path = str(tmp_path / "diff.md")
+    assert write_diff(str(original), str(updated), diff_path) == 2
+    hunks = list(read_hunks(diff_path))
+    assert len(hunks) == 2 and all(h.startswith("@@") for h in hunks)
+
+def test_batches_respect_the_budget_and_order():
+    hunks = ["a" * 4, "b" * 4, "c" * 10, "d" * 2]
+    assert list(pack_batches(hunks, 8, len)) == [["aaaa", "bbbb"], ["c" * 10], ["dd"]]
@@ -0,0 +1,62 @@
+import os
+import zipfile
+import pytest
+from lxml import etree
+from docx_markdown import M, UnsupportedContent, W, convert_docx, omml_to_latex
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+def write_docx(path, body: str) -> str:
+    """Write a minimal DOCX package whose document body is `body`."""
+    with zipfile.ZipFile(path, "w") as package:
+        package.writestr("word/document.xml", f'<w:document xmlns:w="{W}" xmlns:m="{M}"><w:body>{body}</w:body></w:document>')
+    return str(path)
+
+def omml(xml: str) -> etree._Element:
+    return etree.fromstring(f'<m:oMath xmlns:m="{M}" xmlns:w="{W}">{xml}</m:oMath>')
+
+def run(text: str, properties: str = "") -> str:
+    return f'<w:r><w:rPr>{properties}</w:rPr><w:t xml:space="preserve">{text}</w:t></w:r>'
+
+def test_vert_align_renders_as_sub_and_sup(tmp_path):
+    body = "<w:p>" + run("I", "<w:i/>") + run("MCS", '<w:i/><w:vertAlign w:val="subscript"/>') + run(" and x")
+    body += run("2", '<w:vertAlign w:val="superscript"/>') + "</w:p>"
+    result = convert_docx(write_docx(tmp_path / "doc.docx", body))
+    assert result.markdown.strip() == "*I<sub>MCS</sub>* and x<sup>2</sup>"
+    assert not result.needs_rasterization
+
+def test_repository_sample_keeps_subscripts():
+    result = convert_docx(os.path.join(ROOT, "test_files", "test_updated.docx"))
+    assert "*I<sub>MCS</sub>*" in result.markdown
+    assert "*n<sub>PRB</sub>*" in result.markdown
+
+@pytest.mark.parametrize("content", [
+    '<w:r><w:footnoteReference w:id="1"/></w:r>',
+    '<w:r><w:sym w:font="Symbol" w:char="F0B7"/></w:r>',
+    '<w:customElement/>'
+])
+def test_unhandled_content_falls_back_to_rasterization(tmp_path, content):
+    result = convert_docx(write_docx(tmp_path / "doc.docx", f"<w:p>{run('text')}{content}</w:p>"))
+    assert result.needs_rasterization
+
+def test_revisions_render_the_current_text(tmp_path):
+    body = f"<w:p>{run('non')}<w:r><w:noBreakHyphen/></w:r>{run('stop ')}<w:del><w:r><w:delText>old</w:delText></w:r></w:del>"
+    body += f"<w:moveTo>{run('moved')}</w:moveTo><w:moveFrom>{run('gone')}</w:moveFrom></w:p>"
+    result = convert_docx(write_docx(tmp_path / "doc.docx", body))
+    assert result.markdown.strip() == "non-stop moved"
+    assert not result.needs_rasterization
+
+def test_function_names_become_operators():
+    assert omml_to_latex(omml("<m:r><m:t>max⁡(0,</m:t></m:r><m:r><m:t>x)</m:t></m:r>")) == r"\max (0,x)"
+    assert omml_to_latex(omml("<m:r><m:t>maximum</m:t></m:r>")) == "maximum"
+
+def test_fraction_and_scripts():
+    latex = omml_to_latex(omml(
+        "<m:f><m:num><m:r><m:t>a</m:t></m:r></m:num><m:den><m:r><m:t>b</m:t></m:r></m:den></m:f>"
+        "<m:sSub><m:e><m:r><m:t>x</m:t></m:r></m:e><m:sub><m:r><m:t>i</m:t></m:r></m:sub></m:sSub>"
+    ))
+    assert latex == r"\frac{a}{b}x_{i}"
+
+def test_unknown_equation_element_is_unsupported():
+    with pytest.raises(UnsupportedContent):
+        omml_to_latex(omml("<m:groupChr><m:e><m:r><m:t>x</m:t></m:r></m:e></m:groupChr>"))
@@ -0,0 +1,76 @@
+import os
+import types
+import pipeline
+from journal import RunJournal, file_fingerprint, journal_path_for, open_journal, run_fingerprint
+from state import initial_state
+from tools import NativeMarkdownResult, conversion_settings
+
+def test_journal_lives_in_the_output_dir():
+    assert journal_path_for("/in/report.docx", "/out") == os.path.join("/out", ".checkpoints", "report.jsonl")
+
+def test_fingerprint_follows_content(tmp_path):
+    a, b = tmp_path / "a.docx", tmp_path / "b.docx"
+    a.write_bytes(b"same")
+    b.write_bytes(b"same")
+    assert file_fingerprint(str(a)) == file_fingerprint(str(b))
+    b.write_bytes(b"other")
+    assert file_fingerprint(str(a)) != file_fingerprint(str(b))
+
+def test_progress_survives_a_restart_and_a_torn_line(tmp_path):
+    path = str(tmp_path / "run.jsonl")
+    pdf = tmp_path / "doc.pdf"
+    pdf.write_bytes(b"%PDF")
+    journal = RunJournal(path)
+    journal.reset("abc")
+    journal.record_stage("docx_to_pdf", pdf_path=str(pdf))
+    journal.record_page(1, "# One")
+    with open(path, "a") as f:
+        f.write('{"type": "page", "pa')
+
+    reopened = RunJournal(path)
+    assert reopened.fingerprint == "abc"
+    assert reopened.pages == {1: "# One"}
+    assert reopened.stage_artifacts("docx_to_pdf") == {"pdf_path": str(pdf)}
+    assert reopened.stage_artifacts("pdf_to_png") is None
+
+def test_stage_with_deleted_artifacts_runs_again(tmp_path):
+    journal = RunJournal(str(tmp_path / "run.jsonl"))
+    journal.reset("abc")
+    png = tmp_path / "page_1.png"
+    png.write_bytes(b"png")
+    journal.record_stage("pdf_to_png", png_paths=[str(png)])
+    assert journal.stage_artifacts("pdf_to_png") is not None
+    png.unlink()
+    assert journal.stage_artifacts("pdf_to_png") is None
+
+def test_changed_input_starts_a_fresh_journal(tmp_path):
+    path = str(tmp_path / "run.jsonl")
+    doc = tmp_path / "doc.docx"
+    doc.write_bytes(b"v1")
+    open_journal(path, str(doc)).record_page(1, "old")
+    assert open_journal(path, str(doc)).pages == {1: "old"}
+    doc.write_bytes(b"v2")
+    journal = open_journal(path, str(doc))
+    assert journal.pages == {} and journal.fingerprint == run_fingerprint(str(doc))
+    assert RunJournal(path).pages == {}
+
+def test_changed_settings_start_a_fresh_journal(tmp_path):
+    path = str(tmp_path / "run.jsonl")
+    doc = tmp_path / "doc.docx"
+    doc.write_bytes(b"v1")
+    open_journal(path, str(doc), conversion_settings()).record_page(1, "old")
+    assert open_journal(path, str(doc), conversion_settings()).pages == {1: "old"}
+    assert open_journal(path, str(doc), conversion_settings(dpi=150)).pages == {}
+
+def test_completed_run_discards_its_journal(tmp_path, monkeypatch):
+    doc = tmp_path / "doc.docx"
+    doc.write_bytes(b"v1")
+    state = initial_state(str(doc))
+    open_journal(state["journal_path"], str(doc), conversion_settings()).record_page(1, "interrupted run")
+    markdown_path = str(tmp_path / "output.md")
+    converter = types.SimpleNamespace(invoke=lambda args: NativeMarkdownResult(markdown_path=markdown_path, success=True))
+    monkeypatch.setattr(pipeline, "docx_to_markdown_converter", converter)
+
+    update = pipeline.docx_to_markdown(state, writer=lambda event: None)
+    assert update["step_status"] == {"docx_to_markdown": "success"}
+    assert not os.path.exists(state["journal_path"])
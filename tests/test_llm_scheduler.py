@@ -0,0 +1,77 @@
+import threading
+import time
+import types
+import pytest
+from llm_scheduler import BATCH, INTERACTIVE, LLMScheduler, TokenBucket, estimate_tokens, image_tokens, is_retryable, job_priority
+
+class RateLimited(Exception):
+    status_code = 429
+
+    def __init__(self, retry_after: str):
+        super().__init__("rate limited")
+        self.response = types.SimpleNamespace(status_code=429, headers={"retry-after": retry_after})
+
+class FakeLLM:
+    """Answers after failing `failures` times with a 429."""
+    model_name = "fake"
+
+    def __init__(self, failures: int = 0):
+        self.failures = failures
+        self.calls = 0
+
+    def invoke(self, messages):
+        self.calls += 1
+        if self.calls <= self.failures:
+            raise RateLimited("0")
+        return types.SimpleNamespace(content="ok", usage_metadata={"input_tokens": 10, "output_tokens": 5})
+
+def test_token_bucket_refills_per_minute():
+    bucket = TokenBucket(60)
+    now = bucket.updated
+    bucket.take(60)
+    assert bucket.wait_time(1, now) == pytest.approx(1.0)
+    assert bucket.wait_time(1, now + 1.0) == pytest.approx(0.0)
+    # A request larger than the bucket only waits for a full bucket
+    assert bucket.wait_time(600, now) == pytest.approx(60.0)
+
+def test_unlimited_bucket_never_waits():
+    bucket = TokenBucket(0)
+    bucket.take(10 ** 9)
+    assert bucket.wait_time(10 ** 9, time.monotonic()) == 0.0
+
+def test_image_tokens_follow_the_tiling_rule():
+    assert image_tokens(512, 512) == 255
+    assert image_tokens(4096, 2048, detail="low") == 85
+    assert image_tokens(2048, 4096) == 170 * 2 * 3 + 85
+
+def test_estimate_includes_expected_completion():
+    assert estimate_tokens(["hello world"], output_tokens=100) > 100
+
+def test_retryable_errors():
+    assert is_retryable(RateLimited("1"))
+    assert is_retryable(types.SimpleNamespace(status_code=503))
+    assert not is_retryable(types.SimpleNamespace(status_code=400))
+
+def test_rate_limit_is_retried():
+    llm = FakeLLM(failures=2)
+    response = LLMScheduler(attempts=5).invoke(llm, ["hi"], purpose="test")
+    assert response.content == "ok" and llm.calls == 3
+
+def test_waiting_calls_are_admitted_by_priority():
+    scheduler = LLMScheduler(rpm=60)
+    scheduler.requests.level = 0  # The next request is admitted in one second; both calls queue
+    admitted = []
+
+    def call(priority, name):
+        with job_priority(priority):
+            scheduler.acquire(1)
+        admitted.append(name)
+
+    batch = threading.Thread(target=call, args=(BATCH, "batch"))
+    batch.start()
+    time.sleep(0.1)
+    interactive = threading.Thread(target=call, args=(INTERACTIVE, "interactive"))
+    interactive.start()
+    batch.join()
+    interactive.join()
+    assert admitted == ["interactive", "batch"]
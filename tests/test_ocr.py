@@ -0,0 +1,41 @@
+import base64
+import threading
+import time
+import types
+from ocr import iter_convert_page_images
+from rasterizer import PageImage
+
+class SlowLLM:
+    """Answers with the page's own bytes; later pages answer sooner and page 5 always fails."""
+    model_name = "fake"
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.in_flight = 0
+        self.peak = 0
+
+    def invoke(self, messages):
+        url = messages[0].content[1]["image_url"]["url"]
+        page = base64.b64decode(url.split(",", 1)[1]).decode()
+        with self.lock:
+            self.in_flight += 1
+            self.peak = max(self.peak, self.in_flight)
+        try:
+            time.sleep(0.02 * (10 - int(page.split("-")[1])))
+            if page == "page-5":
+                raise ValueError("model refused the page")
+            return types.SimpleNamespace(content=f"# {page}")
+        finally:
+            with self.lock:
+                self.in_flight -= 1
+
+def test_results_come_back_in_page_order_with_bounded_concurrency():
+    llm = SlowLLM()
+    pages = (PageImage(page_number=n, data=f"page-{n}".encode()) for n in range(1, 10))
+    results = list(iter_convert_page_images(pages, max_concurrency=3, llm=llm))
+
+    assert [r.page_number for r in results] == list(range(1, 10))
+    assert 1 < llm.peak <= 3
+    failed = [r for r in results if not r.success]
+    assert [r.page_number for r in failed] == [5] and "refused" in failed[0].error
+    assert all(r.markdown == f"# page-{r.page_number}" for r in results if r.success)
@@ -0,0 +1,35 @@
+from page_cache import PageCache, page_cache_key
+
+def test_key_covers_image_model_and_prompt():
+    key = page_cache_key(b"image", "gpt-4o", "prompt")
+    assert key == page_cache_key(b"image", "gpt-4o", "prompt")
+    assert key != page_cache_key(b"image2", "gpt-4o", "prompt")
+    assert key != page_cache_key(b"image", "gpt-4o-mini", "prompt")
+    assert key != page_cache_key(b"image", "gpt-4o", "other prompt")
+    # Parts are length-prefixed, so moving bytes between them changes the key
+    assert page_cache_key(b"b", "a", "") != page_cache_key(b"", "a", "b")
+
+def test_hits_and_misses_are_counted(tmp_path):
+    cache = PageCache(str(tmp_path / "cache.sqlite3"))
+    assert cache.get("k") is None
+    cache.put("k", "# Page")
+    assert cache.get("k") == "# Page"
+    stats = cache.stats()
+    assert (stats.hits, stats.misses, stats.entries) == (1, 1, 1)
+
+def test_least_recently_used_entries_are_evicted(tmp_path):
+    cache = PageCache(str(tmp_path / "cache.sqlite3"), max_entries=2)
+    cache.put("a", "A")
+    cache.put("b", "B")
+    cache.get("a")
+    cache.put("c", "C")
+    assert cache.get("b") is None
+    assert cache.get("a") == "A" and cache.get("c") == "C"
+    assert cache.stats().evictions == 1
+
+def test_entries_persist_across_instances(tmp_path):
+    path = str(tmp_path / "cache.sqlite3")
+    first = PageCache(path)
+    first.put("k", "markdown")
+    first.close()
+    assert PageCache(path).get("k") == "markdown"
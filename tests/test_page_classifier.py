@@ -0,0 +1,37 @@
+import os
+from PIL import Image
+from page_classifier import BLANK, TEXT, ClassifierSettings, classify_page, iter_classified_pages
+from rasterizer import PageImage
+from tools import png_to_markdown_converter
+
+def test_blank_page_is_skipped(tmp_path):
+    path = str(tmp_path / "blank.png")
+    Image.new("RGB", (850, 1100), "white").save(path)
+    route = classify_page(PageImage(page_number=1, path=path))
+    assert route.page_class == BLANK and route.skip
+
+def test_prose_goes_to_the_light_model(text_page_png):
+    route = classify_page(PageImage(page_number=1, path=text_page_png(1)))
+    assert route.page_class == TEXT
+    assert route.model == ClassifierSettings().light_model
+
+def test_unreadable_page_is_passed_on_unrouted(tmp_path, text_page_png):
+    pages = [PageImage(page_number=1, path=text_page_png(1)), PageImage(page_number=2, path=str(tmp_path / "missing.png"))]
+    routes = {}
+    yielded = list(iter_classified_pages(pages, routes=routes))
+    assert [page.page_number for page in yielded] == [1, 2]
+    assert list(routes) == [1]
+
+def test_missing_page_fails_only_that_page(tmp_path, text_page_png, fake_openai):
+    png_paths = [text_page_png(n) for n in (1, 2, 3)]
+    os.remove(png_paths[1])
+    result = png_to_markdown_converter.invoke({
+        "png_paths": png_paths,
+        "output_dir": str(tmp_path / "out"),
+        "use_cache": False,
+        "route_pages": True
+    })
+    assert not result.success
+    assert result.failed_pages == [2]
+    with open(result.markdown_path) as md_file:
+        assert md_file.read().count("## Section") == 2
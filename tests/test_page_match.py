@@ -0,0 +1,29 @@
+import random
+from PIL import Image, ImageDraw
+from old_files.page_match import align_pages, fingerprint_page, match_unchanged_pages
+
+def write_page(path, block: int, lines=()):
+    """A page with a coarse pattern of gray cells, seeded by `block`, that sets it apart from other pages."""
+    image = Image.new("RGB", (600, 800), "white")
+    draw = ImageDraw.Draw(image)
+    cells = random.Random(block)
+    for row in range(16):
+        for col in range(6):
+            gray = cells.randrange(256)
+            draw.rectangle((col * 50, row * 50, col * 50 + 49, row * 50 + 49), fill=(gray, gray, gray))
+    for y, text in enumerate(lines):
+        draw.text((340, 40 + 30 * y), text, fill="black")
+    image.save(path)
+    return str(path)
+
+def test_inserted_page_keeps_the_others_matched(tmp_path):
+    original = [write_page(tmp_path / f"a_{i}.png", block) for i, block in enumerate((0, 2, 4))]
+    updated = [write_page(tmp_path / f"b_{i}.png", block) for i, block in enumerate((0, 1, 2, 4))]
+    assert match_unchanged_pages(original, updated) == {0: 0, 2: 1, 3: 2}
+
+def test_edited_word_is_not_unchanged(tmp_path):
+    original = [write_page(tmp_path / "a.png", 1, ["Heading", "the quick brown fox"])]
+    updated = [write_page(tmp_path / "b.png", 1, ["Heading", "the quick brown cat"])]
+    # Perceptually alike, so aligned, but the pixel check rejects the page
+    assert align_pages([fingerprint_page(original[0])], [fingerprint_page(updated[0])]) == [(0, 0)]
+    assert match_unchanged_pages(original, updated) == {}
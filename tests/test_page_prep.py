@@ -0,0 +1,47 @@
+import io
+import random
+from PIL import Image, ImageDraw
+from page_prep import PrepSettings, fit_to_budget, iter_prepared_pages, prepare_page
+from rasterizer import PageImage
+
+def encoded(image: Image.Image, image_format: str = "PNG", **params) -> bytes:
+    buffer = io.BytesIO()
+    image.save(buffer, image_format, **params)
+    return buffer.getvalue()
+
+def letter_page() -> bytes:
+    """A US letter page rendered at 300 DPI with a few lines of text."""
+    image = Image.new("RGB", (2550, 3300), "white")
+    draw = ImageDraw.Draw(image)
+    for y in range(200, 3100, 60):
+        draw.text((200, y), "The quick brown fox jumps over the lazy dog " * 4, fill="black")
+    return encoded(image)
+
+def test_budget_caps_long_then_short_side():
+    assert fit_to_budget(Image.new("L", (2550, 3300)), 2048, 768).size == (768, 994)
+    assert fit_to_budget(Image.new("L", (8000, 2000)), 2048, 768).size == (2048, 512)
+    assert fit_to_budget(Image.new("L", (600, 800)), 2048, 768).size == (600, 800)
+
+def test_page_is_shrunk_to_the_budget():
+    page = PageImage(page_number=3, data=letter_page())
+    prepared, report = prepare_page(page, PrepSettings(trim_margins=False))
+    assert prepared.mime_type == "image/webp" and prepared.page_number == 3
+    assert report.original_size == (2550, 3300) and report.prepared_size == (768, 994)
+    assert report.prepared_bytes == len(prepared.data) < report.original_bytes
+    with Image.open(io.BytesIO(prepared.data)) as image:
+        assert image.size == (768, 994)
+
+def test_page_that_would_grow_is_sent_as_is():
+    rng = random.Random(0)
+    noise = Image.frombytes("L", (300, 300), bytes(rng.randrange(256) for _ in range(300 * 300)))
+    original = encoded(noise, "JPEG", quality=20)
+    page = PageImage(page_number=1, data=original, mime_type="image/jpeg")
+    prepared, report = prepare_page(page, PrepSettings(image_format="PNG", trim_margins=False))
+    assert prepared.data == original and prepared.mime_type == "image/jpeg"
+    assert report.bytes_saved == 0
+
+def test_undecodable_page_passes_through():
+    page = PageImage(page_number=1, data=b"not an image")
+    reports = []
+    assert list(iter_prepared_pages([page], reports=reports)) == [page]
+    assert reports == []
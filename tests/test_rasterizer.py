@@ -0,0 +1,53 @@
+import os
+import shutil
+import pytest
+from PIL import Image, ImageChops
+import rasterizer
+from rasterizer import iter_page_windows, shard_pdf_to_png, stream_pdf_to_png
+
+requires_poppler = pytest.mark.skipif(shutil.which("pdfinfo") is None, reason="poppler is not installed")
+
+def test_windows_cover_every_page_once():
+    assert list(iter_page_windows(10, 4)) == [(1, 4), (5, 8), (9, 10)]
+    assert list(iter_page_windows(3, 0)) == [(1, 1), (2, 2), (3, 3)]
+    assert list(iter_page_windows(0, 4)) == []
+
+def test_windows_leave_out_skipped_pages():
+    assert list(iter_page_windows(10, 4, skip_pages={2, 3, 7})) == [(1, 1), (4, 6), (8, 10)]
+    assert list(iter_page_windows(3, 4, skip_pages={1, 2, 3})) == []
+
+def test_failed_shard_leaves_no_temporary_files(tmp_path, monkeypatch):
+    def short_render(pdf_path, output_folder, output_file, **kwargs):
+        # Poppler died after the first of three pages
+        path = os.path.join(output_folder, f"{output_file}-1.png")
+        Image.new("RGB", (10, 10)).save(path)
+        return [path]
+
+    monkeypatch.setattr(rasterizer, "convert_from_path", short_render)
+    with pytest.raises(RuntimeError):
+        rasterizer._render_shard("doc.pdf", str(tmp_path), 30, 1, 3)
+    assert os.listdir(tmp_path) == []
+
+@pytest.fixture
+def synthetic_pdf(tmp_path):
+    from benchmark import write_synthetic_pdf
+    return write_synthetic_pdf(str(tmp_path / "doc.pdf"), 13)
+
+def same_image(a: str, b: str) -> bool:
+    with Image.open(a) as first, Image.open(b) as second:
+        return first.size == second.size and ImageChops.difference(first.convert("RGB"), second.convert("RGB")).getbbox() is None
+
+@requires_poppler
+def test_shards_name_and_order_pages_like_the_streaming_renderer(tmp_path, synthetic_pdf):
+    streamed = list(stream_pdf_to_png(synthetic_pdf, str(tmp_path / "streamed"), dpi=30, page_window=4))
+    sharded = list(shard_pdf_to_png(synthetic_pdf, str(tmp_path / "sharded"), dpi=30, workers=3))
+
+    assert [os.path.basename(p) for p in sharded] == [f"page_{n}.png" for n in range(1, 14)]
+    assert [os.path.basename(p) for p in streamed] == [os.path.basename(p) for p in sharded]
+    assert all(same_image(a, b) for a, b in zip(streamed, sharded))
+    assert sorted(os.listdir(tmp_path / "sharded")) == sorted(f"page_{n}.png" for n in range(1, 14))
+
+@requires_poppler
+def test_shards_skip_pages(tmp_path, synthetic_pdf):
+    sharded = list(shard_pdf_to_png(synthetic_pdf, str(tmp_path), dpi=30, workers=2, skip_pages={2, 7, 13}))
+    assert [os.path.basename(p) for p in sharded] == [f"page_{n}.png" for n in range(1, 14) if n not in (2, 7, 13)]
@@ -0,0 +1,70 @@
+import asyncio
+import http.client
+import json
+import os
+import shutil
+import socket
+import sys
+import threading
+import time
+import pytest
+import client
+from worker import WorkerServer
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+@pytest.fixture(scope="module")
+def worker(fake_openai):
+    port = free_port()
+    server = WorkerServer(port=port)
+    thread = threading.Thread(target=asyncio.run, args=(server.serve(),), daemon=True)
+    thread.start()
+    deadline = time.monotonic() + 30
+    while client.health("127.0.0.1", port) is None:
+        assert time.monotonic() < deadline, "worker did not start"
+        time.sleep(0.1)
+    yield port
+    connection = http.client.HTTPConnection("127.0.0.1", port)
+    connection.request("POST", "/shutdown")
+    connection.getresponse().read()
+    thread.join(timeout=10)
+
+def post_job(port: int, body: bytes):
+    connection = http.client.HTTPConnection("127.0.0.1", port, timeout=10)
+    try:
+        connection.request("POST", "/jobs", body=body, headers={"Content-Type": "application/json"})
+        response = connection.getresponse()
+        return response.status, json.loads(response.read())
+    finally:
+        connection.close()
+
+def test_malformed_job_gets_400(worker):
+    status, payload = post_job(worker, b"{not json")
+    assert status == 400 and "not valid JSON" in payload["error"]
+
+@pytest.mark.parametrize("job", [{}, [], {"input_path": "a.docx", "priority": "urgent"}])
+def test_invalid_job_gets_400(worker, job):
+    status, payload = post_job(worker, json.dumps(job).encode())
+    assert status == 400 and payload["error"]
+
+def test_job_streams_events_into_its_job_dir(worker, tmp_path):
+    docx_path = str(tmp_path / "test.docx")
+    shutil.copy(os.path.join(ROOT, "test_files", "test.docx"), docx_path)
+    events = list(client.submit("127.0.0.1", worker, {"input_path": docx_path, "mode": "fast", "priority": "batch"}))
+    assert [e["event"] for e in events][-2:] == ["done", "metrics"]
+    state = events[-2]["state"]
+    assert not state.get("error")
+    assert os.path.exists(state["markdown_path"]) and state["markdown_path"].startswith(str(tmp_path))
+
+def test_failed_job_exits_non_zero(worker, tmp_path, capsys):
+    job = client.submit("127.0.0.1", worker, {"input_path": str(tmp_path / "missing.docx"), "mode": "fast"})
+    assert client.print_events(job, stream=False) == 1
+
+def test_failed_local_run_exits_non_zero(tmp_path, monkeypatch, capsys):
+    monkeypatch.setattr(sys, "argv", ["client.py", str(tmp_path / "missing.docx"), "--mode", "fast", "--local"])
+    assert client.main() == 1
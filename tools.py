@@ -1,13 +1,20 @@
-from typing import List
+from typing import Any, Dict, Iterable, Iterator, List, Optional
 import os
-import json
-import base64
+import time
 from pydantic import BaseModel, Field
-from docx2pdf import convert as docx2pdf_convert
-from pdf2image import convert_from_path
-from langchain_openai import ChatOpenAI
-from langchain.tools import tool, Tool
-from langchain_core.messages import BaseMessage, HumanMessage
+from converters import get_backend
+from rasterizer import DEFAULT_DPI, DEFAULT_PAGE_WINDOW, DEFAULT_RENDER_WORKERS, PageImage, count_pdf_pages, iter_page_images, shard_pdf_to_png, stream_pdf_to_png
+from ocr import DEFAULT_MAX_CONCURRENCY, PAGE_PROMPT, VISION_MODEL, PageResult, iter_convert_page_images, page_images_from_paths
+from docx_markdown import convert_docx, fill_images
+from page_prep import PrepReport, iter_prepared_pages
+from page_classifier import LIGHT_VISION_MODEL, MATH_PROMPT, iter_classified_pages
+from page_cache import get_default_cache
+from journal import RunJournal, file_fingerprint, open_journal
+from artifact_store import Staging, artifact_key, get_default_store
+from progress import emit, progress_listener
+from langchain_core.tools import tool
+from langgraph.types import StreamWriter
+from state import DocumentState
 
 class DocxToPdfResult(BaseModel):
     pdf_path: str = Field(description="Path to the generated PDF file")
@@ -23,14 +30,30 @@ class MarkdownResult(BaseModel):
     markdown_path: str = Field(description="Path to the generated Markdown file")
     success: bool = Field(description="Whether the conversion was successful")
     error: str = Field(default="", description="Error message if conversion failed")
+    failed_pages: List[int] = Field(default_factory=list, description="Page numbers that could not be converted")
+    cached_pages: int = Field(default=0, description="Number of pages answered from the page cache")
+    resumed_pages: int = Field(default=0, description="Number of pages taken from the journal of an earlier run")
+    skipped_pages: List[int] = Field(default_factory=list, description="Blank pages the page classifier kept from the vision model")
+    bytes_saved: List[int] = Field(default_factory=list, description="Upload bytes saved per page by page preparation")
+    first_page_seconds: float = Field(default=0.0, description="Seconds until the first page was written to the Markdown file")
+
+class NativeMarkdownResult(BaseModel):
+    markdown_path: str = Field(description="Path to the generated Markdown file, empty if the document needs rasterization")
+    success: bool = Field(description="Whether the conversion was successful")
+    error: str = Field(default="", description="Error message if conversion failed")
+    needs_rasterization: bool = Field(default=False, description="Whether the document has content that must go through PDF rendering and OCR")
+    unsupported: List[str] = Field(default_factory=list, description="Content the native parser could not render")
+    images: int = Field(default=0, description="Number of embedded images transcribed by the vision model")
 
 @tool
-def docx_to_pdf_converter(docx_path: str) -> DocxToPdfResult:
+def docx_to_pdf_converter(docx_path: str, output_dir: str = "", use_store: bool = True) -> DocxToPdfResult:
     """
-    Convert a DOCX file to PDF format. This function requires both a DOCX file path and an output directory.
+    Convert a DOCX file to PDF format with the configured converter backend (Word via docx2pdf, or a pool of headless LibreOffice workers).
 
     Parameters:
         docx_path (str): The path to the DOCX file to be converted. (Required)
+        output_dir (str): Directory in which pdf_files/ is created. Defaults to the DOCX file's directory. (Optional)
+        use_store (bool): Reuse the PDF of an earlier conversion of the same content with the same backend. Defaults to True. (Optional)
 
     Returns:
         DocxToPdfResult: The result of the conversion, including the path to the PDF and a success flag.
@@ -38,110 +61,370 @@ def docx_to_pdf_converter(docx_path: str) -> DocxToPdfResult:
     try:
                 
         # Get output directory
-        output_dir = os.path.dirname(docx_path)
+        output_dir = output_dir or os.path.dirname(docx_path)
 
         pdf_dir = os.path.join(output_dir, "pdf_files")
         os.makedirs(pdf_dir, exist_ok=True)
         
         doc_name = os.path.splitext(os.path.basename(docx_path))[0]
         pdf_path = os.path.join(pdf_dir, f"{doc_name}.pdf")
-        
-        docx2pdf_convert(docx_path, pdf_path)
+        backend = get_backend()
+
+        def build(staging: Optional[Staging] = None) -> Dict[str, Any]:
+            # A previous PDF may be a link into the artifact store; never write through it
+            if os.path.exists(pdf_path):
+                os.remove(pdf_path)
+            backend.convert(docx_path, pdf_path)
+            if staging is not None:
+                staging.add_file("document.pdf", pdf_path)
+            return {"backend": backend.name}
+
+        if not use_store:
+            build()
+            return DocxToPdfResult(pdf_path=pdf_path, success=True)
+
+        key = artifact_key("pdf", file_fingerprint(docx_path), backend=backend.name)
+        get_default_store().get_or_build(key, "pdf", build, pdf_dir, {"document.pdf": f"{doc_name}.pdf"})
         return DocxToPdfResult(pdf_path=pdf_path, success=True)
     except Exception as e:
         return DocxToPdfResult(pdf_path="", success=False, error=str(e))
 
 @tool
-def pdf_to_png_converter(pdf_path: str, dpi: int = 300) -> PdfToPngResult:
-    """Convert a PDF file to PNG images. Takes pdf_path and optional dpi as parameters."""
+def pdf_to_png_converter(pdf_path: str, dpi: int = DEFAULT_DPI, page_window: int = DEFAULT_PAGE_WINDOW, render_workers: int = DEFAULT_RENDER_WORKERS, use_store: bool = True) -> PdfToPngResult:
+    """Convert a PDF file to PNG images. Takes pdf_path and optional dpi, page_window (pages rendered at a time by a single worker), render_workers (parallel poppler processes) and use_store (reuse the pages of an earlier rasterization of the same PDF at the same DPI) as parameters."""
     try:
         # Get output directory
         output_dir = os.path.dirname(pdf_path)
         png_dir = os.path.join(output_dir, "png_files")
-        os.makedirs(png_dir, exist_ok=True)
-        
-        pages = convert_from_path(pdf_path, dpi=dpi)
-        png_paths = []
-        
-        for i, page in enumerate(pages):
-            png_path = os.path.join(png_dir, f"page_{i+1}.png")
-            page.save(png_path, "PNG")
-            png_paths.append(png_path)
-            
+
+        def render() -> List[str]:
+            if render_workers > 1:
+                # Page range split into shards rendered by parallel poppler processes straight to disk
+                return list(shard_pdf_to_png(pdf_path, png_dir, dpi=dpi, workers=render_workers))
+            # Pages are rendered and saved in bounded windows so memory does not grow with page count
+            return list(stream_pdf_to_png(pdf_path, png_dir, dpi=dpi, page_window=page_window))
+
+        if not use_store:
+            return PdfToPngResult(png_paths=render(), success=True)
+
+        def build(staging: Staging) -> Dict[str, Any]:
+            png_paths = render()
+            for png_path in png_paths:
+                staging.add_file(os.path.basename(png_path), png_path)
+            return {"pages": len(png_paths), "dpi": dpi}
+
+        key = artifact_key("png", file_fingerprint(pdf_path), dpi=dpi)
+        png_paths, _ = get_default_store().get_or_build(key, "png", build, png_dir)
         return PdfToPngResult(png_paths=png_paths, success=True)
     except Exception as e:
         return PdfToPngResult(png_paths=[], success=False, error=str(e))
 
+def write_markdown(
+    page_results: Iterable[PageResult],
+    output_dir: str,
+    prep_reports: Optional[List[PrepReport]] = None,
+    page_count: int = 0
+) -> MarkdownResult:
+    """
+    Append page results to markdown_files/output.md as they arrive and build the MarkdownResult.
+
+    Each page is flushed to the file and announced as a "page" progress event
+    as soon as it is available, so readers of the file or of the event stream
+    see the document grow page by page.
+    """
+    markdown_dir = os.path.join(output_dir, "markdown_files")
+    os.makedirs(markdown_dir, exist_ok=True)
+    markdown_path = os.path.join(markdown_dir, "output.md")
+    
+    # Keep every page that succeeded, in page order, and leave a marker where a page failed
+    started = time.perf_counter()
+    first_page_seconds = 0.0
+    failed_pages = []
+    skipped_pages = []
+    pages_done = pages_written = cached_pages = resumed_pages = 0
+    with open(markdown_path, "w") as f:
+        for page in page_results:
+            if page.success:
+                content = page.markdown
+            else:
+                failed_pages.append(page.page_number)
+                content = f"<!-- page {page.page_number} failed: {page.error} -->"
+            if page.skipped:
+                skipped_pages.append(page.page_number)
+            # Blank pages add nothing to the document, not even a separator
+            if content:
+                f.write(("\n\n" if pages_written else "") + content)
+                f.flush()
+                pages_written += 1
+            pages_done += 1
+            cached_pages += page.cached
+            resumed_pages += page.resumed
+            if pages_done == 1:
+                first_page_seconds = time.perf_counter() - started
+            emit(
+                "page",
+                page_number=page.page_number,
+                pages_done=pages_done,
+                page_count=page_count,
+                success=page.success,
+                cached=page.cached,
+                resumed=page.resumed,
+                skipped=page.skipped,
+                page_class=page.page_class,
+                markdown=page.markdown,
+                error=page.error,
+                markdown_path=markdown_path
+            )
+    bytes_saved = [report.bytes_saved for report in prep_reports or []]
+    stats = dict(cached_pages=cached_pages, resumed_pages=resumed_pages, skipped_pages=skipped_pages, bytes_saved=bytes_saved, first_page_seconds=first_page_seconds)
+    
+    if failed_pages:
+        error = f"Failed to convert pages: {', '.join(str(n) for n in failed_pages)}"
+        return MarkdownResult(markdown_path=markdown_path, success=False, error=error, failed_pages=failed_pages, **stats)
+    return MarkdownResult(markdown_path=markdown_path, success=True, **stats)
+
+def iter_page_results(
+    pages: Iterable[PageImage],
+    page_numbers: Iterable[int],
+    max_concurrency: int = DEFAULT_MAX_CONCURRENCY,
+    use_cache: bool = True,
+    prepare_pages: bool = True,
+    journal: Optional[RunJournal] = None,
+    prep_reports: Optional[List[PrepReport]] = None,
+    route_pages: bool = True
+) -> Iterator[PageResult]:
+    """
+    Convert `pages` to PageResults, yielded in page order as soon as each is ready.
+
+    When a journal is given, pages already in it are taken from it and never
+    sent to the vision model, and every page converted now is journaled as
+    soon as it finishes. `page_numbers` lists all pages of the document in
+    order, so journaled pages that `pages` skipped are still yielded.
+
+    With `route_pages`, each page is classified on the full-size image before
+    preparation: blank pages are skipped, and each other page gets the model
+    and prompt of its class.
+    """
+    done = journal.pages if journal is not None else {}
+    pending = (page for page in pages if page.page_number not in done)
+    routes = {} if route_pages else None
+    if route_pages:
+        pending = iter_classified_pages(pending, routes=routes)
+    if prepare_pages:
+        pending = iter_prepared_pages(pending, reports=prep_reports)
+    cache = get_default_cache() if use_cache else None
+    converted = iter_convert_page_images(pending, max_concurrency=max_concurrency, cache=cache, routes=routes)
+    for page_number in page_numbers:
+        if page_number in done:
+            yield PageResult(page_number=page_number, markdown=done[page_number], success=True, resumed=True)
+            continue
+        result = next(converted, None)
+        if result is None:
+            return
+        if result.success and journal is not None:
+            journal.record_page(result.page_number, result.markdown)
+        yield result
+
+@tool
+def png_to_markdown_converter(png_paths: List[str], output_dir: str, max_concurrency: int = DEFAULT_MAX_CONCURRENCY, use_cache: bool = True, prepare_pages: bool = True, route_pages: bool = True, journal_path: str = "") -> MarkdownResult:
+    """Convert PNG files to Markdown format. Takes a list of png_paths, output_dir, optional max_concurrency (parallel vision calls), use_cache (reuse previously converted pages), prepare_pages (shrink images to the model's budget before upload), route_pages (skip blank pages and pick the model and prompt per page) and journal_path (resume from and record finished pages) as parameters."""
+    try:
+        prep_reports = []
+        journal = RunJournal(journal_path) if journal_path else None
+        page_results = iter_page_results(
+            page_images_from_paths(png_paths),
+            range(1, len(png_paths) + 1),
+            max_concurrency=max_concurrency,
+            use_cache=use_cache,
+            prepare_pages=prepare_pages,
+            journal=journal,
+            prep_reports=prep_reports,
+            route_pages=route_pages
+        )
+        return write_markdown(page_results, output_dir, prep_reports, page_count=len(png_paths))
+    except Exception as e:
+        return MarkdownResult(markdown_path="", success=False, error=str(e))
+
 @tool
-def png_to_markdown_converter(png_paths: List[str], output_dir: str) -> MarkdownResult:
-    """Convert PNG files to Markdown format. Takes a list of png_paths and output_dir as parameters."""
+def pdf_to_markdown_converter(
+    pdf_path: str,
+    output_dir: str,
+    dpi: int = DEFAULT_DPI,
+    page_window: int = DEFAULT_PAGE_WINDOW,
+    max_concurrency: int = DEFAULT_MAX_CONCURRENCY,
+    use_cache: bool = True,
+    prepare_pages: bool = True,
+    route_pages: bool = True,
+    png_dir: str = "",
+    journal_path: str = "",
+    use_store: bool = True
+) -> MarkdownResult:
+    """Convert a PDF file straight to Markdown, passing rendered pages to the vision model in memory. Takes pdf_path, output_dir and optional dpi, page_window, max_concurrency, use_cache, prepare_pages, route_pages, png_dir (also save the page PNGs there), journal_path (resume from and record finished pages) and use_store (take the pages of an earlier rasterization of the same PDF at the same DPI instead of rendering, and keep the rendered pages for later runs) as parameters."""
+    staging = None
     try:
-        markdown_dir = os.path.join(output_dir, "markdown_files")
+        prep_reports = []
+        journal = RunJournal(journal_path) if journal_path else None
+        # Pages finished by an earlier run are not even rendered again
+        skip_pages = set(journal.pages) if journal is not None else set()
+        page_count = count_pdf_pages(pdf_path)
+
+        store = get_default_store() if use_store else None
+        key = artifact_key("png", file_fingerprint(pdf_path), dpi=dpi) if store is not None else ""
+        # The pages are read from the job's own links, never from the entry, which gc may remove mid-run
+        png_paths = store.checkout(key, "png", png_dir or os.path.join(output_dir, "png_files")) if store is not None else None
+        if png_paths is not None:
+            pages = page_images_from_paths(png_paths)
+        else:
+            pages = iter_page_images(pdf_path, dpi=dpi, page_window=page_window, sink_dir=png_dir or None, skip_pages=skip_pages)
+            if store is not None and not skip_pages:
+                # Keep the rendered pages for later runs; only a complete rendering is committed
+                staging = store.stage(key, "png")
+                pages = _staged_pages(pages, staging)
+
+        page_results = iter_page_results(
+            pages,
+            range(1, page_count + 1),
+            max_concurrency=max_concurrency,
+            use_cache=use_cache,
+            prepare_pages=prepare_pages,
+            journal=journal,
+            prep_reports=prep_reports,
+            route_pages=route_pages
+        )
+        result = write_markdown(page_results, output_dir, prep_reports, page_count=page_count)
+        if staging is not None:
+            if len(staging.files) == page_count:
+                staging.commit(pages=page_count, dpi=dpi)
+            else:
+                staging.discard()
+        return result
+    except Exception as e:
+        if staging is not None:
+            staging.discard()
+        return MarkdownResult(markdown_path="", success=False, error=str(e))
+
+def _staged_pages(pages: Iterable[PageImage], staging: Staging) -> Iterator[PageImage]:
+    """Pass pages through, adding each encoded image to `staging` as page_N.png."""
+    for page in pages:
+        staging.add_bytes(f"page_{page.page_number}.png", page.read())
+        yield page
+
+@tool
+def docx_to_markdown_converter(docx_path: str, output_dir: str = "", max_concurrency: int = DEFAULT_MAX_CONCURRENCY, use_cache: bool = True) -> NativeMarkdownResult:
+    """Convert a DOCX file to Markdown by reading its XML directly, without Word, PDF rendering or page OCR. Only embedded images go to the vision model. Takes docx_path and optional output_dir, max_concurrency and use_cache as parameters; reports needs_rasterization when the document must take the PDF route instead."""
+    try:
+        conversion = convert_docx(docx_path)
+        if conversion.needs_rasterization:
+            return NativeMarkdownResult(markdown_path="", success=True, needs_rasterization=True, unsupported=conversion.unsupported)
+
+        markdown = conversion.markdown
+        if conversion.images:
+            cache = get_default_cache() if use_cache else None
+            pages = [PageImage(page_number=image.index + 1, data=image.data, mime_type=image.mime_type) for image in conversion.images]
+            results = list(iter_convert_page_images(pages, max_concurrency=max_concurrency, cache=cache))
+            failed = [image.name for image, result in zip(conversion.images, results) if not result.success]
+            if failed:
+                return NativeMarkdownResult(markdown_path="", success=False, error=f"Failed to transcribe images: {', '.join(failed)}", images=len(results))
+            markdown = fill_images(markdown, {result.page_number - 1: result.markdown for result in results})
+
+        markdown_dir = os.path.join(output_dir or os.path.dirname(docx_path), "markdown_files")
         os.makedirs(markdown_dir, exist_ok=True)
-        
-        llm = ChatOpenAI(model="gpt-4-vision-preview")
-        markdown_content = []
-        
-        for png_path in png_paths:
-            with open(png_path, "rb") as img_file:
-                img_base64 = base64.b64encode(img_file.read()).decode()
-            
-            response = llm.invoke([
-                {"type": "text", "text": "Convert this image to markdown. Extract any mathematical formulas as LaTeX."},
-                {"type": "image_url", "image_url": f"data:image/png;base64,{img_base64}"}
-            ])
-            
-            markdown_content.append(response.content)
-        
         markdown_path = os.path.join(markdown_dir, "output.md")
         with open(markdown_path, "w") as f:
-            f.write("\n\n".join(markdown_content))
-            
-        return MarkdownResult(markdown_path=markdown_path, success=True)
+            f.write(markdown)
+        emit("document", markdown=markdown, markdown_path=markdown_path)
+        return NativeMarkdownResult(markdown_path=markdown_path, success=True, images=len(conversion.images))
     except Exception as e:
-        return MarkdownResult(markdown_path="", success=False, error=str(e))
+        return NativeMarkdownResult(markdown_path="", success=False, error=str(e))
+
+# Tools offered to the coordinator; docx_to_markdown_converter and pdf_to_markdown_converter are only used by the fast pipeline
+TOOLS = [docx_to_pdf_converter, pdf_to_png_converter, png_to_markdown_converter]
+TOOLS_BY_NAME = {t.name: t for t in TOOLS}
+
+# Step recorded in DocumentState.step_status for each tool
+TOOL_STEPS = {
+    "docx_to_pdf_converter": "docx_to_pdf",
+    "pdf_to_png_converter": "pdf_to_png",
+    "png_to_markdown_converter": "png_to_markdown"
+}
+
+# The step whose success completes a run of the agentic graph
+FINAL_STEP = "png_to_markdown"
+
+def conversion_settings(dpi: int = DEFAULT_DPI, prepare_pages: bool = True, route_pages: bool = True) -> Dict[str, Any]:
+    """Settings that change a run's output; the journal of a run with other settings is never resumed."""
+    return {
+        "vision_model": VISION_MODEL,
+        "light_model": LIGHT_VISION_MODEL,
+        "page_prompt": PAGE_PROMPT,
+        "math_prompt": MATH_PROMPT,
+        "dpi": dpi,
+        "prepare_pages": prepare_pages,
+        "route_pages": route_pages
+    }
 
-def local_tool_call(state: List[BaseMessage]) -> List[BaseMessage]:
-    """Execute the tool call identified by the coordinator."""
+# Tool arguments that are always taken from the state rather than from the LLM,
+# since the state holds the authoritative artifact paths
+STATE_ARGS = {
+    "docx_path": "input_path",
+    "pdf_path": "pdf_path",
+    "png_paths": "png_paths",
+    "output_dir": "output_dir",
+    "journal_path": "journal_path"
+}
+
+# Result fields that are artifacts and get copied into the state
+ARTIFACT_FIELDS = ("pdf_path", "png_paths", "markdown_path")
+
+def summarize_result(tool_name: str, result: Dict[str, Any]) -> Dict[str, Any]:
+    """Return a bounded summary of a tool result that is safe to put in a prompt."""
+    summary = {"tool": tool_name}
+    for key, value in result.items():
+        if isinstance(value, list):
+            summary[key] = f"{len(value)} items" + (f" ({value[0]} .. {value[-1]})" if value else "")
+        else:
+            summary[key] = value
+    return summary
+
+def local_tool_call(state: DocumentState, writer: StreamWriter) -> Dict[str, Any]:
+    """Execute the tool call identified by the coordinator, forwarding its progress events to `writer`."""
+    tool_call = state.get("tool_call") or {}
+    tool_name = tool_call.get("name", "")
     try:
-        # Get the tool call information from the last message
-        result_dict = eval(state[-1].content)  # Use eval instead of json.loads for the outer structure
+        selected_tool = TOOLS_BY_NAME.get(tool_name)
+        if selected_tool is None:
+            return {"tool_call": None, "error": f"Tool not found: {tool_name}"}
         
-        # Extract tool call information
-        tool_calls = result_dict.get('additional_kwargs', {}).get('tool_calls', [])
-        if not tool_calls:
-            return state + [HumanMessage(content="Error: No tool calls found")]
-        
-        tool_call = tool_calls[0]
-        tool_name = tool_call['function']['name']
-        tool_args = json.loads(tool_call['function']['arguments'])  # Parse the arguments JSON
-        
-        # Initialize tools
-        tools = [
-            Tool(
-                func=docx_to_pdf_converter,
-                name="docx_to_pdf_converter",
-                description=docx_to_pdf_converter.__doc__
-            ),
-            Tool(
-                func=pdf_to_png_converter,
-                name="pdf_to_png_converter",
-                description=pdf_to_png_converter.__doc__
-            ),
-            Tool(
-                func=png_to_markdown_converter,
-                name="png_to_markdown_converter",
-                description=png_to_markdown_converter.__doc__
-            )
-        ]
+        tool_args = dict(tool_call.get("args", {}))
+        for arg_name, state_key in STATE_ARGS.items():
+            if arg_name in selected_tool.args and state.get(state_key):
+                tool_args[arg_name] = state[state_key]
         
-        # Find and execute the tool
-        for tool in tools:
-            if tool.name == tool_name:
-                tool_result = tool.invoke(tool_args)
-                return state + [HumanMessage(content=str(tool_result.model_dump()))]
+        started = time.perf_counter()
+        step = TOOL_STEPS[tool_name]
+        # A step finished by an interrupted earlier run is answered from its journal
+        journal = open_journal(state["journal_path"], state["input_path"], conversion_settings()) if state.get("journal_path") else None
+        artifacts = journal.stage_artifacts(step) if journal is not None else None
+        if artifacts is not None:
+            result = {"success": True, "error": "", "resumed": True, **artifacts}
+        else:
+            with progress_listener(writer):
+                result = selected_tool.invoke(tool_args).model_dump()
+            if journal is not None and result["success"]:
+                if step == FINAL_STEP:
+                    journal.discard()  # The run is complete; only interrupted runs are resumed
+                else:
+                    journal.record_stage(step, **{key: result[key] for key in ARTIFACT_FIELDS if key in result})
         
-        return state + [HumanMessage(content="Error: Tool not found")]
+        update = {
+            "tool_call": None,
+            "last_result": summarize_result(tool_name, result),
+            "step_status": {step: "success" if result["success"] else "failed"},
+            "timings": {step: time.perf_counter() - started}
+        }
+        if result["success"]:
+            update.update({key: result[key] for key in ARTIFACT_FIELDS if key in result})
+        return update
         
     except Exception as e:
-        return state + [HumanMessage(content=f"Error in tool execution: {str(e)}")] 
\ No newline at end of file
+        return {"tool_call": None, "error": f"Error in tool execution: {str(e)}"}
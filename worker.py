@@ -0,0 +1,184 @@
+from dotenv import load_dotenv
+import argparse
+import asyncio
+import json
+import os
+import sys
+import time
+from typing import Any, AsyncIterator, Dict, Tuple
+load_dotenv()
+
+from main import stream_document
+from coordinator import coordinator_llm
+from converters import get_backend
+from artifact_store import get_default_store
+from llm_scheduler import PRIORITIES, chat_model, job_priority
+from ocr import VISION_MODEL
+from page_cache import get_default_cache
+from page_classifier import LIGHT_VISION_MODEL
+from journal import RunJournal
+from state import initial_state, job_lock
+import metrics
+
+DEFAULT_HOST = os.getenv("DOCX_MARKDOWN_WORKER_HOST", "127.0.0.1")
+DEFAULT_PORT = int(os.getenv("DOCX_MARKDOWN_WORKER_PORT", "8766"))
+DEFAULT_MAX_JOBS = 4
+
+def warm_up() -> Dict[str, float]:
+    """
+    Build everything a job would otherwise build on first use and return the seconds each part took.
+
+    The graphs and tools are already built when this module is imported. A
+    converter backend that cannot start here (e.g. no LibreOffice) is reported,
+    not fatal, since native conversions never need it.
+    """
+    timings = {}
+    for name, build in (
+        ("chat_clients", lambda: [chat_model(VISION_MODEL), chat_model(LIGHT_VISION_MODEL)]),
+        ("coordinator", coordinator_llm),
+        ("page_cache", get_default_cache),
+        ("artifact_store", get_default_store),
+        ("converter_backend", get_backend)
+    ):
+        started = time.perf_counter()
+        try:
+            build()
+        except Exception as e:
+            print(f"warm-up of {name} failed: {e}", file=sys.stderr)
+        timings[name] = time.perf_counter() - started
+    return timings
+
+async def run_job(job: Dict[str, Any]) -> AsyncIterator[Dict[str, Any]]:
+    """
+    Convert one document and yield its progress events (see main.stream_document).
+
+    Like a CLI run, the job holds its job directory's lock, and its run report
+    is written to the job's "metrics_dir" (default: <job dir>/metrics). A final "metrics" event gives the paths.
+    Its LLM calls queue at the job's "priority", so interactive jobs overtake batch jobs sharing this worker.
+    """
+    input_path = os.path.abspath(job["input_path"])
+    output_root = job.get("output_root", "")
+    state = initial_state(input_path, output_root)
+    job_dir = state["output_dir"]
+    lock = job_lock(job_dir)
+    await asyncio.to_thread(lock.acquire)
+    try:
+        if not job.get("resume", True):
+            RunJournal(state["journal_path"]).discard()
+        with metrics.collect() as run_metrics, job_priority(PRIORITIES[job.get("priority", "interactive")]):
+            async for event in stream_document(input_path, job.get("mode", "agentic"), job.get("png_dir", ""), job.get("native", True), output_root):
+                yield event
+    finally:
+        lock.release()
+    paths = await asyncio.to_thread(run_metrics.write, job.get("metrics_dir") or os.path.join(job_dir, "metrics"))
+    yield {"event": "metrics", **paths}
+
+class WorkerServer:
+    """
+    Long-lived conversion worker answering on a local HTTP endpoint.
+
+    - GET /health: status, uptime, running jobs and warm-up timings
+    - POST /jobs with {"input_path", "mode", "native", "png_dir", "output_root", "metrics_dir",
+      "priority", "resume"}: runs the job and streams its events back as newline-delimited JSON until the job ends
+    - POST /shutdown: stops the worker
+
+    Graphs, tools, chat clients (and their connection pools), the page cache,
+    the artifact store and the converter workers stay warm across jobs, so a
+    job only pays for its own conversion. All jobs share one LLM scheduler,
+    i.e. one rate-limit quota and one priority queue.
+    """
+
+    def __init__(self, host: str = DEFAULT_HOST, port: int = DEFAULT_PORT, max_jobs: int = DEFAULT_MAX_JOBS):
+        self.host = host
+        self.port = port
+        self.started = time.time()
+        self.warm_up: Dict[str, float] = {}
+        self.running = 0
+        self._slots = asyncio.Semaphore(max(1, max_jobs))
+        self._stopped = asyncio.Event()
+
+    async def _read_request(self, reader: asyncio.StreamReader) -> Tuple[str, str, bytes]:
+        method, path, _ = (await reader.readline()).decode("latin-1").split(" ", 2)
+        headers = {}
+        while True:
+            line = await reader.readline()
+            if line in (b"\r\n", b"\n", b""):
+                break
+            name, _, value = line.decode("latin-1").partition(":")
+            headers[name.strip().lower()] = value.strip()
+        body = await reader.readexactly(int(headers.get("content-length", 0)))
+        return method, path, body
+
+    def _head(self, writer: asyncio.StreamWriter, status: str, content_type: str = "application/json") -> None:
+        # No Content-Length: the body ends when the connection closes, which lets job events stream
+        writer.write(f"HTTP/1.1 {status}\r\nContent-Type: {content_type}\r\nConnection: close\r\n\r\n".encode())
+
+    async def _send_json(self, writer: asyncio.StreamWriter, status: str, payload: Dict[str, Any]) -> None:
+        self._head(writer, status)
+        writer.write(json.dumps(payload).encode())
+        await writer.drain()
+
+    async def handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        try:
+            method, path, body = await self._read_request(reader)
+            if method == "GET" and path == "/health":
+                await self._send_json(writer, "200 OK", {
+                    "status": "ok",
+                    "pid": os.getpid(),
+                    "uptime": time.time() - self.started,
+                    "running_jobs": self.running,
+                    "warm_up": self.warm_up
+                })
+            elif method == "POST" and path == "/jobs":
+                try:
+                    job = json.loads(body or b"{}")
+                except ValueError as e:
+                    await self._send_json(writer, "400 Bad Request", {"error": f"Job is not valid JSON: {e}"})
+                    return
+                if not isinstance(job, dict) or not job.get("input_path"):
+                    await self._send_json(writer, "400 Bad Request", {"error": "input_path is required"})
+                    return
+                if job.get("priority", "interactive") not in PRIORITIES:
+                    await self._send_json(writer, "400 Bad Request", {"error": f"priority must be one of {', '.join(PRIORITIES)}"})
+                    return
+                self._head(writer, "200 OK", "application/x-ndjson")
+                async with self._slots:
+                    self.running += 1
+                    try:
+                        async for event in run_job(job):
+                            writer.write((json.dumps(event, default=str) + "\n").encode())
+                            await writer.drain()
+                    except Exception as e:
+                        writer.write((json.dumps({"event": "error", "error": str(e)}) + "\n").encode())
+                    finally:
+                        self.running -= 1
+            elif method == "POST" and path == "/shutdown":
+                await self._send_json(writer, "200 OK", {"status": "stopping"})
+                self._stopped.set()
+            else:
+                await self._send_json(writer, "404 Not Found", {"error": f"No route for {method} {path}"})
+        except (ConnectionError, asyncio.IncompleteReadError, ValueError):
+            pass  # Client went away or sent something that is not HTTP
+        finally:
+            writer.close()
+
+    async def serve(self) -> None:
+        self.warm_up = await asyncio.to_thread(warm_up)
+        server = await asyncio.start_server(self.handle, self.host, self.port)
+        print(f"docx-markdown worker listening on http://{self.host}:{self.port} (pid {os.getpid()})", file=sys.stderr)
+        async with server:
+            await self._stopped.wait()
+
+def main():
+    parser = argparse.ArgumentParser(description="Keep the conversion pipeline warm and serve jobs on a local HTTP endpoint")
+    parser.add_argument("--host", default=DEFAULT_HOST)
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT)
+    parser.add_argument("--max-jobs", type=int, default=DEFAULT_MAX_JOBS, help="Documents converted at the same time")
+    args = parser.parse_args()
+    try:
+        asyncio.run(WorkerServer(args.host, args.port, args.max_jobs).serve())
+    except KeyboardInterrupt:
+        pass
+
+if __name__ == "__main__":
+    main()